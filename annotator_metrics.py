@@ -0,0 +1,130 @@
+import time
+from array import array
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Longer gaps between showing and submitting a record are breaks, not work
+IDLE_SECONDS = 600.0
+# Answer-change flags are packed into one 64-bit mask per record
+MAX_TRACKED_QUESTIONS = 64
+
+
+class TimingLog:
+    """
+    Compact per-record annotation timings.
+
+    Every submitted record adds one entry to parallel typed arrays: the dataset
+    row, the annotator (as an index into `annotators`), the submit timestamp, the
+    seconds between showing and submitting the record, and a bitmask of the
+    questions whose answer was changed from its preselected value.
+    """
+
+    def __init__(self):
+        self.annotators: List[str] = []
+        self.questions: List[str] = []
+        self.rows = array("I")
+        self.annotator_ids = array("H")
+        self.submitted_at = array("d")
+        self.seconds = array("f")
+        self.changed = array("Q")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _index(self, values: List[str], value: str) -> int:
+        try:
+            return values.index(value)
+        except ValueError:
+            values.append(value)
+            return len(values) - 1
+
+    def add(self, row: int, annotator: str, seconds: float, changed_questions: Iterable[str],
+            submitted_at: Optional[float] = None) -> None:
+        """Record the submission of one dataset row."""
+        mask = 0
+        for question in changed_questions:
+            index = self._index(self.questions, question)
+            if index < MAX_TRACKED_QUESTIONS:
+                mask |= 1 << index
+        self.rows.append(row)
+        self.annotator_ids.append(self._index(self.annotators, annotator))
+        self.submitted_at.append(submitted_at if submitted_at is not None else time.time())
+        self.seconds.append(seconds)
+        self.changed.append(mask)
+
+    def changed_matrix(self) -> np.ndarray:
+        """Return a (records, questions) 0/1 matrix of the changed answers."""
+        masks = np.frombuffer(self.changed, dtype=np.uint64)
+        bits = np.arange(min(len(self.questions), MAX_TRACKED_QUESTIONS), dtype=np.uint64)
+        return ((masks[:, None] >> bits[None, :]) & np.uint64(1)).astype(np.float32)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return one row per submitted record, with a 0/1 column per question."""
+        frame = pd.DataFrame({
+            "row": np.frombuffer(self.rows, dtype=np.uint32),
+            "annotator": pd.Categorical.from_codes(
+                np.frombuffer(self.annotator_ids, dtype=np.uint16).astype(np.int32), self.annotators
+            ),
+            "submitted_at": pd.to_datetime(np.frombuffer(self.submitted_at, dtype=np.float64), unit="s"),
+            "seconds": np.frombuffer(self.seconds, dtype=np.float32),
+        })
+        changed = self.changed_matrix()
+        for i, question in enumerate(self.questions[:MAX_TRACKED_QUESTIONS]):
+            frame[f"changed: {question}"] = changed[:, i].astype(bool)
+        return frame
+
+
+def active(frame: pd.DataFrame) -> pd.DataFrame:
+    """Drop the records whose timing includes a break."""
+    return frame[frame["seconds"] <= IDLE_SECONDS]
+
+
+def throughput_by_annotator(frame: pd.DataFrame) -> pd.DataFrame:
+    """Records, median seconds per record and records per hour of active work, per annotator."""
+    frame = active(frame)
+    grouped = frame.groupby("annotator", observed=True)["seconds"]
+    summary = pd.DataFrame({
+        "records": grouped.size(),
+        "median seconds": grouped.median().round(1),
+        "records/hour": (3600 * grouped.size() / grouped.sum()).round(1),
+    })
+    return summary.sort_values("records/hour")
+
+
+def question_costs(log: TimingLog) -> pd.DataFrame:
+    """
+    Estimate the seconds each question adds to a record.
+
+    Streamlit forms report nothing until submit, so per-question time cannot be
+    observed directly. It is estimated by least squares of the record times on
+    which answers were changed from their preselected value, with an intercept for
+    the time spent reading the record.
+    """
+    seconds = np.frombuffer(log.seconds, dtype=np.float32)
+    keep = seconds <= IDLE_SECONDS
+    changed, seconds = log.changed_matrix()[keep], seconds[keep]
+    questions = log.questions[:MAX_TRACKED_QUESTIONS]
+    if len(seconds) <= len(questions):
+        return pd.DataFrame(columns=["question", "changed in", "estimated seconds"])
+
+    design = np.hstack([np.ones((len(seconds), 1), dtype=np.float32), changed])
+    coefficients, *_ = np.linalg.lstsq(design, seconds, rcond=None)
+    return pd.DataFrame({
+        "question": ["(reading the record)"] + questions,
+        "changed in": [len(seconds)] + changed.sum(axis=0).astype(int).tolist(),
+        "estimated seconds": np.round(coefficients, 1),
+    }).sort_values("estimated seconds", ascending=False)
+
+
+def slow_groups(frame: pd.DataFrame, values: pd.Series) -> pd.DataFrame:
+    """Median seconds and records per hour of the records grouped by their value in a dataset column (e.g. metadata)."""
+    frame = active(frame)
+    groups = values.iloc[frame["row"].to_numpy(dtype=np.int64)].astype(str).to_numpy()
+    grouped = frame.assign(group=groups).groupby("group")["seconds"]
+    return pd.DataFrame({
+        "records": grouped.size(),
+        "median seconds": grouped.median().round(1),
+        "records/hour": (3600 * grouped.size() / grouped.sum()).round(1),
+    }).sort_values("median seconds", ascending=False)
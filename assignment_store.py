@@ -0,0 +1,271 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+import serialization
+
+# Shared by every session of the deployment; next to the app unless configured otherwise
+ASSIGNMENT_DB_PATH = "assignments.sqlite3"
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_LEASE_SECONDS = 30 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project TEXT PRIMARY KEY, batch_size INTEGER NOT NULL, overlap INTEGER NOT NULL,
+    lease_seconds REAL NOT NULL, total_rows INTEGER NOT NULL, created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batch_rows (
+    project TEXT NOT NULL, batch INTEGER NOT NULL, position INTEGER NOT NULL, row INTEGER NOT NULL,
+    PRIMARY KEY (project, batch, position)
+);
+CREATE INDEX IF NOT EXISTS batch_rows_by_row ON batch_rows (project, row);
+CREATE TABLE IF NOT EXISTS leases (
+    project TEXT NOT NULL, batch INTEGER NOT NULL, copy INTEGER NOT NULL,
+    annotator TEXT, leased_until REAL, done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (project, batch, copy)
+);
+CREATE INDEX IF NOT EXISTS leases_by_annotator ON leases (project, annotator);
+CREATE TABLE IF NOT EXISTS completions (
+    project TEXT NOT NULL, row INTEGER NOT NULL, annotator TEXT NOT NULL,
+    answers TEXT NOT NULL, completed_at REAL NOT NULL, copy INTEGER,
+    PRIMARY KEY (project, row, annotator)
+);
+"""
+
+
+@dataclass
+class Lease:
+    """A batch of dataset rows leased to one annotator until `leased_until`."""
+    batch: int
+    copy: int
+    rows: List[int]
+    leased_until: float
+    completed: Set[int] = field(default_factory=set)
+
+    @property
+    def pending(self) -> List[int]:
+        return [row for row in self.rows if row not in self.completed]
+
+
+class AssignmentStore:
+    """
+    Partition a dataset among annotators through a local SQLite database.
+
+    The rows are split into batches, and each batch into `overlap` copies so that
+    as many different annotators label it, for agreement measurement. An annotator
+    leases one batch copy at a time; a lease that runs out before the copy is done
+    can be taken over by someone else. Every write runs in its own IMMEDIATE
+    transaction on a WAL database, so concurrent sessions and processes serialize
+    their updates instead of overwriting each other.
+    """
+
+    def __init__(self, path: str, project: str):
+        self.path = path
+        self.project = project
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            # Databases created before completions recorded their batch copy
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(completions)")}
+            if "copy" not in columns:
+                connection.execute("ALTER TABLE completions ADD COLUMN copy INTEGER")
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per operation, so the store can be used from any Streamlit thread
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA busy_timeout = 30000")
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connect()
+        try:
+            # Take the write lock up front: a read-then-write transaction cannot be upgraded under contention
+            connection.execute("BEGIN IMMEDIATE")
+            yield connection
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def settings(self) -> Optional[Dict[str, Any]]:
+        """Return the batch size, overlap, lease length and row count of the project, or None if it does not exist."""
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT batch_size, overlap, lease_seconds, total_rows FROM projects WHERE project = ?", (self.project,)
+            ).fetchone()
+        finally:
+            connection.close()
+        return dict(zip(("batch_size", "overlap", "lease_seconds", "total_rows"), row)) if row else None
+
+    def create(self, rows: Sequence[int], batch_size: int = DEFAULT_BATCH_SIZE, overlap: int = 1,
+               lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Partition `rows` into batches, unless another session already did; return whether this call did."""
+        batch_size, overlap = max(1, batch_size), max(1, overlap)
+        with self._transaction() as connection:
+            if connection.execute("SELECT 1 FROM projects WHERE project = ?", (self.project,)).fetchone():
+                return False
+            connection.execute(
+                "INSERT INTO projects VALUES (?, ?, ?, ?, ?, ?)",
+                (self.project, batch_size, overlap, lease_seconds, len(rows), time.time())
+            )
+            connection.executemany(
+                "INSERT INTO batch_rows VALUES (?, ?, ?, ?)",
+                ((self.project, i // batch_size, i % batch_size, int(row)) for i, row in enumerate(rows))
+            )
+            batches = -(-len(rows) // batch_size)
+            connection.executemany(
+                "INSERT INTO leases (project, batch, copy) VALUES (?, ?, ?)",
+                ((self.project, batch, copy) for batch in range(batches) for copy in range(overlap))
+            )
+        return True
+
+    def _lease_seconds(self, connection: sqlite3.Connection) -> float:
+        row = connection.execute("SELECT lease_seconds FROM projects WHERE project = ?", (self.project,)).fetchone()
+        return row[0] if row else DEFAULT_LEASE_SECONDS
+
+    def _lease(self, connection: sqlite3.Connection, annotator: str, batch: int, copy: int,
+               leased_until: float) -> Lease:
+        rows = [row for row, in connection.execute(
+            "SELECT row FROM batch_rows WHERE project = ? AND batch = ? ORDER BY position", (self.project, batch)
+        )]
+        # Rows done on this copy by whoever held it before, e.g. an expired lease taken over, count as done;
+        # answers given on another copy of the batch never do, so each copy is answered by its own annotators
+        completed = {row for row, in connection.execute(
+            "SELECT c.row FROM completions c JOIN batch_rows b ON b.project = c.project AND b.row = c.row "
+            "WHERE c.project = ? AND b.batch = ? AND c.copy = ?",
+            (self.project, batch, copy)
+        )}
+        return Lease(batch, copy, rows, leased_until, completed)
+
+    def lease(self, annotator: str, now: Optional[float] = None) -> Optional[Lease]:
+        """
+        Return the annotator's current batch, renewing its lease, or lease them the next available one.
+
+        A batch copy is available when nobody holds it or its lease has expired,
+        and the annotator has neither held another copy of the same batch nor
+        answered any of its rows outside this copy, e.g. before releasing it. So
+        one person never fills two overlap copies. Returns None when no work is
+        left for this annotator.
+        """
+        now = now if now is not None else time.time()
+        with self._transaction() as connection:
+            leased_until = now + self._lease_seconds(connection)
+            held = connection.execute(
+                "SELECT batch, copy FROM leases WHERE project = ? AND annotator = ? AND done = 0 "
+                "ORDER BY batch LIMIT 1", (self.project, annotator)
+            ).fetchone()
+            if held is None:
+                held = connection.execute(
+                    "SELECT batch, copy FROM leases l WHERE project = ? AND done = 0 "
+                    "AND (annotator IS NULL OR leased_until < ?) "
+                    "AND NOT EXISTS (SELECT 1 FROM leases o WHERE o.project = l.project AND o.batch = l.batch "
+                    "AND o.annotator = ?) "
+                    "AND NOT EXISTS (SELECT 1 FROM completions c JOIN batch_rows b "
+                    "ON b.project = c.project AND b.row = c.row WHERE c.project = l.project AND b.batch = l.batch "
+                    "AND c.annotator = ? AND c.copy IS NOT l.copy) "
+                    "ORDER BY batch, copy LIMIT 1", (self.project, now, annotator, annotator)
+                ).fetchone()
+            if held is None:
+                return None
+            batch, copy = held
+            connection.execute(
+                "UPDATE leases SET annotator = ?, leased_until = ? WHERE project = ? AND batch = ? AND copy = ?",
+                (annotator, leased_until, self.project, batch, copy)
+            )
+            return self._lease(connection, annotator, batch, copy, leased_until)
+
+    def complete(self, annotator: str, row: int, answers: Dict[str, Any], now: Optional[float] = None) -> None:
+        """
+        Record the annotator's answers for a row, renew their lease and close the batch copy once every row is done.
+
+        Answering a row again replaces the earlier answers. Answers are kept even
+        if the lease has expired meanwhile, so no submitted work is lost; they
+        count towards the batch copy only while the annotator still holds it.
+        """
+        now = now if now is not None else time.time()
+        with self._transaction() as connection:
+            batch = connection.execute(
+                "SELECT batch FROM batch_rows WHERE project = ? AND row = ?", (self.project, int(row))
+            ).fetchone()
+            copy = connection.execute(
+                "SELECT copy FROM leases WHERE project = ? AND batch = ? AND annotator = ? AND done = 0",
+                (self.project, batch[0], annotator)
+            ).fetchone() if batch is not None else None
+            connection.execute(
+                "INSERT OR REPLACE INTO completions (project, row, annotator, answers, completed_at, copy) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.project, int(row), annotator, serialization.dumps(answers, default=str), now,
+                 copy[0] if copy is not None else None)
+            )
+            if copy is None:
+                return
+            lease = self._lease(connection, annotator, batch[0], copy[0], now + self._lease_seconds(connection))
+            connection.execute(
+                "UPDATE leases SET leased_until = ?, done = ? WHERE project = ? AND batch = ? AND copy = ?",
+                (lease.leased_until, int(not lease.pending), self.project, batch[0], copy[0])
+            )
+
+    def release(self, annotator: str) -> None:
+        """Give the annotator's unfinished batch back, so others can take it over right away."""
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE leases SET annotator = NULL, leased_until = NULL WHERE project = ? AND annotator = ? AND done = 0",
+                (self.project, annotator)
+            )
+
+    def progress(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Return the done and leased batch copies, and the rows completed per annotator."""
+        now = now if now is not None else time.time()
+        connection = self._connect()
+        try:
+            copies, done, leased = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(done), 0), COALESCE(SUM(done = 0 AND leased_until >= ?), 0) "
+                "FROM leases WHERE project = ?", (now, self.project)
+            ).fetchone()
+            per_annotator = dict(connection.execute(
+                "SELECT annotator, COUNT(*) FROM completions WHERE project = ? GROUP BY annotator ORDER BY annotator",
+                (self.project,)
+            ).fetchall())
+        finally:
+            connection.close()
+        return {"copies": copies, "done": done, "leased": leased, "completed_by_annotator": per_annotator}
+
+    def agreement(self) -> Dict[str, Dict[str, int]]:
+        """
+        Per question, count the rows answered by several annotators and the rows where they all agree.
+
+        Only rows labeled by at least two annotators take part, which is what the
+        overlap factor provides.
+        """
+        connection = self._connect()
+        try:
+            answered = connection.execute(
+                "SELECT row, answers FROM completions WHERE project = ? AND row IN ("
+                "SELECT row FROM completions WHERE project = ? GROUP BY row HAVING COUNT(*) > 1) ORDER BY row",
+                (self.project, self.project)
+            ).fetchall()
+        finally:
+            connection.close()
+
+        by_row: Dict[int, List[Dict[str, Any]]] = {}
+        for row, answers in answered:
+            by_row.setdefault(row, []).append(serialization.loads(answers))
+        counts: Dict[str, Dict[str, int]] = {}
+        for answers in by_row.values():
+            for question in set().union(*answers):
+                values = [serialization.dumps(a[question], sort_keys=True, default=str) for a in answers if question in a]
+                if len(values) < 2:
+                    continue
+                count = counts.setdefault(question, {"rows": 0, "agreeing": 0})
+                count["rows"] += 1
+                count["agreeing"] += len(set(values)) == 1
+        return counts
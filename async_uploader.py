@@ -0,0 +1,170 @@
+import asyncio
+import gzip
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+import serialization
+
+# Argilla rejects bulk requests with more records than this
+MAX_BATCH_SIZE = 500
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def build_record_payload(fields: Dict[str, str], metadata: Dict[str, Any],
+                         responses: Optional[Dict[str, Any]] = None, user_id: Optional[str] = None,
+                         suggestions: Optional[List[Dict[str, Any]]] = None,
+                         external_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the JSON body of one record for the Argilla bulk records endpoint.
+
+    The bulk endpoint upserts records by `external_id`, so a batch that is sent
+    again after a timeout updates the records it already created instead of
+    duplicating them.
+    """
+    payload: Dict[str, Any] = {"fields": fields, "metadata": metadata}
+    if external_id is not None:
+        payload["external_id"] = external_id
+    if responses and user_id:
+        payload["responses"] = [{
+            "values": {name: {"value": value} for name, value in responses.items()},
+            "status": "submitted",
+            "user_id": str(user_id),
+        }]
+    if suggestions:
+        payload["suggestions"] = suggestions
+    return payload
+
+
+def encode_batch(payloads: List[Dict[str, Any]], compress: bool) -> Tuple[bytes, Optional[bytes]]:
+    """Serialize a batch of records, returning the raw body and its gzip-compressed form."""
+    body = serialization.dumps({"items": payloads}).encode("utf-8")
+    return body, gzip.compress(body, compresslevel=5) if compress else None
+
+
+def _refuses_gzip(response: httpx.Response) -> bool:
+    # A server that does not decode gzip bodies (e.g. a stock FastAPI one) fails to parse them as JSON and says so
+    # in a 422; other 400 and 422 responses are validation errors of the records themselves and must surface as such
+    if response.status_code == 415:
+        return True
+    text = response.text.lower()
+    if response.status_code == 422:
+        return any(word in text for word in ("json decode error", "json_invalid"))
+    return response.status_code == 400 and any(word in text for word in ("content-encoding", "gzip"))
+
+
+class AsyncUploader:
+    """
+    Push record payloads to an Argilla dataset over a pooled keep-alive connection set.
+
+    Batches are built and serialized in a worker thread while up to
+    `max_in_flight` bulk requests are on the wire. With `compress`, request
+    bodies are gzip-compressed; Argilla servers do not decode them unless a
+    proxy in front of them does, so when the server refuses or cannot parse a
+    compressed body the uploader falls back to plain JSON for the rest of the
+    upload.
+    """
+
+    def __init__(self, api_url: str, api_key: str, batch_size: int = MAX_BATCH_SIZE, max_in_flight: int = 4,
+                 compress: bool = False, timeout: float = 120.0, retries: int = 3):
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.max_in_flight = max(1, max_in_flight)
+        self.compress = compress
+        self.timeout = timeout
+        self.retries = retries
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.api_url,
+            headers={"X-Argilla-Api-Key": self.api_key, "Content-Type": "application/json"},
+            limits=httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight),
+            timeout=self.timeout,
+        )
+
+    async def _send(self, client: httpx.AsyncClient, url: str, body: bytes, compressed: Optional[bytes]) -> None:
+        for attempt in range(self.retries + 1):
+            use_gzip = self.compress and compressed is not None
+            headers = {"Content-Encoding": "gzip"} if use_gzip else {}
+            try:
+                response = await client.put(url, content=compressed if use_gzip else body, headers=headers)
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            if use_gzip and _refuses_gzip(response):
+                # The server does not accept compressed bodies: send plain JSON from now on
+                self.compress = False
+                response = await client.put(url, content=body)
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                await asyncio.sleep(2 ** attempt)
+                continue
+            response.raise_for_status()
+            return
+
+    async def upload_batches(self, dataset_id: Any, batches: Iterable[Tuple[int, bytes, Optional[bytes]]],
+                             progress: Optional[Callable[[int], None]] = None,
+                             should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """Upload batches already encoded by `encode_batch`, as (record count, body, compressed body)."""
+        iterator = iter(batches)
+        return await self._upload(dataset_id, lambda: next(iterator, None), progress, should_stop)
+
+    async def _upload(self, dataset_id: Any, next_batch: Callable[[], Optional[Tuple[int, bytes, Optional[bytes]]]],
+                      progress: Optional[Callable[[int], None]],
+                      should_stop: Optional[Callable[[], bool]]) -> int:
+        loop = asyncio.get_running_loop()
+        url = f"/api/v1/datasets/{dataset_id}/records/bulk"
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_in_flight * 2)
+        sent = 0
+        pending_batch: Optional[asyncio.Future] = None
+
+        async def produce():
+            nonlocal pending_batch
+            while not (should_stop and should_stop()):
+                pending_batch = loop.run_in_executor(None, next_batch)
+                # Shielded, so cancelling the producer does not abandon a batch still being built
+                batch = await asyncio.shield(pending_batch)
+                if batch is None:
+                    break
+                await queue.put(batch)
+            for _ in range(self.max_in_flight):
+                await queue.put(None)
+
+        async def consume(client: httpx.AsyncClient):
+            nonlocal sent
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+                count, body, compressed = batch
+                await self._send(client, url, body, compressed)
+                sent += count
+                if progress:
+                    progress(sent)
+
+        async with self._client() as client:
+            producer = asyncio.create_task(produce())
+            consumers = [asyncio.create_task(consume(client)) for _ in range(self.max_in_flight)]
+            try:
+                await asyncio.gather(producer, *consumers)
+            except BaseException:
+                for task in [producer, *consumers]:
+                    task.cancel()
+                # Let a batch source still running in the worker thread return, so the caller can close it
+                if pending_batch is not None:
+                    await asyncio.wait([pending_batch])
+                raise
+        return sent
+
+
+def upload_encoded_batches(api_url: str, api_key: str, dataset_id: Any,
+                           batches: Iterable[Tuple[int, bytes, Optional[bytes]]],
+                           progress: Optional[Callable[[int], None]] = None,
+                           should_stop: Optional[Callable[[], bool]] = None, **options) -> int:
+    """Run `AsyncUploader.upload_batches` to completion from synchronous code."""
+    uploader = AsyncUploader(api_url, api_key, **options)
+    return asyncio.run(uploader.upload_batches(dataset_id, batches, progress=progress, should_stop=should_stop))
@@ -0,0 +1,68 @@
+"""
+Record conversion throughput by number of worker processes.
+
+Builds a synthetic dataset of nested records, converts it into encoded upload
+batches with 1, 2, 4, ... processes (up to the usable cores) and prints the
+rows per second of each run. Run from the repository root:
+
+    python benchmarks/bench_parallel_convert.py --rows 200000
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from functools import partial
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel_convert import iter_converted_batches, usable_cores  # noqa: E402
+from upload_to_argilla_page import payloads_for_rows, select_rows  # noqa: E402
+
+
+def make_dataset(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "data.title": [f"제{i}조 (목적) record {i}" for i in range(rows)],
+        "data.sentence": [
+            {"text": f"이 법은 저탄소 녹색성장에 필요한 기반을 조성하고 {i}", "NE": [{"entity": "법", "type": "LC", "begin": 0, "end": 1}]}
+            for i in range(rows)
+        ],
+        "data.doc_type": [("법령", "판례", "해석례")[i % 3] for i in range(rows)],
+        "Quality": [("Good", "Bad", None)[i % 3] for i in range(rows)],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--no-compress", action="store_true")
+    parser.add_argument("--max-processes", type=int, default=usable_cores())
+    args = parser.parse_args()
+
+    dataset = make_dataset(args.rows)
+    convert = partial(
+        payloads_for_rows, ["data.title", "data.sentence"], [{"text": "data.doc_type"}],
+        [{"question_title": "Quality", "question_type": "Label"}],
+        "00000000-0000-0000-0000-000000000000", None
+    )
+    select = partial(select_rows, dataset, [], None, None, None, None)
+    max_workers = args.max_processes
+    counts = sorted({1, max_workers} | {n for n in (2, 4, 8, 16, 32) if n < max_workers})
+
+    print(f"{args.rows} rows, {usable_cores()} usable cores")
+    baseline = None
+    for workers in counts:
+        start = time.perf_counter()
+        sent = sum(count for count, _, _ in iter_converted_batches(
+            convert, select, len(dataset), args.batch_size, not args.no_compress, workers=workers, stats=Counter()
+        ))
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>3} processes: {sent / elapsed:>10,.0f} rows/s  ({baseline / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+JSON backend comparison on the sample datasets.
+
+For every available backend, times parsing the sample files as JSON documents
+and as JSONL lines, rendering their records with `format_value`, and encoding
+upload batches, then checks that every backend produced identical output. The
+samples are small, so each one is repeated to make a few megabytes. Run from
+the repository root:
+
+    python benchmarks/bench_serialization.py --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialization  # noqa: E402
+from async_uploader import encode_batch  # noqa: E402
+from labeling_page import format_value  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES = ("sample.json", "queries_and_responses.json")
+
+
+def records_of(document):
+    if isinstance(document, dict):
+        return document.get("data", [document]) if isinstance(document.get("data", []), list) else [document["data"]]
+    return document
+
+
+def run(records, document_bytes, lines):
+    timings, outputs = {}, []
+    start = time.perf_counter()
+    serialization.loads(document_bytes)
+    timings["document"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parsed = [serialization.loads(line) for line in lines]
+    timings["jsonl lines"] = time.perf_counter() - start
+    outputs.append(parsed)
+
+    start = time.perf_counter()
+    rendered = [format_value(record) for record in records]
+    timings["format_value"] = time.perf_counter() - start
+    outputs.append(rendered)
+
+    start = time.perf_counter()
+    bodies = [encode_batch(records[i:i + 500], compress=False)[0] for i in range(0, len(records), 500)]
+    timings["encode_batch"] = time.perf_counter() - start
+    outputs.append(bodies)
+    return timings, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Copies of each sample's records")
+    args = parser.parse_args()
+
+    for name in SAMPLES:
+        with open(os.path.join(ROOT, name), "rb") as f:
+            records = records_of(serialization.loads(f.read())) * args.repeat
+        document_bytes = serialization.dumps({"data": records}).encode("utf-8")
+        lines = [serialization.dumps(record) for record in records]
+        print(f"{name}: {len(records)} records, {len(document_bytes) / 2 ** 20:.1f} MB")
+
+        results = {}
+        for backend in serialization.available_backends():
+            serialization.use_backend(backend)
+            results[backend] = run(records, document_bytes, lines)
+        baseline = results["json"][0]
+        for backend, (timings, outputs) in results.items():
+            identical = outputs == results["json"][1]
+            print(f"  {backend:<7}" + "".join(
+                f"  {step} {seconds * 1000:7.1f} ms ({baseline[step] / seconds:4.1f}x)" for step, seconds in timings.items()
+            ) + ("" if identical else "  OUTPUT DIFFERS"))
+
+
+if __name__ == "__main__":
+    main()
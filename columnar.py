@@ -0,0 +1,220 @@
+import base64
+import datetime
+import decimal
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+COLUMNAR_SUFFIXES = (".parquet", ".arrow", ".feather", ".ipc", ".csv")
+BATCH_SIZE = 8192
+
+# Parquet spells nested lists/maps with extra levels that JSON paths do not have
+PARQUET_WRAPPERS = {"list": ("element", "item"), "key_value": ("key", "value"), "bag": ("array_element",)}
+
+
+def is_columnar(file_name: str) -> bool:
+    """Return True for file types that are read through pyarrow instead of the JSON parsers."""
+    return file_name.lower().endswith(COLUMNAR_SUFFIXES)
+
+
+def _file_format(file_name: str) -> str:
+    name = file_name.lower()
+    if name.endswith(".parquet"):
+        return "parquet"
+    if name.endswith(".csv"):
+        return "csv"
+    return "ipc"
+
+
+def _type_paths(arrow_type: pa.DataType, prefix: str) -> Iterator[str]:
+    # Mirrors flatten_json: structs add a path segment, lists of structs are looked through
+    if pa.types.is_struct(arrow_type):
+        if arrow_type.num_fields == 0:
+            yield prefix
+        for i in range(arrow_type.num_fields):
+            child = arrow_type.field(i)
+            yield from _type_paths(child.type, f"{prefix}.{child.name}")
+    elif pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type) or pa.types.is_fixed_size_list(arrow_type):
+        value_type = arrow_type.value_type
+        if pa.types.is_struct(value_type) or pa.types.is_list(value_type) or pa.types.is_large_list(value_type):
+            yield from _type_paths(value_type, prefix)
+        else:
+            yield prefix
+    else:
+        yield prefix
+
+
+def _needs_conversion(arrow_type: pa.DataType) -> bool:
+    """Return True if values of this type do not come out of pyarrow as JSON-compatible Python objects."""
+    if pa.types.is_struct(arrow_type):
+        return any(_needs_conversion(arrow_type.field(i).type) for i in range(arrow_type.num_fields))
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type) or pa.types.is_fixed_size_list(arrow_type):
+        return _needs_conversion(arrow_type.value_type)
+    return (pa.types.is_temporal(arrow_type) or pa.types.is_decimal(arrow_type)
+            or pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type)
+            or pa.types.is_map(arrow_type))
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        # Maps come out as lists of (key, value) tuples
+        if value and all(isinstance(item, tuple) and len(item) == 2 for item in value):
+            return {str(k): _jsonable(v) for k, v in value}
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (datetime.date, datetime.time, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError:
+            return base64.b64encode(value).decode("ascii")
+    return value
+
+
+def _unflatten(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn dotted CSV headers into nested dicts, so "a.b" is reachable as the path a.b."""
+    record: Dict[str, Any] = {}
+    for key, value in row.items():
+        current = record
+        parts = key.split(".")
+        for part in parts[:-1]:
+            child = current.get(part)
+            if not isinstance(child, dict):
+                child = current[part] = {}
+            current = child
+        current[parts[-1]] = value
+    return record
+
+
+def read_schema(payload: bytes, file_name: str) -> pa.Schema:
+    """Read only the schema of a columnar file."""
+    file_format = _file_format(file_name)
+    if file_format == "parquet":
+        return pq.ParquetFile(pa.BufferReader(payload)).schema_arrow
+    if file_format == "csv":
+        return pa_csv.open_csv(pa.BufferReader(payload)).schema
+    return pa_ipc.open_file(pa.BufferReader(payload)).schema
+
+
+def schema_paths(payload: bytes, file_name: str) -> List[str]:
+    """Return the leaf paths of a columnar file, spelled like `flatten_json` spells them ("data." prefix)."""
+    schema = read_schema(payload, file_name)
+    paths = []
+    for field in schema:
+        paths.extend(_type_paths(field.type, f"data.{field.name}"))
+    return list(dict.fromkeys(paths))
+
+
+def count_rows(payload: bytes, file_name: str) -> Optional[int]:
+    """Return the row count from the file footer, or None when it is only known after a full scan (CSV)."""
+    file_format = _file_format(file_name)
+    if file_format == "parquet":
+        return pq.ParquetFile(pa.BufferReader(payload)).metadata.num_rows
+    if file_format == "ipc":
+        reader = pa_ipc.open_file(pa.BufferReader(payload))
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return None
+
+
+def _parquet_columns(parquet_file: pq.ParquetFile, paths: Sequence[str]) -> List[str]:
+    """Map JSON-style dot paths to the Parquet leaf columns they cover."""
+    columns = []
+    schema = parquet_file.schema
+    for i in range(len(schema)):
+        leaf_path = schema.column(i).path
+        parts = leaf_path.split(".")
+        normalized = []
+        skip_next: Tuple[str, ...] = ()
+        for part in parts:
+            if part in skip_next:
+                skip_next = ()
+                continue
+            if part in PARQUET_WRAPPERS:
+                skip_next = PARQUET_WRAPPERS[part]
+                continue
+            normalized.append(part)
+        normalized_path = ".".join(normalized)
+        if any(normalized_path == path or normalized_path.startswith(path + ".") for path in paths):
+            columns.append(leaf_path)
+    return columns
+
+
+def _projected_batches(payload: bytes, file_name: str, paths: Sequence[str],
+                       rows: Optional[Set[int]]) -> Iterator[Tuple[int, pa.RecordBatch]]:
+    """Yield (first row number, batch) for the projected columns, skipping row groups without wanted rows."""
+    file_format = _file_format(file_name)
+    top_level = list(dict.fromkeys(path.split(".")[0] for path in paths))
+
+    if file_format == "parquet":
+        parquet_file = pq.ParquetFile(pa.BufferReader(payload))
+        columns = _parquet_columns(parquet_file, paths) or top_level
+        offset = 0
+        for group in range(parquet_file.metadata.num_row_groups):
+            group_rows = parquet_file.metadata.row_group(group).num_rows
+            if rows is None or any(offset <= row < offset + group_rows for row in rows):
+                table = parquet_file.read_row_group(group, columns=columns)
+                for batch in table.to_batches(max_chunksize=BATCH_SIZE):
+                    yield offset, batch
+                    offset += batch.num_rows
+            else:
+                offset += group_rows
+
+    elif file_format == "ipc":
+        # Record batches are sliced zero-copy from the buffer, unselected columns are never touched
+        reader = pa_ipc.open_file(pa.BufferReader(payload))
+        offset = 0
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if rows is None or any(offset <= row < offset + batch.num_rows for row in rows):
+                yield offset, batch.select([name for name in top_level if name in batch.schema.names])
+            offset += batch.num_rows
+
+    else:
+        header = pa_csv.open_csv(pa.BufferReader(payload)).schema.names
+        include = [name for name in header
+                   if any(name == path or name.startswith(path + ".") for path in paths)]
+        reader = pa_csv.open_csv(
+            pa.BufferReader(payload),
+            convert_options=pa_csv.ConvertOptions(include_columns=include)
+        )
+        offset = 0
+        for batch in reader:
+            yield offset, batch
+            offset += batch.num_rows
+
+
+def iter_projected_records(payload: bytes, file_name: str, paths: Sequence[str],
+                           rows: Optional[Set[int]] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yield (row number, record) pairs holding only the selected paths of a columnar file.
+
+    `paths` are dot paths with or without the "data." prefix. When `rows` is given,
+    only those row numbers are produced and row groups/batches without any of them
+    are not read at all.
+    """
+    paths = [path[len("data."):] if path.startswith("data.") else path for path in paths]
+    is_csv = _file_format(file_name) == "csv"
+
+    for offset, batch in _projected_batches(payload, file_name, paths, rows):
+        convert = any(_needs_conversion(field.type) for field in batch.schema)
+        if rows is not None:
+            positions = [row - offset for row in sorted(rows) if offset <= row < offset + batch.num_rows]
+            batch = batch.take(pa.array(positions, type=pa.int64()))
+        else:
+            positions = range(batch.num_rows)
+
+        for position, record in zip(positions, batch.to_pylist()):
+            if convert:
+                record = _jsonable(record)
+            if is_csv:
+                record = _unflatten(record)
+            yield offset + position + 1, record
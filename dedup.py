@@ -0,0 +1,190 @@
+import hashlib
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+import serialization
+
+try:
+    import xxhash
+except ImportError:  # xxhash is optional, blake2b is used as a fallback
+    xxhash = None
+
+# Largest prime below 2**32, so every permuted hash value fits in a uint32
+MERSENNE_PRIME = np.uint64(4294967291)
+MAX_HASH = np.uint32(4294967290)
+
+
+def exact_hash(text: str) -> int:
+    """Return a 64-bit content hash for the given text."""
+    data = text.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def canonical_value(value: Any) -> str:
+    """Render a cell value as a stable string for hashing."""
+    if isinstance(value, (dict, list)):
+        return serialization.dumps(value, sort_keys=True, default=str)
+    if value is None:
+        return ""
+    return str(value)
+
+
+def record_text(values: Iterable[Any]) -> str:
+    """Join the selected field values of one record into a single hashable string."""
+    return "\x1f".join(canonical_value(value) for value in values)
+
+
+def shingles(text: str, size: int = 5) -> List[int]:
+    """Return the 32-bit hashes of the character shingles of a whitespace-normalized text."""
+    text = re.sub(r"\s+", " ", text).strip().lower()
+    if not text:
+        return []
+    if len(text) <= size:
+        return [zlib.crc32(text.encode("utf-8"))]
+    return list({zlib.crc32(text[i:i + size].encode("utf-8")) for i in range(len(text) - size + 1)})
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick the (bands, rows) split of the signature whose LSH threshold is closest to `threshold`."""
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHashLSH:
+    """
+    Streaming near-duplicate detector.
+
+    Records are added one at a time. Each record is either matched to an earlier
+    representative (exact hash first, then MinHash/LSH candidates verified against
+    the estimated Jaccard similarity) or becomes a new representative. Only the
+    signatures of representatives are kept, so memory grows with the number of
+    distinct records rather than with the input size.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        self._exact: Dict[int, int] = {}
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[int, np.ndarray] = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a text."""
+        hashes = shingles(text, self.shingle_size)
+        if not hashes:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        values = np.asarray(hashes, dtype=np.uint64)[:, None]
+        permuted = (values * self._a + self._b) % MERSENNE_PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [
+            hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def add(self, record_id: int, text: str) -> int:
+        """Add a record and return the id of its representative (itself if it is new)."""
+        digest = exact_hash(text)
+        if digest in self._exact:
+            return self._exact[digest]
+
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+
+        best_id, best_score = None, 0.0
+        seen = set()
+        for band, key in enumerate(keys):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                score = float(np.mean(self._signatures[candidate] == signature))
+                if score >= self.threshold and score > best_score:
+                    best_id, best_score = candidate, score
+
+        if best_id is not None:
+            self._exact[digest] = best_id
+            return best_id
+
+        self._exact[digest] = record_id
+        self._signatures[record_id] = signature
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(record_id)
+        return record_id
+
+
+def find_duplicates(texts: Iterable[str], threshold: float = 0.8, num_perm: int = 128,
+                    shingle_size: int = 5, seed: int = 1) -> Dict[int, int]:
+    """
+    Detect exact and near-duplicate records in a single streaming pass.
+
+    Returns a mapping of duplicate record position -> representative record position.
+    The representative of a cluster is always its first-seen member. A threshold of
+    1.0 only collapses exact duplicates.
+    """
+    duplicate_of = {}
+    if threshold >= 1.0:
+        seen = {}
+        for idx, text in enumerate(texts):
+            representative = seen.setdefault(exact_hash(text), idx)
+            if representative != idx:
+                duplicate_of[idx] = representative
+        return duplicate_of
+
+    index = MinHashLSH(threshold=threshold, num_perm=num_perm, shingle_size=shingle_size, seed=seed)
+    for idx, text in enumerate(texts):
+        representative = index.add(idx, text)
+        if representative != idx:
+            duplicate_of[idx] = representative
+    return duplicate_of
+
+
+def group_clusters(duplicate_of: Dict[int, int]) -> Dict[int, List[int]]:
+    """Group a member -> representative mapping into representative -> members."""
+    clusters: Dict[int, List[int]] = {}
+    for member, representative in duplicate_of.items():
+        clusters.setdefault(representative, []).append(member)
+    return clusters
+
+
+def propagate_labels(df, duplicate_of: Dict[int, int], label_columns: List[str]):
+    """
+    Return `df` with each duplicate row taking the labels of its representative.
+
+    Without duplicates to fill in, `df` itself is returned, not a copy; otherwise
+    the result is a new frame.
+    """
+    columns = [col for col in label_columns if col in df.columns]
+    if not duplicate_of or not columns:
+        return df
+
+    df = df.copy()
+    members = [member for member in duplicate_of if member < len(df)]
+    representatives = [duplicate_of[member] for member in members]
+    for col in columns:
+        df[col] = df[col].astype(object)
+        values = df[col].to_numpy()
+        values[members] = values[representatives]
+        df[col] = values
+    return df
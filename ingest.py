@@ -0,0 +1,251 @@
+import bz2
+import gzip
+import io
+import json
+import lzma
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import IO, Any, Iterator, List, Optional, Tuple
+
+import serialization
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, only needed for .zst shards
+    zstandard = None
+
+CHUNK_SIZE = 1 << 20
+WHITESPACE = " \t\n\r"
+COMPRESSION_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+
+
+def strip_compression_suffix(file_name: str) -> str:
+    """Return the file name without its compression suffix, e.g. part-0.jsonl.gz -> part-0.jsonl."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if file_name.lower().endswith(suffix):
+            return file_name[:-len(suffix)]
+    return file_name
+
+
+def open_decompressed(stream: IO[bytes], file_name: str) -> IO[bytes]:
+    """Wrap a byte stream in a streaming decompressor chosen from the file name."""
+    name = file_name.lower()
+    if name.endswith(".gz"):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if name.endswith(".bz2"):
+        return bz2.BZ2File(stream, mode="rb")
+    if name.endswith(".xz"):
+        return lzma.LZMAFile(stream, mode="rb")
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("Reading .zst files requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().stream_reader(stream, closefd=False)
+    return stream
+
+
+def iter_numbered_jsonl_records(stream: IO[bytes]) -> Iterator[Tuple[int, Any]]:
+    """Yield (line number, record) pairs of a JSONL byte stream, skipping invalid lines."""
+    text = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        for line_number, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, serialization.loads(line)
+            except json.JSONDecodeError:
+                continue  # Skip invalid lines
+    finally:
+        text.detach()  # Leave the caller's stream open
+
+
+def iter_jsonl_records(stream: IO[bytes]) -> Iterator[Any]:
+    """Yield the records of a JSONL byte stream one line at a time, skipping invalid lines."""
+    for _, record in iter_numbered_jsonl_records(stream):
+        yield record
+
+
+class _Reader:
+    """Incremental text buffer that decodes one JSON value at a time from a stream."""
+
+    def __init__(self, stream: IO[bytes]):
+        self.text = io.TextIOWrapper(stream, encoding="utf-8")
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.text.read(max(CHUNK_SIZE, len(self.buffer) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def close(self) -> None:
+        self.text.detach()  # Leave the caller's stream open
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at end of stream)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value, reading more of the stream as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value may be cut off at the end of the buffer
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and isinstance(value, (int, float)):
+                if self._fill():
+                    continue
+            self.pos = end
+            return value
+
+    def array_items(self) -> Iterator[Any]:
+        """Yield the items of the array starting at the current position."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_json_document_records(stream: IO[bytes]) -> Iterator[Any]:
+    """
+    Yield the records of a JSON document without loading it whole.
+
+    Follows the same normalization as `load_json_data`: a root array, or the
+    "data" array of a root object, is streamed item by item; any other document
+    is yielded as a single record.
+    """
+    reader = _Reader(stream)
+    try:
+        yield from _document_records(reader)
+    finally:
+        reader.close()
+
+
+def _document_records(reader: _Reader) -> Iterator[Any]:
+    first = reader.peek()
+    if first == "[":
+        yield from reader.array_items()
+        return
+    if first != "{":
+        raise json.JSONDecodeError("Invalid JSON structure", reader.buffer, reader.pos)
+
+    reader.expect("{")
+    document = {}
+    streamed_data = False
+    while reader.peek() not in ("}", ""):
+        key = reader.value()
+        reader.expect(":")
+        if key == "data" and reader.peek() == "[":
+            yield from reader.array_items()
+            streamed_data = True
+        else:
+            document[key] = reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+    reader.expect("}")
+
+    if streamed_data:
+        return
+    if "data" in document:
+        yield document["data"]
+    else:
+        yield document
+
+
+def iter_numbered_records(stream: IO[bytes], file_name: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (position, record) pairs of a possibly compressed JSON or JSONL file.
+
+    The position is the line number for JSONL and the 1-based item number for JSON.
+    """
+    stream = open_decompressed(stream, file_name)
+    if strip_compression_suffix(file_name).lower().endswith(".jsonl"):
+        return iter_numbered_jsonl_records(stream)
+    return enumerate(iter_json_document_records(stream), start=1)
+
+
+def iter_records(stream: IO[bytes], file_name: str) -> Iterator[Any]:
+    """Yield the records of an uploaded JSON or JSONL file in one streaming pass."""
+    for _, record in iter_numbered_records(stream, file_name):
+        yield record
+
+
+def parse_shard(shard: Tuple[str, bytes]) -> List[Tuple[int, Any]]:
+    """Decompress and parse one shard; runs in a worker process."""
+    file_name, payload = shard
+    return list(iter_numbered_records(io.BytesIO(payload), file_name))
+
+
+def iter_shard_records(shards: List[Tuple[str, bytes]],
+                       max_workers: Optional[int] = None) -> Iterator[Tuple[Tuple[str, int], Any]]:
+    """
+    Yield ((shard name, position), record) pairs of many shards as one logical dataset.
+
+    Shards are decompressed and parsed in parallel on a process pool and merged
+    back in the given shard order. Only one shard per worker is submitted ahead
+    of the one being yielded, so at most `max_workers` + 1 parsed shards are held
+    in memory, whatever the number of shards. A single shard is parsed
+    in-process, streaming.
+    """
+    if len(shards) == 1 or max_workers == 1:
+        for file_name, payload in shards:
+            for position, record in iter_numbered_records(io.BytesIO(payload), file_name):
+                yield (file_name, position), record
+        return
+
+    # Spawned workers avoid forking the threaded Streamlit server
+    context = multiprocessing.get_context("spawn")
+    workers = max_workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        remaining = iter(shards)
+        pending = deque()
+        for shard in islice(remaining, workers):
+            pending.append((shard[0], executor.submit(parse_shard, shard)))
+        while pending:
+            file_name, future = pending.popleft()
+            records = future.result()
+            # Keep every worker busy while the records of this shard are consumed
+            for shard in islice(remaining, 1):
+                pending.append((shard[0], executor.submit(parse_shard, shard)))
+            for position, record in records:
+                yield (file_name, position), record
+            del records  # Not held while waiting for the next shard
+        executor.shutdown(wait=True)
+    finally:
+        # Also reached when the consumer stops early, e.g. a sample that is already full
+        executor.shutdown(wait=False, cancel_futures=True)
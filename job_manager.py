@@ -0,0 +1,222 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+ACTIVE_STATUSES = ("queued", "running")
+# Items between progress reports of jobs that use `iter_reported`
+REPORT_EVERY = 1000
+
+
+class JobLimitError(Exception):
+    """Raised when an owner already has the maximum number of active jobs."""
+
+
+@dataclass
+class Job:
+    """State of a background job, shared between the worker thread and the UI."""
+    id: str
+    kind: str
+    owner: str
+    description: str
+    total: Optional[int] = None
+    status: str = "queued"
+    progress: int = 0
+    error: Optional[str] = None
+    result: Any = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    internal: bool = False
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def report(self, progress: int, total: Optional[int] = None) -> None:
+        """Record progress from inside the job."""
+        self.progress = progress
+        if total is not None:
+            self.total = total
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Items processed per second since the job started."""
+        return self.progress / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class JobManager:
+    """
+    Runs long jobs (uploads, exports, conversions) on a thread pool, off the Streamlit script thread.
+
+    Jobs live in the process, not in a session, so they keep running and stay
+    visible across page navigation and reruns. Each owner may only have a limited
+    number of queued or running jobs. Internal jobs, which the app starts by
+    itself (e.g. building the search index), run on their own threads and do not
+    count toward that limit.
+
+    Finished jobs of every owner are dropped `max_age` seconds after they end,
+    and only the newest `keep_finished` of an owner are kept before that.
+    Sessions take large results with `collect`, which releases them here.
+    """
+
+    def __init__(self, max_workers: int = 4, max_jobs_per_owner: int = 2, keep_finished: int = 20,
+                 max_age: float = 3600.0, internal_workers: int = 2):
+        self.max_jobs_per_owner = max_jobs_per_owner
+        self.keep_finished = keep_finished
+        self.max_age = max_age
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._internal_executor = ThreadPoolExecutor(max_workers=internal_workers, thread_name_prefix="internal-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, kind: str, description: str, fn: Callable[..., Any], *args,
+               total: Optional[int] = None, internal: bool = False, **kwargs) -> Job:
+        """Queue `fn(job, *args, **kwargs)` and return its job. `fn` should check `job.cancelled`."""
+        with self._lock:
+            active = [job for job in self._jobs.values() if job.owner == owner and job.active and not job.internal]
+            if not internal and len(active) >= self.max_jobs_per_owner:
+                raise JobLimitError(
+                    f"You already have {len(active)} running jobs. Wait for one to finish or cancel it."
+                )
+            job = Job(id=uuid.uuid4().hex[:12], kind=kind, owner=owner, description=description, total=total,
+                      internal=internal)
+            self._jobs[job.id] = job
+            self._prune()
+        executor = self._internal_executor if internal else self._executor
+        executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        if job.cancelled:
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "cancelled" if job.cancelled else "completed"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self) -> None:
+        # Called with the lock held; also drops the jobs of owners whose session has ended
+        expired = time.time() - self.max_age
+        finished_by_owner: Dict[str, List[Job]] = {}
+        for job in list(self._jobs.values()):
+            if job.active:
+                continue
+            if job.finished_at is not None and job.finished_at < expired:
+                del self._jobs[job.id]
+            else:
+                finished_by_owner.setdefault(job.owner, []).append(job)
+        for finished in finished_by_owner.values():
+            finished.sort(key=lambda job: job.created_at)
+            for job in finished[:max(0, len(finished) - self.keep_finished)]:
+                del self._jobs[job.id]
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        return self._jobs.get(job_id) if job_id else None
+
+    def collect(self, job_id: Optional[str]) -> Any:
+        """Return the result of a completed job and release it, so only the session taking it holds it."""
+        job = self.get(job_id)
+        if job is None or job.status != "completed":
+            return None
+        result, job.result = job.result, None
+        return result
+
+    def jobs_for(self, owner: str) -> List[Job]:
+        """Return the jobs of an owner, newest first."""
+        with self._lock:
+            self._prune()
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> None:
+        job = self._jobs.get(job_id)
+        if job is not None and job.active:
+            job.cancel_event.set()
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager shared by every session."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+def iter_reported(job: Job, items: Iterable[Any], every: int = REPORT_EVERY) -> Iterator[Any]:
+    """Yield `items`, reporting the count to `job` every `every` items and stopping early once it is cancelled."""
+    count = 0
+    for item in items:
+        if count % every == 0:
+            if job.cancelled:
+                return
+            job.report(count)
+        yield item
+        count += 1
+    job.report(count)
+
+
+def current_owner() -> str:
+    """Identify the owner of new jobs by browser session."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+
+def display_job(job: Job, key_prefix: str = "jobs") -> None:
+    """Render the status, progress, throughput and error of a job, with a cancel button."""
+    st.markdown(f"**{job.description}** — {job.status}")
+    if job.total:
+        st.progress(min(job.progress / job.total, 1.0), text=f"{job.progress} of {job.total}")
+    if job.started_at is not None:
+        st.caption(f"{job.elapsed:.1f}s elapsed, {job.throughput:.1f} items/s")
+    if isinstance(job.result, dict) and not job.active:
+        st.caption(", ".join(f"{name}: {value}" for name, value in job.result.items()))
+    if job.error:
+        st.error(job.error.splitlines()[0])
+        with st.expander("Error details"):
+            st.code(job.error)
+    if job.active and st.button("Cancel", key=f"{key_prefix}_cancel_{job.id}"):
+        get_job_manager().cancel(job.id)
+        st.rerun()
+
+
+@st.fragment(run_every=2)
+def display_jobs_sidebar() -> None:
+    """Poll and list the background jobs of the current owner."""
+    jobs = get_job_manager().jobs_for(current_owner())
+    if not jobs:
+        return
+    st.markdown("### Background Jobs")
+    for job in jobs:
+        display_job(job)
+        st.markdown("---")
@@ -1,6 +1,22 @@
 import streamlit as st
 import pandas as pd
-import json
+import copy
+import hashlib
+import os
+import time
+from array import array
+from assignment_store import ASSIGNMENT_DB_PATH, DEFAULT_BATCH_SIZE, DEFAULT_LEASE_SECONDS, AssignmentStore
+from annotator_metrics import TimingLog, question_costs, slow_groups, throughput_by_annotator
+from dedup import canonical_value, propagate_labels, record_text
+from job_manager import JobLimitError, current_owner, display_job, get_job_manager, iter_reported
+from path_trie import PathTrie
+from prelabel import HashedTextClassifier, train_and_predict
+from project_snapshot import SNAPSHOT_DIR, STATE_KEYS, pack_records, save_snapshot
+from search_index import index_records
+import serialization
+from span_pretag import RULE_SEPARATOR, SpanTagger, parse_rules, pretag_spans
+from span_suggestions import merge_spans, record_span_suggestions
+from text_windows import DEFAULT_OVERLAP, DEFAULT_WINDOW_SIZE, spans_in_window, to_absolute, window_bounds, window_count
 
 def get_value_from_path(data, path):
     """Extract value from nested JSON using dot notation path"""
@@ -61,33 +77,40 @@ def filter_redundant_paths(selected_paths):
     Remove any paths that are children of a parent path that is also selected.
     A path A is parent of path B if B starts with A + ".".
     """
-    # Convert them to list of (text, path) for easier handling
-    sp_list = [(p["text"], p["path"]) for p in selected_paths]
-    # Sort shorter paths first so we remove children last
-    sp_list.sort(key=lambda x: len(x[1]))
+    # A trie of the selected paths answers each ancestor check in O(path depth)
+    trie = PathTrie(p["path"] for p in selected_paths)
 
     final_paths = []
-    for text_i, path_i in sp_list:
-        # Check if path_i has a parent in final_paths
-        is_child = False
-        for text_j, path_j in final_paths:
-            if path_i.startswith(path_j + "."):
-                # path_j is a parent of path_i
-                is_child = True
-                break
-        if not is_child:
-            final_paths.append((text_i, path_i))
-
-    # Convert back to the original "text/path" dict format
-    return [{"text": t, "path": p} for t, p in final_paths]
-
-def create_dataframe_from_json(json_data, selected_paths):
-    """Create a DataFrame from JSON data using selected paths"""
-    if isinstance(selected_paths, str):
-        selected_paths = json.loads(selected_paths)
+    seen = set()
+    for path_info in selected_paths:
+        path = path_info["path"]
+        if path in seen or trie.has_ancestor(path):
+            continue
+        seen.add(path)
+        final_paths.append({"text": path_info["text"], "path": path})
+    return final_paths
+
+def dataset_paths(selected_paths, metadata_paths=None):
+    """
+    Return the columns of the dataset: the non-redundant selected fields, then the metadata fields.
 
+    Metadata values live in the dataset next to the fields, so every page reads
+    both from the same DataFrame instead of walking the source records again.
+    """
+    if isinstance(selected_paths, str):
+        selected_paths = serialization.loads(selected_paths)
     # Filter selections to avoid duplicates while maintaining order
     filtered_paths = filter_redundant_paths(selected_paths)
+    columns = {path_info['text'] for path_info in filtered_paths}
+    for meta_def in metadata_paths or []:
+        if meta_def['text'] not in columns:
+            columns.add(meta_def['text'])
+            filtered_paths.append({"text": meta_def['text'], "path": meta_def['path']})
+    return filtered_paths
+
+def create_dataframe_from_json(json_data, selected_paths, metadata_paths=None):
+    """Create a DataFrame from JSON data using selected paths"""
+    filtered_paths = dataset_paths(selected_paths, metadata_paths)
     
     records = []
     for item in json_data['data']:
@@ -113,6 +136,153 @@ def create_dataframe_from_json(json_data, selected_paths):
     
     return df
 
+def strip_data_prefix(path):
+    """Split a dot path into parts, dropping the leading 'data' segment."""
+    path_parts = path.split('.')
+    if path_parts and path_parts[0] == 'data':
+        path_parts = path_parts[1:]
+    return path_parts
+
+def find_list_paths(records, limit=10):
+    """Return the "data." paths whose values are lists in the first `limit` records, in first-seen order."""
+    list_paths = {}
+
+    def walk(value, path):
+        if isinstance(value, list):
+            if path:
+                list_paths[path] = None
+            for item in value[:limit]:
+                walk(item, path)
+        elif isinstance(value, dict):
+            for key, child in value.items():
+                walk(child, f"{path}.{key}" if path else key)
+
+    for record in records[:limit]:
+        walk(record, "")
+    return [f"data.{path}" for path in list_paths]
+
+def iter_exploded_rows(records, filtered_paths, explode_path):
+    """
+    Yield (source record index, row values) with one row per element of the list at `explode_path`.
+
+    Lists along the explode path are walked element by element, and every
+    selected path is resolved from the deepest object it shares with the explode
+    path. For the explode path sentence.NE, "sentence.NE.begin" is read from the
+    entity itself, "sentence.text" from the sentence holding it and "title" from
+    the record. Rows are produced one at a time, nothing is buffered.
+    """
+    explode_parts = strip_data_prefix(explode_path)
+    resolvers = []
+    for path_info in filtered_paths:
+        path_parts = strip_data_prefix(path_info['path'])
+        shared = 0
+        while shared < min(len(path_parts), len(explode_parts)) and path_parts[shared] == explode_parts[shared]:
+            shared += 1
+        resolvers.append((shared, path_parts))
+
+    def walk(obj, depth, context):
+        # context[d] is the object reached after d segments of the explode path
+        if depth == len(explode_parts):
+            yield context
+            return
+        if not isinstance(obj, dict):
+            return
+        value = obj.get(explode_parts[depth])
+        if isinstance(value, list):
+            for element in value:
+                # Lists of lists are looked through, like get_nested_value does
+                if isinstance(element, list):
+                    for item in element:
+                        yield from walk(item, depth + 1, context + [item])
+                else:
+                    yield from walk(element, depth + 1, context + [element])
+        elif value is not None:
+            yield from walk(value, depth + 1, context + [value])
+
+    for source_idx, record in enumerate(records):
+        for context in walk(record, 0, [record]):
+            yield source_idx, [
+                get_nested_value(context[shared], path_parts[shared:])
+                for shared, path_parts in resolvers
+            ]
+
+def create_exploded_dataframe(json_data, selected_paths, explode_path, metadata_paths=None):
+    """
+    Create a DataFrame with one row per element of the list at `explode_path`.
+
+    Returns the DataFrame and a compact array mapping every row to the index of
+    the source record it was exploded from.
+    """
+    filtered_paths = dataset_paths(selected_paths, metadata_paths)
+
+    # Rows are appended straight into the columns, so no list of row dicts is ever held
+    columns = [[] for _ in filtered_paths]
+    row_sources = array('I')
+    for source_idx, values in iter_exploded_rows(json_data['data'], filtered_paths, explode_path):
+        row_sources.append(source_idx)
+        for column, value in zip(columns, values):
+            column.append(value)
+
+    df = pd.DataFrame({
+        path_info['text']: column for path_info, column in zip(filtered_paths, columns)
+    }, columns=[path_info['text'] for path_info in filtered_paths])
+    return df, row_sources
+
+def build_dataset(job, records, selected_columns, explode_path, metadata_columns):
+    """
+    Background job: flatten the records into the labeling dataset, exploded when an explode path was chosen.
+
+    Returns the dataset, its row sources and the records packed as compact JSON
+    text, which replace the parsed records once the dataset holds the selected values.
+    """
+    rows = {"data": iter_reported(job, records)}
+    if explode_path:
+        dataset, row_sources = create_exploded_dataframe(rows, selected_columns, explode_path, metadata_columns)
+    else:
+        dataset, row_sources = create_dataframe_from_json(rows, selected_columns, metadata_columns), None
+    if job.cancelled:
+        return None
+    return dataset, row_sources, pack_records(records)
+
+def load_dataset(json_data, selected_columns):
+    """
+    Build the labeling dataset in a background job and store it in the session once it is done.
+
+    Returns whether the dataset is in the session; until then the build progress is shown.
+    """
+    manager = get_job_manager()
+    job = manager.get(st.session_state.get("dataset_job"))
+    if job is not None and not job.active:
+        del st.session_state["dataset_job"]
+        built = manager.collect(job.id)
+        if built is not None:
+            st.session_state.dataset, st.session_state.row_sources, records = built
+            st.session_state.json_data = dict(json_data, data=records)
+            return True
+        job = None  # A failed or cancelled build is started again
+    if job is None:
+        job = manager.submit(
+            current_owner(), "dataset", "Build the labeling dataset", build_dataset,
+            json_data['data'], selected_columns, st.session_state.get("explode_path"),
+            st.session_state.get("metadata_columns", []), total=len(json_data['data']), internal=True
+        )
+        st.session_state.dataset_job = job.id
+    display_dataset_build(job.id)
+    return False
+
+@st.fragment(run_every=1)
+def display_dataset_build(job_id):
+    """Show the progress of the dataset build and rerun the page once it is done."""
+    job = get_job_manager().get(job_id)
+    if job is None or not job.active:
+        st.rerun()
+    display_job(job, key_prefix="dataset_build")
+
+def source_index(row_idx):
+    """Return the index of the source record a dataset row came from."""
+    row_sources = st.session_state.get("row_sources")
+    return row_sources[row_idx] if row_sources is not None else row_idx
+
 def format_value(value):
     """Format a single value for display."""
     if isinstance(value, dict):
@@ -131,13 +301,392 @@ def format_value(value):
             for item in value:
                 item_lines = []
                 for k, v in item.items():
-                    item_lines.append(f'"{k}" : {json.dumps(v, ensure_ascii=False)}')
+                    item_lines.append(f'"{k}" : {serialization.dumps(v)}')
                 formatted_items.append("\n".join(item_lines))
             return "\n\n".join(formatted_items)
         else:
             return ", ".join(map(str, value))
     return str(value)
 
+def display_text(value):
+    """Return a cell value as the text that is displayed, annotated and uploaded."""
+    return format_value(value) if isinstance(value, (dict, list)) else str(value)
+
+def field_window(col, length, selector=True):
+    """
+    Return the [start, end) offsets of the window of a text field shown for the current record.
+
+    The window is chosen with a number input keyed by field and record, rendered
+    only when `selector` is True, so a span question over the same field reads
+    the window picked next to the record display.
+    """
+    size = st.session_state.get("text_window_size", DEFAULT_WINDOW_SIZE)
+    overlap = st.session_state.get("text_window_overlap", DEFAULT_OVERLAP)
+    count = window_count(length, size, overlap)
+    if count == 1:
+        return 0, length
+    key = f"text_window_{col}_{st.session_state.current_index}"
+    if selector:
+        st.number_input(f"Window of {col} (1-{count})", min_value=1, max_value=count, value=1, key=key)
+    start, end = window_bounds(length, st.session_state.get(key, 1) - 1, size, overlap)
+    if selector:
+        st.caption(f"Characters {start:,}-{end:,} of {length:,}")
+    return start, end
+
+def get_label_queue(dataset):
+    """Return the dataset rows to label, in order, skipping collapsed duplicates."""
+    duplicate_of = st.session_state.get("duplicate_of", {})
+    return [idx for idx in range(len(dataset)) if idx not in duplicate_of]
+
+def search_label_queue(dataset, query):
+    """Return the label queue restricted to the records matching `query`, filtered once per query and index."""
+    index = st.session_state.search_index
+    duplicate_of = st.session_state.get("duplicate_of", {})
+    key = (query, id(index), id(duplicate_of), len(duplicate_of))
+    cached = st.session_state.get("search_queue")
+    if cached is None or cached[0] != key:
+        # The matches are sorted like the label queue, so dropping collapsed duplicates keeps its order
+        cached = (key, [idx for idx in index.search(query).tolist() if idx not in duplicate_of])
+        st.session_state.search_queue = cached
+    return cached[1]
+
+def export_labeled_csv(job, labeled_df, path, chunk_size=10000):
+    """Background job: write the labeled dataset to a CSV file in chunks, reporting progress."""
+    for start in range(0, len(labeled_df), chunk_size):
+        if job.cancelled:
+            return None
+        labeled_df.iloc[start:start + chunk_size].to_csv(
+            path, index=False, mode="w" if start == 0 else "a", header=start == 0
+        )
+        job.report(min(start + chunk_size, len(labeled_df)))
+    return path
+
+def store_response(dataset, row_idx, question_title, response):
+    """Store an answer in the dataset; list answers (rankings, spans) need an object column and `.at`."""
+    if question_title not in dataset.columns:
+        dataset[question_title] = pd.Series([None] * len(dataset), index=dataset.index, dtype=object)
+    elif isinstance(response, list) and dataset[question_title].dtype != object:
+        dataset[question_title] = dataset[question_title].astype(object)
+    dataset.at[row_idx, question_title] = response
+    # The labeled copy handed to uploads and exports is out of date now
+    st.session_state.pop("labeled_dataset", None)
+
+def get_labeled_dataset():
+    """
+    Return a copy of the labeled dataset with representative labels copied onto collapsed duplicates.
+
+    Always a copy: exports and uploads read it from job threads while the
+    playground keeps storing answers into the session's dataset. The copy is
+    kept until an answer is stored or the dataset, duplicates or questions
+    change, so reruns of the upload page reuse it; callers must not modify it.
+    """
+    dataset = st.session_state.dataset
+    duplicate_of = st.session_state.get("duplicate_of", {})
+    question_titles = [q['question_title'] for q in st.session_state.get("questions", [])]
+    key = (id(dataset), id(duplicate_of), len(duplicate_of), tuple(question_titles))
+    cached = st.session_state.get("labeled_dataset")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    labeled = propagate_labels(dataset, duplicate_of, question_titles)
+    labeled = labeled if labeled is not dataset else dataset.copy()
+    st.session_state.labeled_dataset = (key, labeled)
+    return labeled
+
+def update_search_index(dataset):
+    """Index the selected display fields and metadata of every record in a background job, once per dataset."""
+    if "search_index" in st.session_state:
+        return
+    job = get_job_manager().get(st.session_state.get("search_index_job"))
+    if job is not None and job.active:
+        return
+    if job is not None and job.status == "completed":
+        st.session_state.search_index = get_job_manager().collect(job.id)
+        del st.session_state["search_index_job"]
+        return
+
+    # A failed or cancelled build is started again
+    field_cols = [col['text'] for col in st.session_state.get("selected_columns", []) if col['text'] in dataset.columns]
+    metadata_cols = [meta['text'] for meta in st.session_state.get("metadata_columns", []) if meta['text'] in dataset.columns]
+    # Selecting the columns copies them, so the job never reads the frame answers are stored into
+    rows = zip(
+        dataset[field_cols].itertuples(index=False, name=None),
+        dataset[metadata_cols].itertuples(index=False, name=None)
+    )
+    job = get_job_manager().submit(
+        current_owner(), "search_index", "Index records for search", index_records,
+        rows, metadata_cols, total=len(dataset), internal=True
+    )
+    st.session_state.search_index_job = job.id
+
+def answered_value(question, answer):
+    """Return a stored playground answer as a label (Label) or list of labels (Multi-label), or None."""
+    if answer is None or (not isinstance(answer, list) and pd.isna(answer)):
+        return None
+    if question['question_type'] == "Multi-label":
+        labels = answer if isinstance(answer, list) else [label.strip() for label in str(answer).split(",")]
+        return [label for label in labels if label]
+    return str(answer)
+
+def prelabel_questions():
+    return [q for q in st.session_state.get("questions", []) if q['question_type'] in ("Label", "Multi-label")]
+
+def collect_job_results(jobs_key, results_key):
+    """Move the results of finished per-question jobs (e.g. "prelabel_jobs") into the session (e.g. "prelabels")."""
+    results = st.session_state.setdefault(results_key, {})
+    for question_title, job_id in list(st.session_state.get(jobs_key, {}).items()):
+        job = get_job_manager().get(job_id)
+        if job is None or job.active:
+            continue
+        if job.status == "completed":
+            results[question_title] = get_job_manager().collect(job_id)
+        del st.session_state[jobs_key][question_title]
+
+def display_prelabeling(dataset):
+    """Train a local pre-labeling model per Label/Multi-label question and score every record with it."""
+    questions = prelabel_questions()
+    if not questions:
+        return
+    collect_job_results("prelabel_jobs", "prelabels")
+    field_cols = [col['text'] for col in st.session_state.get("selected_columns", []) if col['text'] in dataset.columns]
+
+    with st.expander("🤖 Pre-labeling"):
+        st.markdown("Train a small CPU model on the records labeled so far and suggest labels for the rest. "
+                    "Suggestions are preselected in the form and uploaded to Argilla with their scores.")
+        for question in questions:
+            title = question['question_title']
+            answered = dataset[title] if title in dataset.columns else pd.Series(dtype=object)
+            labeled = {
+                row: value for row, value in
+                ((row, answered_value(question, answer)) for row, answer in enumerate(answered))
+                if value
+            }
+            prelabels = st.session_state.prelabels.get(title)
+            status = f"**{title}**: {len(labeled)} labeled records"
+            if prelabels is not None:
+                status += f", suggestions from a model trained on {prelabels.trained_on}"
+            st.markdown(status)
+            running = title in st.session_state.get("prelabel_jobs", {})
+            if st.button("Train and pre-label", key=f"prelabel_{title}", disabled=running or not labeled):
+                # A fresh model per click: refitting the old one would count the earlier labels again
+                # and keep decaying its learning rate
+                model = HashedTextClassifier(question['labels'], multi_label=question['question_type'] == "Multi-label")
+                st.session_state.setdefault("prelabel_models", {})[title] = model
+                texts = [record_text(values) for values in dataset[field_cols].itertuples(index=False, name=None)]
+                try:
+                    job = get_job_manager().submit(
+                        current_owner(), "prelabel", f"Pre-label '{title}'", train_and_predict,
+                        model, texts, labeled, total=len(texts)
+                    )
+                    st.session_state.setdefault("prelabel_jobs", {})[title] = job.id
+                    st.rerun()
+                except JobLimitError as e:
+                    st.error(str(e))
+
+        if st.session_state.prelabels:
+            order_by = st.selectbox(
+                "Order the queue by the model's uncertainty on",
+                [None] + list(st.session_state.prelabels),
+                format_func=lambda title: "Don't reorder" if title is None else title,
+                key="uncertainty_order"
+            )
+            if st.session_state.get("active_uncertainty_order") != order_by:
+                st.session_state.active_uncertainty_order = order_by
+                st.session_state.current_index = 0
+
+def display_span_pretagging(dataset):
+    """Tag every record of each span question with a gazetteer and regex rules, in one background pass."""
+    questions = [q for q in st.session_state.get("questions", [])
+                 if q['question_type'] == "SpanQuestion" and q.get('span_field') in dataset.columns]
+    if not questions:
+        return
+    collect_job_results("span_pretag_jobs", "span_pretags")
+
+    with st.expander("🏷️ Span pre-tagging"):
+        st.markdown(f"List terms or regular expressions with their label, one `text {RULE_SEPARATOR} label` per line. "
+                    "Every occurrence in every record becomes a suggested span, reviewed in the form and "
+                    "uploaded to Argilla as a suggestion.")
+        for question in questions:
+            title = question['question_title']
+            config = question.get("span_pretag", {})
+            st.markdown(f"**{title}** ({question['span_field']}; labels: {', '.join(question['labels'])})")
+            col1, col2 = st.columns(2)
+            gazetteer_text = col1.text_area("Gazetteer", value=config.get("gazetteer", ""), key=f"pretag_terms_{title}",
+                                            placeholder=f"서울특별시 {RULE_SEPARATOR} {question['labels'][0]}")
+            rules_text = col2.text_area("Regex rules", value=config.get("rules", ""), key=f"pretag_rules_{title}",
+                                        placeholder=f"제\\d+조 {RULE_SEPARATOR} {question['labels'][0]}")
+            ignore_case = col1.checkbox("Ignore case", value=config.get("ignore_case", False),
+                                        key=f"pretag_ignore_case_{title}")
+            whole_words = col2.checkbox("Whole words only", value=config.get("whole_words", False),
+                                        key=f"pretag_whole_words_{title}",
+                                        help="Leave off for Korean and other languages that attach particles to words.")
+            gazetteer, gazetteer_errors = parse_rules(gazetteer_text, question['labels'])
+            rules, rule_errors = parse_rules(rules_text, question['labels'], regex=True)
+            for error in gazetteer_errors:
+                st.warning(f"Gazetteer {error[0].lower()}{error[1:]}")
+            for error in rule_errors:
+                st.warning(f"Regex rules {error[0].lower()}{error[1:]}")
+
+            pretags = st.session_state.span_pretags.get(title)
+            if pretags is not None:
+                st.caption(f"{pretags.span_count:,} spans suggested in {len(pretags):,} records"
+                           + "".join(f", {count:,} {outcome.replace('_', ' ')}" for outcome, count in pretags.stats.items()
+                                     if outcome != "tagged"))
+            running = title in st.session_state.get("span_pretag_jobs", {})
+            if st.button("Pre-tag all records", key=f"pretag_{title}", disabled=running or not (gazetteer or rules)):
+                # Kept with the question, so project snapshots keep the rules too
+                question["span_pretag"] = {"gazetteer": gazetteer_text, "rules": rules_text,
+                                           "ignore_case": ignore_case, "whole_words": whole_words}
+                tagger = SpanTagger(gazetteer, rules, ignore_case=ignore_case, whole_words=whole_words)
+                # The job reads its own copy of the field while answers keep being stored into the dataset
+                texts = map(display_text, dataset[question['span_field']].copy())
+                try:
+                    job = get_job_manager().submit(
+                        current_owner(), "pretag", f"Pre-tag spans of '{title}'", pretag_spans,
+                        tagger, texts, question['labels'], total=len(dataset)
+                    )
+                    st.session_state.setdefault("span_pretag_jobs", {})[title] = job.id
+                    st.rerun()
+                except JobLimitError as e:
+                    st.error(str(e))
+
+def update_prelabel_model(question, row_idx, response, dataset):
+    """Train the question's pre-labeling model on one more playground answer, unless a job is using it."""
+    model = st.session_state.get("prelabel_models", {}).get(question['question_title'])
+    value = answered_value(question, response)
+    if model is None or not value or question['question_title'] in st.session_state.get("prelabel_jobs", {}):
+        return
+    field_cols = [col['text'] for col in st.session_state.get("selected_columns", []) if col['text'] in dataset.columns]
+    model.partial_fit([record_text(dataset.iloc[row_idx][field_cols])], [value])
+
+def refresh_prelabels(question, prelabels, row_idx, dataset):
+    """Re-score a record about to be shown with the model its answers keep training, unless a job is using it."""
+    model = st.session_state.get("prelabel_models", {}).get(question['question_title'])
+    if model is None or question['question_title'] in st.session_state.get("prelabel_jobs", {}):
+        return
+    field_cols = [col['text'] for col in st.session_state.get("selected_columns", []) if col['text'] in dataset.columns]
+    prelabels.refresh(row_idx, model, record_text(dataset.iloc[row_idx][field_cols]))
+
+def display_throughput(dataset):
+    """Records per hour per annotator, the questions and record types that cost the most time, and a timing export."""
+    timings = st.session_state.get("annotation_timings")
+    with st.expander("📊 Throughput"):
+        if not timings:
+            st.caption("Submit a few records to see annotation timings.")
+            return
+        frame = timings.to_frame()
+        st.markdown("**Records per hour**")
+        st.dataframe(throughput_by_annotator(frame))
+        st.markdown("**Seconds per question**")
+        st.caption("Estimated from the records where the preselected answer was changed.")
+        costs = question_costs(timings)
+        if costs.empty:
+            st.caption("Not enough submitted records yet.")
+        else:
+            st.dataframe(costs, hide_index=True)
+        metadata_cols = [col['text'] for col in st.session_state.get("metadata_columns", []) if col['text'] in dataset.columns]
+        if metadata_cols:
+            group_by = st.selectbox("Slow record types by", metadata_cols, key="throughput_group_by")
+            st.dataframe(slow_groups(frame, dataset[group_by]))
+        st.download_button(
+            "Export timings (CSV)",
+            frame.to_csv(index=False).encode("utf-8"),
+            file_name="annotation_timings.csv",
+            mime="text/csv"
+        )
+
+def dataset_fingerprint(dataset, columns):
+    """Return a short content hash of the selected fields, so sessions that loaded the same data share a project."""
+    cached = st.session_state.get("assignment_fingerprint")
+    if cached and cached[0] == id(dataset):
+        return cached[1]
+    digest = hashlib.blake2b(str(len(dataset)).encode("utf-8"), digest_size=6)
+    for col in columns:
+        for value in dataset[col]:
+            digest.update(canonical_value(value).encode("utf-8"))
+            digest.update(b"\x1f")
+    st.session_state.assignment_fingerprint = (id(dataset), digest.hexdigest())
+    return digest.hexdigest()
+
+def release_assignment(store):
+    store.release(st.session_state.annotator_name or "anonymous")
+    st.session_state.use_assignments = False
+
+def display_assignment_settings(dataset):
+    """Set up or join a shared assignment project; return its store when the playground should lease from it."""
+    field_cols = [col['text'] for col in st.session_state.get("selected_columns", []) if col['text'] in dataset.columns]
+    with st.expander("👥 Shared assignment"):
+        st.markdown("Split the records among annotators of this deployment: each one leases a batch at a time, "
+                    "so nobody labels a record someone else already has.")
+        project = st.text_input("Project", value=f"dataset-{dataset_fingerprint(dataset, field_cols)}",
+                                key="assignment_project",
+                                help="Sessions that loaded the same records get the same default project.")
+        store = AssignmentStore(ASSIGNMENT_DB_PATH, project)
+        settings = store.settings()
+        if settings is None:
+            col1, col2, col3 = st.columns(3)
+            batch_size = col1.number_input("Records per batch", min_value=1, value=DEFAULT_BATCH_SIZE)
+            overlap = col2.number_input("Annotators per record", min_value=1, value=1,
+                                        help="More than one lets you measure agreement between annotators.")
+            lease_minutes = col3.number_input("Lease (minutes)", min_value=1, value=DEFAULT_LEASE_SECONDS // 60)
+            # Every session partitions the same rows in the same order, whatever its search or queue order
+            rows = get_label_queue(dataset)
+            if st.button("Create project", disabled=not rows):
+                store.create(rows, int(batch_size), int(overlap), int(lease_minutes) * 60)
+                st.rerun()
+            return None
+
+        progress = store.progress()
+        st.caption(f"{settings['total_rows']} records in batches of {settings['batch_size']}, "
+                   f"{settings['overlap']} annotator(s) per record: {progress['done']} of {progress['copies']} "
+                   f"batches done, {progress['leased']} in progress")
+        if progress["completed_by_annotator"]:
+            st.dataframe(pd.DataFrame(
+                list(progress["completed_by_annotator"].items()), columns=["Annotator", "Records"]
+            ), hide_index=True)
+        if settings["overlap"] > 1:
+            agreement = store.agreement()
+            if agreement:
+                st.dataframe(pd.DataFrame([
+                    {"Question": question, "Records": count["rows"],
+                     "Agreement": f"{count['agreeing'] / count['rows']:.0%}"}
+                    for question, count in agreement.items()
+                ]), hide_index=True)
+        use_store = st.checkbox("Take my records from this project", key="use_assignments")
+        if use_store:
+            st.button("Release my batch", on_click=release_assignment, args=(store,),
+                      help="Give your unfinished batch back to the project and stop taking records from it.")
+        return store if use_store else None
+
+def display_snapshot_settings(dataset):
+    """Save the dataset, selections, questions and answers so far as a project snapshot, in the background."""
+    field_cols = [col['text'] for col in st.session_state.get("selected_columns", []) if col['text'] in dataset.columns]
+    with st.expander("💾 Project snapshot"):
+        st.markdown("Save the project to reopen it later from the upload page, "
+                    "without uploading the file and choosing the columns and questions again.")
+        name = st.text_input("Snapshot name", value=f"project-{dataset_fingerprint(dataset, field_cols)}",
+                             key="snapshot_name")
+        if st.button("Save snapshot", disabled=not name.strip()):
+            # The job works on a copy, so annotating can go on while it writes
+            state = {key: copy.deepcopy(st.session_state.get(key)) for key in STATE_KEYS}
+            state.update({
+                "dataset": dataset.copy(),
+                "row_sources": copy.copy(st.session_state.get("row_sources")),
+                "duplicate_of": dict(st.session_state.get("duplicate_of", {})),
+                "json_data": st.session_state.get("json_data"),
+                "record_origins": st.session_state.get("record_origins"),
+                "annotation_timings": copy.deepcopy(st.session_state.get("annotation_timings")),
+            })
+            path = os.path.join(SNAPSHOT_DIR, name.strip())
+            os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+            try:
+                get_job_manager().submit(
+                    current_owner(), "snapshot", f"Save project snapshot '{name.strip()}'",
+                    save_snapshot, path, state
+                )
+                st.success(f"Saving the project to '{path}' in the background.")
+            except JobLimitError as e:
+                st.error(str(e))
+
 def display_labeling_page():
     st.set_page_config(layout="wide")
     st.title("Playground for Labelling before uploading to Argilla")
@@ -148,6 +697,14 @@ def display_labeling_page():
         st.session_state.labels_selected = {}
     if "labeling_complete" not in st.session_state:
         st.session_state.labeling_complete = False
+    if "text_window_size" not in st.session_state:
+        st.session_state.text_window_size = DEFAULT_WINDOW_SIZE
+    if "text_window_overlap" not in st.session_state:
+        st.session_state.text_window_overlap = DEFAULT_OVERLAP
+    if "annotation_timings" not in st.session_state:
+        st.session_state.annotation_timings = TimingLog()
+    if "annotator_name" not in st.session_state:
+        st.session_state.annotator_name = current_owner()[:8]
     
     # Get the JSON data and selected columns from session state
     json_data = st.session_state.get("json_data")  # Make sure to store the original JSON data
@@ -155,7 +712,10 @@ def display_labeling_page():
 
     # Create DataFrame if not already created
     if "dataset" not in st.session_state and json_data and selected_columns:
-        st.session_state.dataset = create_dataframe_from_json(json_data, selected_columns)
+        if not load_dataset(json_data, selected_columns):
+            return
+    if st.session_state.get("dataset") is not None:
+        update_search_index(st.session_state.dataset)
     
 
     col1, col2 = st.columns([2, 1])
@@ -163,6 +723,58 @@ def display_labeling_page():
     # Left column: Display one dataset record at a time
     with col1:
         dataset = st.session_state.get("dataset")
+        label_queue = get_label_queue(dataset) if dataset is not None else []
+
+        # Restrict the playground cursor to the records matching the search query
+        search_query = st.text_input(
+            "🔍 Search records",
+            key="search_query",
+            help='Words match by prefix, "quoted words" must all appear, field:value filters on metadata '
+                 '(e.g. doc_type:법령) and a leading - excludes matches.'
+        )
+        if st.session_state.get("active_search_query", "") != search_query:
+            st.session_state.active_search_query = search_query
+            st.session_state.current_index = 0
+        if search_query.strip() and "search_index" in st.session_state:
+            label_queue = search_label_queue(dataset, search_query)
+            st.caption(f"{len(label_queue)} matching records")
+        elif search_query.strip():
+            job = get_job_manager().get(st.session_state.get("search_index_job"))
+            progress = f" ({job.progress:,} of {job.total:,} records)" if job is not None and job.total else ""
+            st.caption(f"The search index is still being built{progress}; showing all records.")
+
+        with st.expander("Long text display"):
+            st.number_input("Window size (characters)", min_value=200, step=500, key="text_window_size",
+                            help="Text fields longer than this are shown one window at a time.")
+            st.number_input("Window overlap (characters)", min_value=0, step=50, key="text_window_overlap")
+
+        assignment_store = None
+        if dataset is not None:
+            display_throughput(dataset)
+            display_prelabeling(dataset)
+            display_span_pretagging(dataset)
+            assignment_store = display_assignment_settings(dataset)
+            display_snapshot_settings(dataset)
+            # Most uncertain records first, so every answer teaches the model the most
+            order_by = st.session_state.get("active_uncertainty_order")
+            if order_by in st.session_state.get("prelabels", {}):
+                uncertainty = st.session_state.prelabels[order_by].uncertainty()
+                label_queue = sorted(label_queue, key=lambda idx: -uncertainty[idx])
+
+        if assignment_store is not None:
+            # The leased batch replaces the local queue; reruns renew the lease while the annotator works
+            lease = assignment_store.lease(st.session_state.annotator_name or "anonymous")
+            if lease is None:
+                st.info("No records are left to assign to you in this project.")
+                label_queue = []
+            else:
+                label_queue = lease.rows
+                lease_key = (assignment_store.project, lease.batch, lease.copy)
+                if st.session_state.get("assignment_batch") != lease_key:
+                    st.session_state.assignment_batch = lease_key
+                    st.session_state.current_index = label_queue.index(lease.pending[0]) if lease.pending else 0
+                st.caption(f"Batch {lease.batch + 1}: {len(lease.completed)} of {len(lease.rows)} done, "
+                           f"lease until {time.strftime('%H:%M', time.localtime(lease.leased_until))}")
         
         # Navigation buttons in a row
         col1_nav, col2_nav = st.columns([1, 1])
@@ -173,7 +785,7 @@ def display_labeling_page():
                 st.rerun()
 
         with col2_nav:
-            if st.button("Next ➡️", key="next_btn") and st.session_state.current_index < len(dataset) - 1:
+            if st.button("Next ➡️", key="next_btn") and st.session_state.current_index < len(label_queue) - 1:
                 st.session_state.current_index += 1
                 st.session_state.form_submitted = False
                 st.rerun()
@@ -181,8 +793,17 @@ def display_labeling_page():
         if dataset is not None and not dataset.empty:
             st.markdown("#### Dataset Records")
             
-            if 0 <= st.session_state.current_index < len(dataset):
-                record = dataset.iloc[st.session_state.current_index]
+            if 0 <= st.session_state.current_index < len(label_queue):
+                record = dataset.iloc[label_queue[st.session_state.current_index]]
+                # Time each record from the first render that shows it
+                if st.session_state.get("timing_row") != label_queue[st.session_state.current_index]:
+                    st.session_state.timing_row = label_queue[st.session_state.current_index]
+                    st.session_state.record_shown_at = time.time()
+                st.caption(f"Record {st.session_state.current_index + 1} of {len(label_queue)}")
+                record_origins = st.session_state.get("record_origins")
+                if record_origins:
+                    shard_name, position = record_origins[source_index(label_queue[st.session_state.current_index])]
+                    st.caption(f"Source: {shard_name}, record {position}")
                 
                 # Get only the user-selected data columns (exclude columns that correspond to question titles)
                 question_titles = [q.get('question_title', '') for q in st.session_state.get("questions", [])]
@@ -194,13 +815,23 @@ def display_labeling_page():
                     if col_name in dataset.columns and col_name not in question_titles:
                         data_columns.append(col_name)
                 
-                # Build an ordered dictionary for the current record
+                # Build an ordered dictionary for the current record; long text fields are shown window by window
                 record_dict = {}
+                long_fields = []
                 for col in data_columns:
-                    record_dict[col] = record[col]
+                    if len(display_text(record[col])) > st.session_state.text_window_size:
+                        long_fields.append(col)
+                    else:
+                        record_dict[col] = record[col]
                 
                 # Display the chosen columns recursively with our format_value function
-                st.code(format_value(record_dict), language="json")
+                if record_dict:
+                    st.code(format_value(record_dict), language="json")
+                for col in long_fields:
+                    text = display_text(record[col])
+                    start, end = field_window(col, len(text))
+                    st.markdown(f"**{col}**")
+                    st.code(text[start:end], language=None, wrap_lines=True)
 
     # Right column: Questions form
     with col2:
@@ -212,20 +843,36 @@ def display_labeling_page():
             st.session_state.form_submitted = False
 
         user_responses = {}
-        if questions:
+        # The answer each question starts from, so a submit can tell which answers the annotator changed
+        preselected = {}
+        if questions and 0 <= st.session_state.current_index < len(label_queue):
+            st.text_input("Annotator", key="annotator_name", help="Timings are recorded per annotator name.")
             # Create a form for questions
             with st.form(key=f"questions_form_{st.session_state.current_index}"):
                 for idx, question in enumerate(questions, start=1):
                     st.markdown(f"**{idx}. {question['question_title']}**")
 
-                    if question['question_type'] == "Label" or "SpanQuestion":
+                    prelabels = st.session_state.get("prelabels", {}).get(question['question_title'])
+                    suggestion = None
+                    if prelabels is not None and 0 <= st.session_state.current_index < len(label_queue):
+                        refresh_prelabels(question, prelabels, label_queue[st.session_state.current_index],
+                                          st.session_state.dataset)
+                        suggestion, score = prelabels.suggestion(label_queue[st.session_state.current_index])
+                        scores = zip(suggestion, score) if prelabels.multi_label else [(suggestion, score)]
+                        st.caption("🤖 Suggested: " + (", ".join(f"{label} ({p:.2f})" for label, p in scores) or "none"))
+
+                    if question['question_type'] == "Label":
                         response = st.radio(
                             f"{question['label_description']}",
                             question['labels'],
+                            index=question['labels'].index(suggestion) if suggestion in question['labels'] else 0,
                             key=f"label_{idx}_{st.session_state.current_index}",
                             horizontal=True
                         )
                         user_responses[question['question_title']] = response
+                        preselected[question['question_title']] = (
+                            suggestion if suggestion in question['labels'] else question['labels'][0]
+                        )
 
                     elif question['question_type'] == "Multi-label":
                         selected_labels = []
@@ -233,10 +880,13 @@ def display_labeling_page():
                             if st.checkbox(
                                 label, 
                                 key=f"multi_label_{label}_{st.session_state.current_index}",
-                                value=False  # Reset to unchecked
+                                value=bool(suggestion) and label in suggestion  # Start from the suggestion, if any
                             ):
                                 selected_labels.append(label)
                         user_responses[question['question_title']] = ", ".join(selected_labels)
+                        preselected[question['question_title']] = ", ".join(
+                            label for label in question['labels'] if suggestion and label in suggestion
+                        )
 
                     elif question['question_type'] == "Rating":
                         response = st.radio(
@@ -246,12 +896,14 @@ def display_labeling_page():
                             horizontal=True
                         )
                         user_responses[question['question_title']] = response
+                        preselected[question['question_title']] = 1
 
                     elif question['question_type'] == "TextQuestion":
                         response = st.text_input(
                             question['label_description']
                         )
                         user_responses[question['question_title']] = response
+                        preselected[question['question_title']] = ""
                     elif question['question_type'] == "Ranking":
                         # Create a list for reordering
                         ranking_options = question['labels']
@@ -272,37 +924,89 @@ def display_labeling_page():
                         
                         # Store the complete ranking
                         user_responses[question['question_title']] = ranked_items
+                        preselected[question['question_title']] = list(ranking_options)
 
                     elif question['question_type'] == "SpanQuestion":
                         st.markdown(f"**Selected text field for annotation:** {question['span_field']}")
-                        # Display the text that can be annotated
-                        field_text = record[question['span_field']]
+                        # Display the text that can be annotated, exactly as it is uploaded
+                        field_value = record[question['span_field']]
+                        document_text = display_text(field_value)
+                        # Only the window shown next to the record is annotated; offsets are mapped back to the document
+                        window_start, window_end = field_window(question['span_field'], len(document_text), selector=False)
+                        field_text = document_text[window_start:window_end]
                         st.text_area("Text to annotate:", field_text, disabled=True)
-                        
-                        # For now, we'll use a simple text input for spans
-                        # In a real implementation, you might want to add a more sophisticated span selection UI
+
+                        spans = []
+                        if question.get("span_import"):
+                            records = json_data.get("data", []) if json_data else []
+                            record_idx = source_index(label_queue[st.session_state.current_index])
+                            imported = record_span_suggestions(
+                                records[record_idx], field_value, question['span_field'],
+                                question['span_import'], question['labels']
+                            ) if record_idx < len(records) else []
+                            if imported:
+                                st.code("\n".join(
+                                    f"{span['label']}: {field_text[span['start']:span['end']]} "
+                                    f"[{span['start'] + window_start}, {span['end'] + window_start})"
+                                    for span in spans_in_window(imported, window_start, window_end)
+                                ) or f"{len(imported)} imported spans outside this window")
+                                if st.checkbox("Keep imported spans", value=True,
+                                               key=f"span_keep_{idx}_{st.session_state.current_index}"):
+                                    spans.extend(imported)
+                                preselected[question['question_title']] = imported
+
+                        pretags = st.session_state.get("span_pretags", {}).get(question['question_title'])
+                        tagged = pretags.spans(label_queue[st.session_state.current_index]) if pretags else []
+                        if tagged:
+                            st.code("\n".join(
+                                f"{span['label']}: {field_text[span['start']:span['end']]} "
+                                f"[{span['start'] + window_start}, {span['end'] + window_start})"
+                                for span in spans_in_window(tagged, window_start, window_end)
+                            ) or f"{len(tagged)} pre-tagged spans outside this window")
+                            if st.checkbox("Keep pre-tagged spans", value=True,
+                                           key=f"span_pretag_keep_{idx}_{st.session_state.current_index}"):
+                                # Imported spans win over the pre-tagged spans they overlap
+                                spans = merge_spans(spans, tagged)
+                            preselected[question['question_title']] = merge_spans(
+                                preselected.get(question['question_title'], []), tagged
+                            )
+
                         span_text = st.text_input(
                             "Enter the text span to annotate:",
                             key=f"span_{idx}_{st.session_state.current_index}"
                         )
-                        
+
                         if span_text:
-                            # Validate that the entered span exists in the text
-                            if span_text in field_text:
+                            # Validate that the entered span exists in the text, and let the user pick which occurrence
+                            occurrences = [
+                                i for i in range(len(field_text) - len(span_text) + 1)
+                                if field_text.startswith(span_text, i)
+                            ]
+                            if occurrences:
+                                start = st.selectbox(
+                                    "Occurrence",
+                                    occurrences,
+                                    format_func=lambda i: f"at offset {window_start + i}",
+                                    key=f"span_occurrence_{idx}_{st.session_state.current_index}"
+                                ) if len(occurrences) > 1 else occurrences[0]
                                 span_label = st.radio(
                                     f"Select label for span: '{span_text}'",
                                     question['labels'],
                                     key=f"span_label_{idx}_{st.session_state.current_index}",
                                     horizontal=True
                                 )
-                                user_responses[question['question_title']] = {
-                                    'span': span_text,
-                                    'label': span_label,
-                                    'start': field_text.index(span_text),
-                                    'end': field_text.index(span_text) + len(span_text)
-                                }
+                                new_span = to_absolute(
+                                    {'label': span_label, 'start': start, 'end': start + len(span_text)}, window_start
+                                )
+                                # A manual span replaces the imported spans it overlaps
+                                spans = [span for span in spans
+                                         if span['end'] <= new_span['start'] or span['start'] >= new_span['end']]
+                                spans.append(new_span)
+                                spans.sort(key=lambda span: span['start'])
                             else:
                                 st.error("The entered text span was not found in the field text.")
+                        if spans:
+                            user_responses[question['question_title']] = spans
 
                 # Submit button inside the form
                 submit_button = st.form_submit_button("Submit")
@@ -310,15 +1014,39 @@ def display_labeling_page():
                 if submit_button:
                     # Save responses to dataset
                     for question_title, response in user_responses.items():
-                        st.session_state.dataset.loc[
-                            st.session_state.current_index, question_title
-                        ] = response
+                        store_response(
+                            st.session_state.dataset, label_queue[st.session_state.current_index],
+                            question_title, response
+                        )
+                    for question in prelabel_questions():
+                        if question['question_title'] in user_responses:
+                            update_prelabel_model(
+                                question, label_queue[st.session_state.current_index],
+                                user_responses[question['question_title']], st.session_state.dataset
+                            )
+                    st.session_state.annotation_timings.add(
+                        label_queue[st.session_state.current_index],
+                        st.session_state.annotator_name or "anonymous",
+                        time.time() - st.session_state.get("record_shown_at", time.time()),
+                        [question['question_title'] for question in questions
+                         if user_responses.get(question['question_title']) != preselected.get(question['question_title'])]
+                    )
+                    st.session_state.record_shown_at = time.time()
 
                     # Mark form as submitted
                     st.session_state.form_submitted = True
 
+                    if assignment_store is not None:
+                        assignment_store.complete(
+                            st.session_state.annotator_name or "anonymous",
+                            label_queue[st.session_state.current_index], user_responses
+                        )
+                        # Continue with the first record of the lease still to do, or the next lease
+                        st.session_state.assignment_batch = None
+                        st.rerun()
+
                     # Move to next example if not at the end
-                    if st.session_state.current_index < len(dataset) - 1:
+                    elif st.session_state.current_index < len(label_queue) - 1:
                         st.session_state.current_index += 1
                         st.rerun()
                     else:
@@ -336,7 +1064,13 @@ def display_labeling_page():
     # Save labeled data as CSV
     if st.session_state.get("labeling_complete"):
         if st.button("Save labeled data"):
-            labeled_df = pd.DataFrame(st.session_state.dataset)
-            labeled_df.to_csv("labeled_data.csv", index=False)
-            st.success("Labeled data saved as 'labeled_data.csv'!")
-            st.rerun()
\ No newline at end of file
+            labeled_df = get_labeled_dataset()
+            try:
+                # Writing a large CSV runs as a background job so the page stays responsive
+                get_job_manager().submit(
+                    current_owner(), "export", "Save labeled data as 'labeled_data.csv'",
+                    export_labeled_csv, labeled_df, "labeled_data.csv", total=len(labeled_df)
+                )
+                st.success("Saving labeled data as 'labeled_data.csv' in the background.")
+            except JobLimitError as e:
+                st.error(str(e))
\ No newline at end of file
@@ -3,6 +3,8 @@ from upload_page import display_upload_page
 from question_page import display_question_page
 from labeling_page import display_labeling_page
 from upload_to_argilla_page import display_upload_to_argilla_page
+from job_manager import display_jobs_sidebar
+from memory_report import display_memory_report, register_session
 
 # st.set_page_config(layout="wide")
 
@@ -10,6 +12,8 @@ from upload_to_argilla_page import display_upload_to_argilla_page
 if 'page' not in st.session_state:
     st.session_state.page = 1  # Start on page 1
 
+# Track the session for the memory report
+register_session()
 
 # Main page display based on session state
 if st.session_state.page == 1:
@@ -21,6 +25,12 @@ elif st.session_state.page == 3:
 elif st.session_state.page == 4:
     display_upload_to_argilla_page()
 
+# Rendered after the page, which may call st.set_page_config first;
+# jobs keep running in the background while navigating between pages
+with st.sidebar:
+    display_jobs_sidebar()
+    display_memory_report()
+
 # if st.session_state.page == 1:
     
 #     display_labeling_page()
\ No newline at end of file
@@ -0,0 +1,175 @@
+import hmac
+import io
+import os
+import sys
+import threading
+import time
+import weakref
+from array import array
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Environment variable holding the token that unlocks the report of every live session
+OPERATOR_TOKEN_ENV = "ARGILLA_LABELER_OPERATOR_TOKEN"
+# Structures shared by several keys are charged to the first key that reaches them, in this order
+CANONICAL_ORDER = ("json_data", "dataset", "row_sources", "search_index", "record_origins")
+
+_sessions: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+_last_seen: Dict[str, float] = {}
+_sessions_lock = threading.Lock()
+
+
+def deep_sizeof(obj: Any, seen: Optional[Dict[int, Any]] = None) -> int:
+    """
+    Return the bytes used by `obj` and everything it references, counting each object once.
+
+    Objects already in `seen` are skipped, so sizing several structures with the
+    same `seen` mapping attributes shared objects (e.g. strings referenced by both
+    the parsed JSON and the dataset) to the first structure only. `seen` maps ids
+    to the objects themselves: temporaries made during the walk, such as the
+    column Series of a DataFrame, stay alive while it is in use, so their ids are
+    never reused by objects still to be counted.
+    """
+    seen = seen if seen is not None else {}
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, type):
+            continue
+        seen[id(current)] = current
+
+        if isinstance(current, pd.DataFrame):
+            total += int(current.index.memory_usage())
+            stack.extend(current[column] for column in current.columns)
+            continue
+        if isinstance(current, pd.Series) and isinstance(current.dtype, pd.ArrowDtype):
+            # Arrow-backed columns (e.g. from a project snapshot) are counted without converting them to objects
+            total += current.array.nbytes
+            continue
+        if isinstance(current, pd.Series):
+            values = current.to_numpy()
+            total += values.nbytes
+            if values.dtype == object:
+                stack.extend(values)
+            continue
+        if isinstance(current, np.ndarray):
+            total += current.nbytes
+            if current.dtype == object:
+                stack.extend(current.ravel())
+            continue
+
+        if isinstance(current, (pa.Array, pa.ChunkedArray)):
+            # e.g. the packed source records, or the columns of a reopened snapshot
+            total += current.nbytes
+            continue
+
+        if isinstance(current, io.BytesIO):
+            # Uploaded files keep their whole content in the buffer
+            total += sys.getsizeof(current) + current.getbuffer().nbytes
+            continue
+
+        total += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, bytearray, int, float, bool, array)) or current is None:
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return total
+
+
+def memory_breakdown(state: Mapping[str, Any]) -> List[Tuple[str, int]]:
+    """Return (key, bytes) for every session-state entry, largest first, without double counting."""
+    keys = [key for key in CANONICAL_ORDER if key in state]
+    keys += sorted(key for key in state if key not in CANONICAL_ORDER)
+    seen: Dict[int, Any] = {}
+    sizes = [(key, deep_sizeof(state[key], seen)) for key in keys]
+    return sorted(sizes, key=lambda item: -item[1])
+
+
+def register_session() -> None:
+    """Remember the state of the current browser session so operators can report on every live session."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    # ctx.session_state is a wrapper made for each script run; the state it wraps lives as long as the session
+    state = getattr(ctx.session_state, "_state", ctx.session_state)
+    with _sessions_lock:
+        _sessions[ctx.session_id] = state
+        _last_seen[ctx.session_id] = time.time()
+        for session_id in list(_last_seen):
+            if session_id not in _sessions:
+                del _last_seen[session_id]
+
+
+def session_reports() -> List[Dict[str, Any]]:
+    """Return the memory breakdown of every live session, largest first."""
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+    reports = []
+    for session_id, session_state in sessions:
+        try:
+            breakdown = memory_breakdown(session_state.filtered_state)
+        except RuntimeError:
+            # The session changed its state while it was being measured
+            continue
+        reports.append({
+            "session": session_id,
+            "idle_seconds": round(time.time() - _last_seen.get(session_id, time.time())),
+            "total_bytes": sum(size for _, size in breakdown),
+            "breakdown": breakdown,
+        })
+    return sorted(reports, key=lambda report: -report["total_bytes"])
+
+
+def format_bytes(size: float) -> str:
+    """Render a byte count with a binary unit, e.g. "12.3 MB"."""
+    if size < 1024:
+        return f"{int(size)} B"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+
+
+def display_memory_report() -> None:
+    """Sidebar report of the memory held by this session and, for operators, by every live session."""
+    with st.expander("Memory usage"):
+        if st.button("Measure this session", key="memory_measure"):
+            breakdown = memory_breakdown(st.session_state.to_dict())
+            st.caption(f"Total: {format_bytes(sum(size for _, size in breakdown))}")
+            st.table(pd.DataFrame(
+                [(key, format_bytes(size)) for key, size in breakdown if size >= 1024],
+                columns=["Structure", "Size"]
+            ))
+        operator_token = os.environ.get(OPERATOR_TOKEN_ENV)
+        if not operator_token:
+            return
+        # Other users' session state is only shown to whoever holds the operator token
+        entered = st.text_input("Operator token", type="password", key="memory_operator_token")
+        if not entered or not hmac.compare_digest(entered.encode(), operator_token.encode()):
+            return
+        if st.button("Measure all sessions", key="memory_measure_all"):
+            current = get_script_run_ctx()
+            st.table(pd.DataFrame([
+                {
+                    "Session": report["session"][:8] + (" (you)" if current and report["session"] == current.session_id else ""),
+                    "Idle": f"{report['idle_seconds']}s",
+                    "Total": format_bytes(report["total_bytes"]),
+                    "Largest": ", ".join(f"{key} {format_bytes(size)}" for key, size in report["breakdown"][:3]),
+                }
+                for report in session_reports()
+            ]))
@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from async_uploader import encode_batch
+
+# Below this many rows starting the worker processes costs more than it saves
+MIN_PARALLEL_ROWS = 20_000
+# Each task converts this many upload batches, enough to amortize the task round-trip
+CHUNK_BATCHES = 4
+
+EncodedBatch = Tuple[int, bytes, Optional[bytes]]
+# select(positions) returns the picklable inputs of those dataset rows, e.g. a DataFrame slice
+SelectRows = Callable[[range], Any]
+# convert(rows, stats) yields the payloads of rows returned by `select`
+ConvertRows = Callable[[Any, Counter], Iterable[Dict[str, Any]]]
+
+_worker_convert: Optional[ConvertRows] = None
+
+
+def usable_cores() -> int:
+    """Return the cores this process may run on."""
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    """Return the usable cores minus one, left to the server and the uploader's event loop."""
+    return max(1, usable_cores() - 1)
+
+
+def _encode_rows(convert: ConvertRows, rows: Any, batch_size: int,
+                 compress: bool, stats: Counter) -> Iterator[EncodedBatch]:
+    batch: List[Dict[str, Any]] = []
+    for payload in convert(rows, stats):
+        batch.append(payload)
+        if len(batch) == batch_size:
+            yield (len(batch),) + encode_batch(batch, compress)
+            batch = []
+    if batch:
+        yield (len(batch),) + encode_batch(batch, compress)
+
+
+def _init_worker(convert: ConvertRows) -> None:
+    global _worker_convert
+    _worker_convert = convert
+
+
+def _convert_chunk(rows: Any, batch_size: int, compress: bool) -> Tuple[List[EncodedBatch], Counter]:
+    # Only the encoded request bodies travel back to the parent, never the payload dicts
+    stats = Counter()
+    return list(_encode_rows(_worker_convert, rows, batch_size, compress, stats)), stats
+
+
+def iter_converted_batches(convert: ConvertRows, select: SelectRows, total: int, batch_size: int, compress: bool,
+                           workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                           stats: Optional[Counter] = None) -> Iterator[EncodedBatch]:
+    """
+    Convert rows [0, total) into encoded upload batches, in row order, on a process pool.
+
+    `convert` is the small conversion config (e.g. a partial of a module-level
+    function over the field names and question ids); it is pickled to every
+    worker once, when the worker starts. The data travels with the tasks: each
+    carries `select(range(start, stop))` for its own chunk of rows, and at most two
+    chunks per worker are in flight ahead of the consumer, so the dataset is never
+    pickled as a whole. Counts the conversion adds to its stats Counter are merged
+    into `stats`.
+
+    Workers are spawned, not forked: the pool is started from a job thread of the
+    multithreaded Streamlit server, which is unsafe to fork (see ingest.py).
+    Small datasets, or `workers=1`, are converted in the calling thread.
+    """
+    stats = stats if stats is not None else Counter()
+    workers = workers or default_workers()
+    chunk_size = chunk_size or batch_size * CHUNK_BATCHES
+    if workers <= 1 or total < MIN_PARALLEL_ROWS:
+        for start in range(0, total, chunk_size):
+            yield from _encode_rows(convert, select(range(start, min(start + chunk_size, total))),
+                                    batch_size, compress, stats)
+        return
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker, initargs=(convert,)
+    )
+    try:
+        pending = deque()
+        for start in range(0, total, chunk_size):
+            rows = select(range(start, min(start + chunk_size, total)))
+            pending.append(executor.submit(_convert_chunk, rows, batch_size, compress))
+            if len(pending) < workers * 2:
+                continue
+            batches, chunk_stats = pending.popleft().result()
+            stats.update(chunk_stats)
+            yield from batches
+        while pending:
+            batches, chunk_stats = pending.popleft().result()
+            stats.update(chunk_stats)
+            yield from batches
+        executor.shutdown(wait=True)
+    finally:
+        # Also reached when the consumer stops early, e.g. a cancelled upload
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,73 @@
+from typing import Any, Dict, Iterable, Optional
+
+
+class _Node:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.terminal = False
+
+
+class PathTrie:
+    """
+    Trie of dot-notation paths keyed by path segment.
+
+    Children keep the order in which they were first inserted, so inserting the
+    paths produced by `flatten_json` preserves the original JSON key order at every
+    level. Insertion, lookup and ancestor checks cost O(path depth).
+    """
+
+    def __init__(self, paths: Optional[Iterable[str]] = None, sep: str = "."):
+        self.sep = sep
+        self.root = _Node()
+        for path in paths or ():
+            self.insert(path)
+
+    def insert(self, path: str) -> None:
+        node = self.root
+        for part in path.split(self.sep):
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _Node()
+            node = child
+        node.terminal = True
+
+    def _find(self, path: str) -> Optional[_Node]:
+        node = self.root
+        for part in path.split(self.sep):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, path: str) -> bool:
+        node = self._find(path)
+        return node is not None and node.terminal
+
+    def has_ancestor(self, path: str) -> bool:
+        """Return True if a proper prefix of `path` (e.g. "a" or "a.b" for "a.b.c") was inserted."""
+        node = self.root
+        parts = path.split(self.sep)
+        for part in parts[:-1]:
+            node = node.children.get(part)
+            if node is None:
+                return False
+            if node.terminal:
+                return True
+        return False
+
+    def to_tree(self) -> Dict[Optional[str], Any]:
+        """
+        Return the nested dict used by the field-selection tree (leaves map to None).
+
+        An inserted path that also has children, e.g. a value that is a string in
+        some records and an object in others, leads its subtree with a `None` key
+        standing for the path itself.
+        """
+        def build(node: _Node) -> Dict[Optional[str], Any]:
+            tree: Dict[Optional[str], Any] = {None: None} if node.terminal and node is not self.root else {}
+            for part, child in node.children.items():
+                tree[part] = build(child) if child.children else None
+            return tree
+        return build(self.root)
@@ -0,0 +1,179 @@
+import re
+import zlib
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+WORD_RE = re.compile(r"\w+")
+
+BATCH_SIZE = 1024
+
+
+def hashed_features(text: str, n_features: int, ngram_sizes: Sequence[int] = (1, 2, 3)) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the hashed bag of words and character n-grams of a text as (indices, values).
+
+    Character n-grams are taken inside words, which works for agglutinative
+    languages like Korean where a word carries its particles ("법률에", "법률의").
+    Counts are log-scaled and the vector is L2-normalized.
+    """
+    counts: Dict[int, int] = {}
+    for word in WORD_RE.findall(text.lower()):
+        grams = [f"w:{word}"]
+        for size in ngram_sizes:
+            grams.extend(f"{size}:{word[i:i + size]}" for i in range(max(1, len(word) - size + 1)))
+        for gram in grams:
+            index = zlib.crc32(gram.encode("utf-8")) % n_features
+            counts[index] = counts.get(index, 0) + 1
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    values /= np.linalg.norm(values)
+    return indices, values
+
+
+class HashedTextClassifier:
+    """
+    Linear text classifier over hashed n-gram features, trained incrementally with SGD on the CPU.
+
+    Single-label questions use a softmax over the labels, multi-label questions
+    one sigmoid per label. The weights are a dense (n_features, n_labels) matrix,
+    so training on one more example and scoring a batch are both a handful of
+    numpy operations on the rows the texts actually touch.
+    """
+
+    def __init__(self, labels: Sequence[str], multi_label: bool = False, n_features: int = 2 ** 18,
+                 learning_rate: float = 0.5, l2: float = 1e-6):
+        self.labels = list(labels)
+        self.multi_label = multi_label
+        self.n_features = n_features
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.weights = np.zeros((n_features, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+        self.examples_seen = 0
+
+    def _target(self, value: Union[str, Iterable[str]]) -> Optional[np.ndarray]:
+        target = np.zeros(len(self.labels), dtype=np.float32)
+        values = [value] if isinstance(value, str) else list(value)
+        for label in values:
+            if label in self.labels:
+                target[self.labels.index(label)] = 1.0
+        if not target.any() and not self.multi_label:
+            return None
+        return target
+
+    def _activate(self, scores: np.ndarray) -> np.ndarray:
+        if self.multi_label:
+            return 1.0 / (1.0 + np.exp(-scores))
+        scores = scores - scores.max(axis=-1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def partial_fit(self, texts: Iterable[str], values: Iterable[Union[str, Iterable[str]]], epochs: int = 1) -> None:
+        """Update the model with labeled examples; single-label values are label strings, multi-label values lists."""
+        examples = []
+        for text, value in zip(texts, values):
+            target = self._target(value)
+            if target is not None:
+                examples.append((hashed_features(text, self.n_features), target))
+
+        for _ in range(epochs):
+            for (indices, feature_values), target in examples:
+                probabilities = self._activate(feature_values @ self.weights[indices] + self.bias)
+                gradient = probabilities - target
+                # Inverse square-root decay keeps early answers from being overwritten by later ones
+                rate = self.learning_rate / np.sqrt(1.0 + self.examples_seen / 100.0)
+                self.weights[indices] -= rate * (np.outer(feature_values, gradient) + self.l2 * self.weights[indices])
+                self.bias -= rate * gradient
+                self.examples_seen += 1
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Return the (len(texts), n_labels) label probabilities of one batch of texts."""
+        features = [hashed_features(text, self.n_features) for text in texts]
+        lengths = np.array([len(indices) for indices, _ in features])
+        scores = np.tile(self.bias, (len(texts), 1))
+        if lengths.sum():
+            indices = np.concatenate([indices for indices, _ in features])
+            values = np.concatenate([values for _, values in features])
+            rows = np.repeat(np.arange(len(texts)), lengths)
+            # Sparse-dense product: scatter the weighted rows of every text into its score vector
+            np.add.at(scores, rows, values[:, None] * self.weights[indices])
+        return self._activate(scores)
+
+
+@dataclass
+class Prelabels:
+    """
+    Predictions of a question's pre-labeling model for every dataset row.
+
+    `scored_with` is the model's `examples_seen` when the rows were scored;
+    rows re-scored since by `refresh` are listed in `rescored` with theirs.
+    """
+    labels: List[str]
+    multi_label: bool
+    probabilities: np.ndarray
+    trained_on: int
+    scored_with: int = 0
+    rescored: Dict[int, int] = field(default_factory=dict)
+
+    def take(self, rows: Sequence[int]) -> "Prelabels":
+        """Return the predictions of the given rows only, e.g. to send one chunk to a conversion process."""
+        return replace(self, probabilities=self.probabilities[np.asarray(rows, dtype=np.int64)])
+
+    def refresh(self, row: int, model: "HashedTextClassifier", text: str) -> bool:
+        """Re-score one row with `model` if it has learned from more answers since; returns whether it did."""
+        if self.rescored.get(row, self.scored_with) == model.examples_seen:
+            return False
+        self.probabilities[row] = model.predict_proba([text])[0]
+        self.rescored[row] = model.examples_seen
+        return True
+
+    def suggestion(self, row: int) -> Tuple[Any, Any]:
+        """Return the suggested value and score of a row, in the shape Argilla expects."""
+        probabilities = self.probabilities[row]
+        if self.multi_label:
+            chosen = [i for i, p in enumerate(probabilities) if p >= 0.5]
+            return [self.labels[i] for i in chosen], [float(probabilities[i]) for i in chosen]
+        best = int(probabilities.argmax())
+        return self.labels[best], float(probabilities[best])
+
+    def to_suggestion(self, row: int, question_id: Any, agent: str = "local pre-labeling model") -> Optional[Dict[str, Any]]:
+        """Build the bulk-endpoint suggestion body of a row, or None when nothing is predicted."""
+        value, score = self.suggestion(row)
+        if not value:
+            return None
+        return {"question_id": str(question_id), "value": value, "score": score, "type": "model", "agent": agent}
+
+    def uncertainty(self) -> np.ndarray:
+        """Return a per-row uncertainty: 1 minus the top-two margin, or the closeness of labels to 0.5."""
+        if self.multi_label:
+            return 1.0 - 2.0 * np.abs(self.probabilities - 0.5).min(axis=1)
+        if self.probabilities.shape[1] < 2:
+            return 1.0 - self.probabilities[:, 0]
+        top_two = np.sort(self.probabilities, axis=1)[:, -2:]
+        return 1.0 - (top_two[:, 1] - top_two[:, 0])
+
+
+def train_and_predict(job, model: HashedTextClassifier, texts: Sequence[str], labeled: Dict[int, Any],
+                      epochs: int = 5, batch_size: int = BATCH_SIZE) -> Prelabels:
+    """
+    Background job: fit `model` on the labeled rows, then score every row in batches.
+
+    `labeled` maps row positions to their playground answers. Pass an untrained
+    model: every labeled row is fit here, so an already-trained one would see the
+    earlier labels twice. The model object is updated in place, so later
+    playground answers keep training it incrementally; `Prelabels.refresh`
+    re-scores a row from the updated model when it is shown.
+    """
+    model.partial_fit((texts[row] for row in labeled), labeled.values(), epochs=epochs)
+    probabilities = np.zeros((len(texts), len(model.labels)), dtype=np.float32)
+    for start in range(0, len(texts), batch_size):
+        if job.cancelled:
+            break
+        probabilities[start:start + batch_size] = model.predict_proba(texts[start:start + batch_size])
+        job.report(min(start + batch_size, len(texts)))
+    return Prelabels(model.labels, model.multi_label, probabilities, trained_on=len(labeled),
+                     scored_with=model.examples_seen)
@@ -0,0 +1,248 @@
+import os
+import shutil
+import time
+from array import array
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as pa_ipc
+
+import serialization
+from annotator_metrics import TimingLog
+
+# Snapshots are directories under this one, next to the app unless configured otherwise
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_FORMAT = "argilla-labeler-snapshot"
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# Rows per record batch; reading a value only touches the batch holding it
+BATCH_ROWS = 65536
+
+# Session-state entries stored as they are in the manifest
+STATE_KEYS = ("selected_columns", "metadata_columns", "questions", "explode_path")
+# Dataset rows' source record and duplicate representative, stored next to the dataset columns
+ROW_SOURCE_COLUMN = "__row_source__"
+DUPLICATE_OF_COLUMN = "__duplicate_of__"
+
+
+class ArrowRows(Sequence):
+    """
+    Read-only sequence over memory-mapped Arrow columns, converting one item at a time.
+
+    Stands in for lists the app only indexes and iterates, such as the source
+    records of a reopened snapshot, so opening it does not decode them all.
+    """
+
+    def __init__(self, columns: List[pa.ChunkedArray], convert: Callable[..., Any]):
+        self._columns = columns
+        self._convert = convert
+
+    def __len__(self) -> int:
+        return len(self._columns[0])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        return self._convert(*(column[index].as_py() for column in self._columns))
+
+
+def pack_records(records) -> ArrowRows:
+    """
+    Keep source records as one column of JSON text, decoded one record at a time when accessed.
+
+    Once the dataset has been built from them, the records are only read back
+    now and then (span imports, snapshots), so the compact text replaces the
+    parsed objects.
+    """
+    if isinstance(records, ArrowRows):
+        return records
+    column = pa.array((serialization.dumps(record, default=str) for record in records),
+                      type=pa.large_string(), size=len(records))
+    return ArrowRows([pa.chunked_array([column])], serialization.loads)
+
+
+def _origin(shard_name: str, position: int):
+    return shard_name, position
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (not isinstance(value, (list, dict)) and pd.isna(value))
+
+
+def _json_column(values) -> pa.Array:
+    # Missing values stay Arrow nulls, so reopening only decodes the cells that hold something
+    return pa.array([None if _is_missing(value) else serialization.dumps(value, default=str) for value in values],
+                    type=pa.large_string())
+
+
+def _is_plain_text(series: pd.Series) -> bool:
+    return series.dtype == object and all(type(value) is str for value in series)
+
+
+def _write_table(path: str, table: pa.Table) -> None:
+    # Uncompressed IPC files can be memory-mapped and read without copying
+    with pa.OSFile(path, "wb") as sink, pa_ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=BATCH_ROWS)
+
+
+def _read_table(path: str) -> pa.Table:
+    return pa_ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def save_snapshot(job, path: str, state: Dict[str, Any]) -> str:
+    """
+    Background job: write the project held in `state` (a copy of the session state) to the directory `path`.
+
+    Plain text and numeric dataset columns are stored as native Arrow columns;
+    answers, nested values and mixed columns as JSON text. The bundle is written
+    next to `path` and moved into place once complete.
+    """
+    dataset: pd.DataFrame = state["dataset"]
+    question_titles = {question["question_title"] for question in state.get("questions", [])}
+    records = (state.get("json_data") or {}).get("data", [])
+    job.report(0, len(dataset.columns) + 2)
+
+    columns, json_columns = {}, []
+    for i, name in enumerate(dataset.columns):
+        if job.cancelled:
+            return path
+        series = dataset[name]
+        if name not in question_titles and (series.dtype.kind in "biuf" or _is_plain_text(series)):
+            columns[name] = pa.array(series.to_numpy(), type=pa.large_string() if series.dtype == object else None)
+        else:
+            columns[name] = _json_column(series)
+            json_columns.append(name)
+        job.report(i + 1)
+    if state.get("row_sources") is not None:
+        columns[ROW_SOURCE_COLUMN] = pa.array(np.frombuffer(state["row_sources"], dtype=np.uint32))
+    duplicate_of = np.full(len(dataset), -1, dtype=np.int64)
+    for member, representative in (state.get("duplicate_of") or {}).items():
+        if member < len(dataset):
+            duplicate_of[member] = representative
+    columns[DUPLICATE_OF_COLUMN] = pa.array(duplicate_of)
+
+    record_columns = {"record": pa.array((serialization.dumps(record, default=str) for record in records),
+                                         type=pa.large_string(), size=len(records))}
+    origins = state.get("record_origins")
+    if origins:
+        record_columns["shard"] = pa.array([shard for shard, _ in origins], type=pa.large_string())
+        record_columns["position"] = pa.array([position for _, position in origins], type=pa.int64())
+    job.report(len(dataset.columns) + 1)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "rows": len(dataset),
+        "records": len(records),
+        "dataset_columns": list(dataset.columns),
+        "json_columns": json_columns,
+        "state": {key: state.get(key) for key in STATE_KEYS},
+    }
+    partial_path = f"{path}.partial-{os.getpid()}"
+    os.makedirs(partial_path, exist_ok=True)
+    _write_table(os.path.join(partial_path, "dataset.arrow"), pa.table(columns))
+    _write_table(os.path.join(partial_path, "records.arrow"), pa.table(record_columns))
+    timings: Optional[TimingLog] = state.get("annotation_timings")
+    if timings:
+        manifest["timings"] = {"annotators": timings.annotators, "questions": timings.questions}
+        _write_table(os.path.join(partial_path, "timings.arrow"), pa.table({
+            "row": np.frombuffer(timings.rows, dtype=np.uint32),
+            "annotator": np.frombuffer(timings.annotator_ids, dtype=np.uint16),
+            "submitted_at": np.frombuffer(timings.submitted_at, dtype=np.float64),
+            "seconds": np.frombuffer(timings.seconds, dtype=np.float32),
+            "changed": np.frombuffer(timings.changed, dtype=np.uint64),
+        }))
+    with open(os.path.join(partial_path, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        f.write(serialization.dumps(manifest))
+
+    # Replace an earlier snapshot of the same name only once the new one is complete
+    if os.path.exists(path):
+        old_path = f"{path}.old-{os.getpid()}"
+        os.replace(path, old_path)
+        os.replace(partial_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.replace(partial_path, path)
+    job.report(len(dataset.columns) + 2)
+    return path
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    """Read and check the manifest of a snapshot directory."""
+    with open(os.path.join(path, MANIFEST_NAME), "rb") as f:
+        manifest = serialization.loads(f.read())
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a project snapshot")
+    if manifest.get("version", 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"{path} was written by a newer version (snapshot version {manifest['version']})")
+    return manifest
+
+
+def list_snapshots(directory: str = SNAPSHOT_DIR) -> List[str]:
+    """Return the snapshot directories under `directory`, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    paths = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if os.path.isfile(os.path.join(directory, name, MANIFEST_NAME))
+    ]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def _decode_json_column(column: pa.ChunkedArray) -> pd.Series:
+    values = np.full(len(column), None, dtype=object)
+    valid = np.flatnonzero(column.is_valid().to_numpy(zero_copy_only=False))
+    if len(valid):
+        texts = column.take(pa.array(valid)).to_pylist()
+        values[valid] = [serialization.loads(text) for text in texts]
+    return pd.Series(values, dtype=object)
+
+
+def open_snapshot(path: str) -> Dict[str, Any]:
+    """
+    Return the session-state entries of a snapshot, reading its columns from memory-mapped files.
+
+    Text and numeric columns stay in the mapped Arrow buffers (as pandas Arrow
+    dtypes) and source records are decoded when accessed, so opening costs about
+    the same whatever the size of the dataset. Only answer and nested columns are
+    decoded up front, and only their non-empty cells.
+    """
+    manifest = read_manifest(path)
+    table = _read_table(os.path.join(path, "dataset.arrow"))
+    json_columns = set(manifest["json_columns"])
+    dataset = pd.DataFrame({
+        name: _decode_json_column(table.column(name)) if name in json_columns
+        else pd.Series(pd.arrays.ArrowExtensionArray(table.column(name)))
+        for name in manifest["dataset_columns"]
+    }, copy=False)
+
+    state = dict(manifest["state"])
+    state["dataset"] = dataset
+    state["row_sources"] = None
+    if ROW_SOURCE_COLUMN in table.column_names:
+        state["row_sources"] = array("I", table.column(ROW_SOURCE_COLUMN).to_numpy().astype(np.uint32).tobytes())
+    duplicate_of = table.column(DUPLICATE_OF_COLUMN).to_numpy()
+    members = np.flatnonzero(duplicate_of >= 0)
+    state["duplicate_of"] = dict(zip(members.tolist(), duplicate_of[members].tolist()))
+
+    records = _read_table(os.path.join(path, "records.arrow"))
+    state["json_data"] = {"data": ArrowRows([records.column("record")], serialization.loads)}
+    if "shard" in records.column_names:
+        state["record_origins"] = ArrowRows([records.column("shard"), records.column("position")], _origin)
+
+    timings = TimingLog()
+    if "timings" in manifest:
+        timings.annotators = list(manifest["timings"]["annotators"])
+        timings.questions = list(manifest["timings"]["questions"])
+        timing_table = _read_table(os.path.join(path, "timings.arrow"))
+        for name, target in (("row", timings.rows), ("annotator", timings.annotator_ids),
+                             ("submitted_at", timings.submitted_at), ("seconds", timings.seconds),
+                             ("changed", timings.changed)):
+            target.frombytes(timing_table.column(name).to_numpy().tobytes())
+    state["annotation_timings"] = timings
+    return state
@@ -1,5 +1,121 @@
 import streamlit as st
-from labeling_page import create_dataframe_from_json
+from collections import Counter
+from labeling_page import find_list_paths, load_dataset
+from dedup import find_duplicates, group_clusters, record_text
+from job_manager import JobLimitError, current_owner, get_job_manager, iter_reported
+from span_suggestions import DEFAULT_SPAN_IMPORT, convert_spans, detect_end_inclusive, text_span_pairs
+
+SPAN_PREVIEW_RECORDS = 200
+
+def find_duplicates_job(job, texts, threshold):
+    """Background job: detect exact and near-duplicate records in one streaming pass over `texts`."""
+    duplicate_of = find_duplicates(iter_reported(job, texts), threshold=threshold)
+    return None if job.cancelled else duplicate_of
+
+def display_duplicate_detection():
+    """Detect exact and near-duplicate records over the selected fields and optionally collapse them."""
+    dataset = st.session_state.dataset
+    if "duplicate_of" not in st.session_state:
+        st.session_state.duplicate_of = {}
+
+    with st.expander("Duplicate Detection"):
+        st.markdown("Find records whose selected fields are identical or nearly identical. "
+                    "Collapsed duplicates are hidden in the playground and receive the labels of their representative on export and upload.")
+        threshold = st.slider(
+            "Similarity threshold (1.0 = exact duplicates only)",
+            min_value=0.5, max_value=1.0, value=0.9, step=0.05,
+            key="dedup_threshold"
+        )
+
+        manager = get_job_manager()
+        job = manager.get(st.session_state.get("dedup_job"))
+        if job is not None and not job.active:
+            if job.status == "completed":
+                st.session_state.duplicate_candidates = manager.collect(job.id)
+            del st.session_state["dedup_job"]
+            job = None
+
+        if st.button("Find Duplicates", disabled=job is not None):
+            field_cols = [col["text"] for col in st.session_state.get("selected_columns", []) if col["text"] in dataset.columns]
+            # Selecting the columns copies them, so the job never reads the frame answers are stored into
+            texts = (record_text(row) for row in dataset[field_cols].itertuples(index=False, name=None))
+            try:
+                job = manager.submit(
+                    current_owner(), "dedup", "Find duplicate records", find_duplicates_job,
+                    texts, threshold, total=len(dataset)
+                )
+                st.session_state.dedup_job = job.id
+                st.rerun()
+            except JobLimitError as e:
+                st.error(str(e))
+        if job is not None:
+            st.info("Hashing records in the background; the results appear here once it is done.")
+
+        candidates = st.session_state.get("duplicate_candidates")
+        if candidates is not None:
+            clusters = group_clusters(candidates)
+            st.write(f"Found {len(candidates)} duplicate records in {len(clusters)} clusters.")
+
+            # Preview the largest clusters
+            for representative, members in sorted(clusters.items(), key=lambda item: -len(item[1]))[:5]:
+                st.markdown(f"**Record {representative}** has {len(members)} duplicates: {members[:10]}")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Collapse Duplicates", disabled=not candidates):
+                    st.session_state.duplicate_of = candidates
+                    st.session_state.current_index = 0
+            with col2:
+                if st.button("Keep All Records", disabled=not st.session_state.duplicate_of):
+                    st.session_state.duplicate_of = {}
+                    st.session_state.current_index = 0
+
+        if st.session_state.duplicate_of:
+            st.info(f"{len(st.session_state.duplicate_of)} duplicate records are collapsed into their representatives.")
+
+def display_span_import(span_field, question_title):
+    """Let the user map an existing span-list path onto a span question, and preview how well the offsets validate."""
+    records = (st.session_state.get("json_data") or {}).get("data", [])
+    span_paths = [path for path in find_list_paths(records) if path != span_field]
+    span_path = st.selectbox(
+        "Import existing spans from (optional)",
+        [None] + span_paths,
+        format_func=lambda path: "Don't import" if path is None else path,
+        key=f"span_import_path_{question_title}",
+        help="Existing annotations with a label and begin/end offsets are sent to Argilla as span suggestions, "
+             "so annotators only correct them."
+    )
+    if not span_path:
+        return None
+
+    col1, col2, col3, col4 = st.columns(4)
+    config = dict(DEFAULT_SPAN_IMPORT, path=span_path)
+    config["label_key"] = col1.text_input("Label key", config["label_key"], key=f"span_label_key_{question_title}")
+    config["start_key"] = col2.text_input("Start key", config["start_key"], key=f"span_start_key_{question_title}")
+    config["end_key"] = col3.text_input("End key", config["end_key"], key=f"span_end_key_{question_title}")
+    config["text_key"] = col4.text_input("Span text key (optional)", config["text_key"],
+                                         key=f"span_text_key_{question_title}") or None
+
+    # Validate a sample against the text field before the question is added
+    pairs = [pair for record in records[:SPAN_PREVIEW_RECORDS] for pair in text_span_pairs(record, span_field, span_path)]
+    detected = detect_end_inclusive(pairs, config)
+    config["end_inclusive"] = st.checkbox(
+        "End offsets are inclusive", value=bool(detected), key=f"span_end_inclusive_{question_title}",
+        help="Detected from the span texts." if detected is not None else None
+    )
+    stats = Counter()
+    for text, raw_spans in pairs:
+        convert_spans(text, raw_spans, config, stats=stats)
+    config["found_labels"] = sorted({
+        str(span[config["label_key"]]) for _, raw_spans in pairs for span in raw_spans if config["label_key"] in span
+    })
+    if not pairs:
+        st.warning(f"No texts of {span_field} could be paired with spans from {span_path}.")
+    else:
+        st.caption(f"Checked {len(pairs)} texts of the first {SPAN_PREVIEW_RECORDS} records: "
+                   + ", ".join(f"{count} {outcome.replace('_', ' ')}" for outcome, count in stats.most_common()))
+        st.caption(f"Labels found: {', '.join(config['found_labels'][:30])}")
+    return config
 
 @st.fragment
 def display_question_page():
@@ -26,10 +142,12 @@ def display_question_page():
     selected_columns = st.session_state.get("selected_columns", [])
     # Create DataFrame if not already created
     if "dataset" not in st.session_state and json_data and selected_columns:
-        st.session_state.dataset = create_dataframe_from_json(json_data, selected_columns)
+        if not load_dataset(json_data, selected_columns):
+            return
 
     st.markdown("### Dataset Preview:")
     st.write(st.session_state.dataset.head(5))
+    display_duplicate_detection()
     st.markdown("### Add Questions and Related Information")
 
     # Dropdown for selecting question type (outside the form)
@@ -62,6 +180,7 @@ def display_question_page():
     # Conditionally show labels input and field selection for span questions
     labels = []
     selected_field = None
+    span_import = None
     if st.session_state.selected_question_type in ["Label", "Multi-label", "SpanQuestion","Ranking"]:
         st.markdown(f"**Define possible {st.session_state.selected_question_type.lower()} options (comma-separated):**")
         labels_input_key = st.session_state.labels_input_key
@@ -84,6 +203,8 @@ def display_question_page():
                 )
             else:
                 st.warning("No fields available for span annotation. Please select fields in the upload page first.")
+            if selected_field:
+                span_import = display_span_import(selected_field, question_title)
     
     submit_button = st.button("Add Question")
 
@@ -91,7 +212,8 @@ def display_question_page():
     if submit_button:
         if not question_title.strip():
             st.warning("Please provide a question title.")
-        elif st.session_state.selected_question_type in ["Label", "Multi-label", "SpanQuestion", "Ranking"] and not labels:
+        elif st.session_state.selected_question_type in ["Label", "Multi-label", "SpanQuestion", "Ranking"] and not labels \
+                and not (span_import and span_import.get("found_labels")):
             st.warning("Please define at least one label.")
         elif st.session_state.selected_question_type == "SpanQuestion" and not selected_field:
             st.warning("Please select a field for span annotation.")
@@ -107,6 +229,11 @@ def display_question_page():
             # Add selected field for span questions
             if st.session_state.selected_question_type == "SpanQuestion":
                 question_data["span_field"] = selected_field
+                if span_import:
+                    # Without typed labels, the labels found in the source annotations are used
+                    found_labels = span_import.pop("found_labels")
+                    question_data["labels"] = labels or found_labels
+                    question_data["span_import"] = span_import
                 # Store in session state for later use
                 st.session_state.span_field[question_title] = selected_field
 
@@ -137,6 +264,8 @@ def display_question_page():
                 st.markdown(f"**Labels:** {', '.join(question['labels'])}")
                 if question['question_type'] == "SpanQuestion":
                     st.markdown(f"**Field for Span Annotation:** {question.get('span_field')}")
+                    if question.get("span_import"):
+                        st.markdown(f"**Imported spans from:** {question['span_import']['path']}")
             st.markdown("---")
 
     # Show "Next" button to navigate to the labeling page (third page)
@@ -0,0 +1,111 @@
+import heapq
+import math
+import random
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Distinct strata a stratified sample accepts; it holds at most k items per stratum until allocation
+MAX_STRATA = 10_000
+
+
+def reservoir_sample(items: Iterable[Any], k: int, seed: int = 0) -> List[Any]:
+    """
+    Uniformly sample `k` items from a stream in one pass (reservoir Algorithm L).
+
+    Memory is bounded by `k`. The sample is returned in the original stream order.
+    """
+    if k <= 0:
+        return []
+
+    rng = random.Random(seed)
+    stream = enumerate(items)
+    reservoir: List[Tuple[int, Any]] = []
+    for position, item in stream:
+        reservoir.append((position, item))
+        if len(reservoir) == k:
+            break
+    else:
+        return [item for _, item in reservoir]
+
+    # Skip ahead geometrically instead of drawing a random number per item
+    w = math.exp(math.log(1.0 - rng.random()) / k)
+    next_position = k - 1 + math.floor(math.log(1.0 - rng.random()) / math.log(1.0 - w)) + 1
+    for position, item in stream:
+        if position == next_position:
+            reservoir[rng.randrange(k)] = (position, item)
+            w *= math.exp(math.log(1.0 - rng.random()) / k)
+            next_position += math.floor(math.log(1.0 - rng.random()) / math.log(1.0 - w)) + 1
+
+    reservoir.sort(key=lambda entry: entry[0])
+    return [item for _, item in reservoir]
+
+
+def allocate(counts: Dict[Any, int], k: int, allocation: str = "proportional") -> Dict[Any, int]:
+    """Split a target size across strata, either proportionally to their size or equally."""
+    total = sum(counts.values())
+    if total <= k:
+        return dict(counts)
+
+    if allocation == "equal":
+        quotas = {stratum: 0 for stratum in counts}
+        remaining = k
+        # Hand out one slot per round to every stratum that still has records left
+        while remaining > 0:
+            open_strata = [stratum for stratum in counts if quotas[stratum] < counts[stratum]]
+            for stratum in open_strata[:remaining]:
+                quotas[stratum] += 1
+            remaining -= min(len(open_strata), remaining)
+        return quotas
+
+    # Largest remainder method keeps the total exactly at k
+    shares = {stratum: k * count / total for stratum, count in counts.items()}
+    quotas = {stratum: int(share) for stratum, share in shares.items()}
+    leftover = k - sum(quotas.values())
+    for stratum in sorted(shares, key=lambda s: shares[s] - quotas[s], reverse=True)[:leftover]:
+        quotas[stratum] += 1
+    return quotas
+
+
+def stratified_sample(items: Iterable[Any], k: int, key: Callable[[Any], Any], seed: int = 0,
+                      allocation: str = "proportional", max_strata: int = MAX_STRATA) -> List[Any]:
+    """
+    Sample `k` items from a stream in one pass, stratified by `key(item)`.
+
+    Every item gets a random priority and each stratum keeps its `k` lowest-priority
+    items, which is a uniform sample of that stratum. Quotas are allocated once the
+    stream is exhausted, so memory is bounded by `k` items per stratum until then.
+    Raises ValueError on more than `max_strata` distinct strata, which happens with
+    keys of very many distinct values (ids, free text): stratify by a coarser key
+    instead. The sample is returned in the original stream order.
+    """
+    if k <= 0:
+        return []
+
+    rng = random.Random(seed)
+    counts: Dict[Any, int] = {}
+    heaps: Dict[Any, List[Tuple[float, int, Any]]] = {}
+    for position, item in enumerate(items):
+        stratum = key(item)
+        counts[stratum] = counts.get(stratum, 0) + 1
+        heap = heaps.get(stratum)
+        if heap is None:
+            if len(heaps) >= max_strata:
+                raise ValueError(
+                    f"Stratified sampling found more than {max_strata:,} distinct strata; "
+                    f"choose a key with fewer distinct values"
+                )
+            heap = heaps[stratum] = []
+        # Max-heap on priority via negation, so the worst kept item is on top
+        entry = (-rng.random(), position, item)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[0] > heap[0][0]:
+            heapq.heapreplace(heap, entry)
+
+    quotas = allocate(counts, k, allocation)
+    sample = []
+    for stratum, heap in heaps.items():
+        best = heapq.nlargest(quotas[stratum], heap)
+        sample.extend((position, item) for _, position, item in best)
+
+    sample.sort(key=lambda entry: entry[0])
+    return [item for _, item in sample]
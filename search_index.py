@@ -0,0 +1,153 @@
+import bisect
+import re
+import shlex
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from dedup import canonical_value
+
+TOKEN_RE = re.compile(r"\w+")
+# Records between progress reports of an indexing job
+REPORT_EVERY = 1000
+
+
+def tokenize(text: str) -> Set[str]:
+    """Split a text into its distinct lowercase word tokens."""
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index over record positions.
+
+    Free-text terms map to the records whose fields contain them, and metadata
+    `field:value` pairs map to the records having that exact value, kept per
+    field so a filter is a dictionary lookup. Records are added one at a time in
+    increasing order, so every posting list is a sorted compact `array` of
+    record positions, and queries combine them as sorted numpy arrays.
+    """
+
+    def __init__(self):
+        self._terms: Dict[str, array] = {}
+        self._values: Dict[str, Dict[str, array]] = {}
+        self._vocabulary: Optional[List[str]] = None
+        self.size = 0
+
+    def add(self, record_id: int, texts: Iterable[Any], metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Index the text fields and metadata values of one record."""
+        terms = set()
+        for text in texts:
+            terms |= tokenize(canonical_value(text))
+        for field, value in (metadata or {}).items():
+            if value is None:
+                continue
+            value = canonical_value(value)
+            terms |= tokenize(value)
+            self._values.setdefault(field, {}).setdefault(value.lower(), array("I")).append(record_id)
+
+        for term in terms:
+            self._terms.setdefault(term, array("I")).append(record_id)
+        self._vocabulary = None
+        self.size = max(self.size, record_id + 1)
+
+    @staticmethod
+    def _union(postings: List[array]) -> np.ndarray:
+        # Each posting list is sorted and distinct already; only a merge of several needs np.unique
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+        if len(postings) == 1:
+            return np.array(postings[0], dtype=np.int64)
+        return np.unique(np.concatenate([np.array(p, dtype=np.int64) for p in postings]))
+
+    def _prefix_matches(self, prefix: str) -> np.ndarray:
+        # Prefix matching lets "법률" find "법률에", "법률의", ...
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._terms)
+        postings = []
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            postings.append(self._terms[term])
+        return self._union(postings)
+
+    def _field_matches(self, field: str, value: str) -> np.ndarray:
+        # A field matches by full path or by its last segments, e.g. "doc_type" for "data.doc_type";
+        # only the few metadata field names are scanned, never their values
+        return self._union([
+            values[value] for indexed_field, values in self._values.items()
+            if (indexed_field == field or indexed_field.endswith("." + field)) and value in values
+        ])
+
+    def search(self, query: str) -> np.ndarray:
+        """
+        Return the sorted positions of the records matching every clause of the query, as an array.
+
+        Clauses are separated by spaces. A plain word matches records containing a
+        word starting with it, `"quoted words"` require all of their words,
+        `field:value` requires an exact metadata value, and a leading `-` excludes
+        the records matching the clause.
+        """
+        try:
+            clauses = shlex.split(query)
+        except ValueError:
+            clauses = query.split()
+
+        include: List[np.ndarray] = []
+        exclude: List[np.ndarray] = []
+        for clause in clauses:
+            negate = clause.startswith("-") and len(clause) > 1
+            if negate:
+                clause = clause[1:]
+
+            field, sep, value = clause.partition(":")
+            if sep and field and value:
+                clause_matches = [self._field_matches(field, value.lower())]
+            else:
+                clause_matches = [self._prefix_matches(token) for token in tokenize(clause)]
+            if not clause_matches:
+                continue
+
+            if negate:
+                excluded = clause_matches[0]
+                for matches in clause_matches[1:]:
+                    excluded = np.intersect1d(excluded, matches, assume_unique=True)
+                exclude.append(excluded)
+            else:
+                include.extend(clause_matches)
+
+        excluded = np.unique(np.concatenate(exclude)) if exclude else np.zeros(0, dtype=np.int64)
+        if not include:
+            # Only exclusions: mark them off every position instead of materializing the complement
+            keep = np.ones(self.size, dtype=bool)
+            keep[excluded] = False
+            return np.flatnonzero(keep)
+
+        # Intersect from the shortest list, so every step works on at most that many positions
+        include.sort(key=len)
+        result = include[0]
+        for matches in include[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, matches, assume_unique=True)
+        return np.setdiff1d(result, excluded, assume_unique=True) if len(excluded) else result
+
+
+def index_records(job, rows: Iterable[Tuple[Sequence[Any], Sequence[Any]]],
+                  metadata_fields: Sequence[str]) -> InvertedIndex:
+    """
+    Background job: index the (field values, metadata values) of every record, in row order.
+
+    `rows` is consumed lazily; its metadata values are aligned with `metadata_fields`.
+    """
+    index = InvertedIndex()
+    for idx, (fields, metadata) in enumerate(rows):
+        if idx % REPORT_EVERY == 0:
+            if job.cancelled:
+                break
+            job.report(idx)
+        index.add(idx, fields, dict(zip(metadata_fields, metadata)))
+    job.report(index.size)
+    return index
@@ -0,0 +1,82 @@
+import json
+from functools import lru_cache
+from typing import IO, Any, Callable, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library is used as a fallback
+    orjson = None
+
+# orjson parses integers outside the 64-bit range as floats, where the standard library keeps them exact.
+# Mapping every digit to "0" and everything else to " " turns the search for a 19-digit run into a plain find,
+# which is several times faster than a regular expression.
+_DIGITS = bytes(ord("0") if chr(i) in "0123456789" else ord(" ") for i in range(256))
+_LONG_INTEGER = b"0" * 19
+
+_backend = "orjson" if orjson is not None else "json"
+
+
+def available_backends() -> List[str]:
+    """Return the names of the JSON backends that can be used."""
+    return ["json"] + (["orjson"] if orjson is not None else [])
+
+
+def backend() -> str:
+    """Return the name of the active JSON backend."""
+    return _backend
+
+
+def use_backend(name: str) -> None:
+    """Select the JSON backend, e.g. "json" to force the standard library."""
+    global _backend
+    if name not in available_backends():
+        raise ValueError(f"JSON backend '{name}' is not available (available: {', '.join(available_backends())})")
+    _backend = name
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """
+    Parse a JSON document, with the same result as `json.loads` whatever the backend.
+
+    Documents orjson would read differently (integers beyond 64 bits) or rejects
+    (NaN, lone surrogates) go to the standard library, which also raises its own
+    `json.JSONDecodeError` for invalid documents.
+    """
+    if _backend == "orjson":
+        try:
+            raw = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        except UnicodeEncodeError:
+            raw = None  # Lone surrogates
+        if raw is not None and raw.translate(_DIGITS).find(_LONG_INTEGER) == -1:
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass
+    return json.loads(data)
+
+
+def load(stream: IO) -> Any:
+    """Parse the JSON document of a text or binary stream."""
+    return loads(stream.read())
+
+
+@lru_cache(maxsize=None)
+def _stdlib_encoder(sort_keys: bool, default: Optional[Callable[[Any], Any]]) -> json.JSONEncoder:
+    # json.dumps builds a new encoder on every call with non-default options
+    return json.JSONEncoder(ensure_ascii=False, sort_keys=sort_keys, default=default)
+
+
+def dumps(value: Any, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """
+    Serialize a value exactly as `json.dumps(value, ensure_ascii=False, ...)` does.
+
+    Only strings take the orjson path: orjson formats some floats differently
+    (1e16 for 1e+16, 0.00001 for 1e-05) and writes NaN as null, so containers
+    always use the standard library encoder.
+    """
+    if _backend == "orjson" and type(value) is str:
+        try:
+            return orjson.dumps(value).decode("utf-8")
+        except TypeError:
+            pass  # Lone surrogates, which the standard library writes as they are
+    return _stdlib_encoder(sort_keys, default).encode(value)
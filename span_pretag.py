@@ -0,0 +1,223 @@
+import re
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from span_suggestions import build_span_suggestion, drop_overlapping
+
+# Separates the term or pattern from its label on every rule line, e.g. "서울특별시 => LC"
+RULE_SEPARATOR = "=>"
+# Rows between progress reports of a pre-tagging job
+REPORT_EVERY = 1000
+
+
+class TermMatcher:
+    """
+    Aho-Corasick automaton finding every occurrence of a set of terms in one pass over a text.
+
+    Scanning is linear in the text length plus the number of matches, whatever
+    the number of terms. States are numbered from 0 (the root); `_goto[state]`
+    maps the next character to a state, `_fail[state]` is the state of the
+    longest proper suffix that is also a prefix of some term, and `_output_link`
+    jumps to the nearest suffix state that ends a term, so enumerating the
+    matches at a position never walks through states that end none.
+    """
+
+    def __init__(self, terms: Sequence[str]):
+        self.terms = list(terms)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._term_at: List[int] = [-1]
+        for index, term in enumerate(self.terms):
+            if not term:
+                continue
+            state = 0
+            for char in term:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._term_at.append(-1)
+                state = next_state
+            self._term_at[state] = index
+
+        # Breadth-first, so the fail state of every state is final before its children are linked
+        self._fail = [0] * len(self._goto)
+        self._output_link = [-1] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                suffix = self._fail[child]
+                self._output_link[child] = suffix if self._term_at[suffix] >= 0 else self._output_link[suffix]
+                queue.append(child)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yield (start, end, term index) for every occurrence of every term, overlapping ones included."""
+        goto, fail, term_at, output_link, terms = self._goto, self._fail, self._term_at, self._output_link, self.terms
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match = state if term_at[state] >= 0 else output_link[state]
+            while match > 0:
+                index = term_at[match]
+                yield position + 1 - len(terms[index]), position + 1, index
+                match = output_link[match]
+
+
+def parse_rules(text: str, labels: Sequence[str], regex: bool = False) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Parse "term => label" lines (or "pattern => label" when `regex` is True).
+
+    Returns the (term, label) rules and an error message per line that cannot be
+    used: a missing separator, a label the question does not have, or an
+    invalid regular expression. Blank lines and lines starting with # are skipped.
+    """
+    rules, errors = [], []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        term, separator, label = line.rpartition(RULE_SEPARATOR)
+        term, label = term.strip(), label.strip()
+        if not separator or not term:
+            errors.append(f"Line {number}: expected '<{'pattern' if regex else 'term'}> {RULE_SEPARATOR} <label>'")
+            continue
+        if label not in labels:
+            errors.append(f"Line {number}: '{label}' is not a label of this question")
+            continue
+        if regex:
+            try:
+                re.compile(term)
+            except re.error as e:
+                errors.append(f"Line {number}: invalid regular expression ({e})")
+                continue
+        rules.append((term, label))
+    return rules, errors
+
+
+class SpanTagger:
+    """
+    Tag a text with the spans of a gazetteer (term => label) and of regular expression rules.
+
+    With `ignore_case`, terms and patterns match regardless of case. With
+    `whole_words`, a match must not be directly preceded or followed by a letter
+    or digit; leave it off for languages that attach particles to words, such as
+    Korean, where "법령" should also match in "법령에". When a term appears with
+    several labels, the last one is used.
+    """
+
+    def __init__(self, gazetteer: Sequence[Tuple[str, str]], rules: Sequence[Tuple[str, str]] = (),
+                 ignore_case: bool = False, whole_words: bool = False):
+        self.ignore_case = ignore_case
+        self.whole_words = whole_words
+        terms = {(term.lower() if ignore_case else term): label for term, label in gazetteer}
+        self.matcher = TermMatcher(list(terms))
+        self.term_labels = list(terms.values())
+        flags = re.IGNORECASE if ignore_case else 0
+        self.rules = [(re.compile(pattern, flags), label) for pattern, label in rules]
+
+    def _is_word(self, text: str, start: int, end: int) -> bool:
+        return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+    def tag(self, text: str, stats: Optional[Counter] = None) -> List[Dict[str, Any]]:
+        """Return the non-overlapping spans of `text`, keeping the earliest, longest match where matches overlap."""
+        stats = stats if stats is not None else Counter()
+        spans = []
+        if len(self.matcher):
+            scanned = text.lower() if self.ignore_case else text
+            if len(scanned) != len(text):
+                # A few characters (e.g. "İ") lengthen when lowercased; keep those as they are so offsets still match
+                scanned = "".join(char if len(char.lower()) != 1 else char.lower() for char in text)
+            for start, end, index in self.matcher.iter_matches(scanned):
+                spans.append({"label": self.term_labels[index], "start": start, "end": end})
+        for pattern, label in self.rules:
+            for match in pattern.finditer(text):
+                if match.end() > match.start():
+                    spans.append({"label": label, "start": match.start(), "end": match.end()})
+        if self.whole_words:
+            words = [span for span in spans if self._is_word(text, span["start"], span["end"])]
+            stats["partial_word"] += len(spans) - len(words)
+            spans = words
+        kept = drop_overlapping(spans, stats)
+        stats["tagged"] += len(kept)
+        return kept
+
+
+class SpanPretags:
+    """
+    Pre-tagged spans of a span question for every dataset row.
+
+    Spans are kept in flat typed arrays: the spans of row i are the entries
+    [offsets[i], offsets[i + 1]) of `starts`, `ends` and `label_ids` (an index
+    into `labels`), so millions of spans cost a few bytes each.
+    """
+
+    def __init__(self, labels: Sequence[str]):
+        self.labels = list(labels)
+        self.offsets = array("Q", [0])
+        self.starts = array("I")
+        self.ends = array("I")
+        self.label_ids = array("H")
+        self.stats = Counter()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def span_count(self) -> int:
+        return len(self.starts)
+
+    def append(self, spans: Sequence[Dict[str, Any]]) -> None:
+        """Add the spans of the next row."""
+        for span in spans:
+            self.starts.append(span["start"])
+            self.ends.append(span["end"])
+            self.label_ids.append(self.labels.index(span["label"]))
+        self.offsets.append(len(self.starts))
+
+    def spans(self, row: int) -> List[Dict[str, Any]]:
+        """Return the spans of a dataset row, empty for rows past the pre-tagged ones."""
+        if row >= len(self):
+            return []
+        return [
+            {"label": self.labels[self.label_ids[i]], "start": self.starts[i], "end": self.ends[i]}
+            for i in range(self.offsets[row], self.offsets[row + 1])
+        ]
+
+    def take(self, rows: Sequence[int]) -> "SpanPretags":
+        """Return the spans of the given rows only, e.g. to send one chunk to a conversion process."""
+        taken = SpanPretags(self.labels)
+        for row in rows:
+            taken.append(self.spans(row))
+        return taken
+
+    def to_suggestion(self, row: int, question_id: Any, agent: str = "gazetteer pre-tagging") -> Optional[Dict[str, Any]]:
+        """Build the bulk-endpoint suggestion body of a row, or None when nothing was tagged."""
+        spans = self.spans(row)
+        return build_span_suggestion(question_id, spans, agent, suggestion_type="model") if spans else None
+
+
+def pretag_spans(job, tagger: SpanTagger, texts: Iterable[str], labels: Sequence[str]) -> SpanPretags:
+    """
+    Background job: tag every text in one streaming pass, in dataset row order.
+
+    `texts` is consumed lazily, so the field values are rendered one row at a
+    time. A cancelled job stops early and returns the rows tagged so far.
+    """
+    pretags = SpanPretags(labels)
+    for row, text in enumerate(texts):
+        if row % REPORT_EVERY == 0:
+            if job.cancelled:
+                break
+            job.report(row)
+        pretags.append(tagger.tag(text, pretags.stats))
+    job.report(len(pretags))
+    return pretags
@@ -0,0 +1,187 @@
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Joined by `format_value` when a text field resolves to several strings
+LIST_SEPARATOR = ", "
+
+DEFAULT_SPAN_IMPORT = {
+    "path": None,
+    "label_key": "type",
+    "start_key": "begin",
+    "end_key": "end",
+    "text_key": "entity",
+    "end_inclusive": False,
+}
+
+
+def _split(path: str) -> List[str]:
+    parts = path.split(".")
+    return parts[1:] if parts and parts[0] == "data" else parts
+
+
+def _walk(obj: Any, parts: Sequence[str]) -> Iterator[Any]:
+    """Yield every object reached by following `parts`, looking through lists along the way."""
+    if isinstance(obj, list):
+        for item in obj:
+            yield from _walk(item, parts)
+        return
+    if not parts:
+        yield obj
+        return
+    if isinstance(obj, dict) and obj.get(parts[0]) is not None:
+        yield from _walk(obj[parts[0]], parts[1:])
+
+
+def text_span_pairs(record: Dict[str, Any], text_path: str, span_path: str) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Pair every text of a record with the span annotations that refer to it.
+
+    The text and the span list are matched through the deepest object they share,
+    e.g. for "data.sentence.text" and "data.sentence.NE" every sentence's text is
+    paired with the entities of that same sentence.
+    """
+    text_parts, span_parts = _split(text_path), _split(span_path)
+    shared = 0
+    while shared < min(len(text_parts) - 1, len(span_parts)) and text_parts[shared] == span_parts[shared]:
+        shared += 1
+
+    pairs = []
+    for ancestor in _walk(record, text_parts[:shared]):
+        texts = [text for text in _walk(ancestor, text_parts[shared:]) if isinstance(text, str)]
+        if len(texts) != 1:
+            continue
+        spans = [span for span in _walk(ancestor, span_parts[shared:]) if isinstance(span, dict)]
+        pairs.append((texts[0], spans))
+    return pairs
+
+
+def detect_end_inclusive(pairs: Sequence[Tuple[str, List[Dict[str, Any]]]], config: Dict[str, Any]) -> Optional[bool]:
+    """Guess whether end offsets are inclusive by comparing both readings with the span's own text."""
+    text_key = config.get("text_key")
+    if not text_key:
+        return None
+    votes = Counter()
+    for text, spans in pairs:
+        for span in spans:
+            try:
+                start, end = int(span[config["start_key"]]), int(span[config["end_key"]])
+            except (KeyError, TypeError, ValueError):
+                continue
+            expected = span.get(text_key)
+            if text[start:end] == expected:
+                votes["exclusive"] += 1
+            elif text[start:end + 1] == expected:
+                votes["inclusive"] += 1
+    if not votes:
+        return None
+    return votes["inclusive"] > votes["exclusive"]
+
+
+def _realign(text: str, start: int, expected: str) -> Optional[int]:
+    """Return the start of the occurrence of `expected` nearest to `start`, if any."""
+    best = None
+    position = text.find(expected)
+    while position != -1:
+        if best is None or abs(position - start) < abs(best - start):
+            best = position
+        position = text.find(expected, position + 1)
+    return best
+
+
+def drop_overlapping(spans: Sequence[Dict[str, Any]], stats: Optional[Counter] = None) -> List[Dict[str, Any]]:
+    """Return the spans sorted by start, without the ones overlapping an earlier, longer span."""
+    # Argilla rejects overlapping spans unless the question allows them: keep the earliest, longest ones
+    kept = []
+    for span in sorted(spans, key=lambda span: (span["start"], -span["end"])):
+        if kept and span["start"] < kept[-1]["end"]:
+            if stats is not None:
+                stats["overlapping"] += 1
+            continue
+        kept.append(span)
+    return kept
+
+
+def merge_spans(spans: Sequence[Dict[str, Any]], extra: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Return `spans` plus the `extra` spans that overlap none of them, sorted by start."""
+    added = [span for span in extra
+             if all(span["end"] <= kept["start"] or span["start"] >= kept["end"] for kept in spans)]
+    return sorted([*spans, *added], key=lambda span: span["start"])
+
+
+def convert_spans(text: str, raw_spans: Sequence[Dict[str, Any]], config: Dict[str, Any],
+                  labels: Optional[Sequence[str]] = None, stats: Optional[Counter] = None) -> List[Dict[str, Any]]:
+    """
+    Convert source span annotations into validated, non-overlapping Argilla spans over `text`.
+
+    Offsets outside the text, labels that are not in `labels` and spans whose
+    text disagrees with the source annotation are dropped, except when the
+    annotated text occurs elsewhere in the text, in which case the span is moved
+    to the nearest occurrence. Every outcome is counted in `stats`.
+    """
+    stats = stats if stats is not None else Counter()
+    allowed = set(labels) if labels else None
+    text_key = config.get("text_key")
+    spans = []
+    for raw in raw_spans:
+        try:
+            label = str(raw[config["label_key"]])
+            start = int(raw[config["start_key"]])
+            end = int(raw[config["end_key"]]) + (1 if config.get("end_inclusive") else 0)
+        except (KeyError, TypeError, ValueError):
+            stats["malformed"] += 1
+            continue
+        if allowed is not None and label not in allowed:
+            stats["unknown_label"] += 1
+            continue
+
+        expected = raw.get(text_key) if text_key else None
+        if isinstance(expected, str) and expected and text[start:end] != expected:
+            realigned = _realign(text, start, expected)
+            if realigned is None:
+                stats["text_mismatch"] += 1
+                continue
+            start, end = realigned, realigned + len(expected)
+            stats["realigned"] += 1
+        elif not 0 <= start < end <= len(text):
+            stats["out_of_bounds"] += 1
+            continue
+        spans.append({"label": label, "start": start, "end": end})
+
+    kept = drop_overlapping(spans, stats)
+    stats["imported"] += len(kept)
+    return kept
+
+
+def record_span_suggestions(record: Dict[str, Any], field_value: Any, text_path: str, config: Dict[str, Any],
+                            labels: Optional[Sequence[str]] = None,
+                            stats: Optional[Counter] = None) -> List[Dict[str, Any]]:
+    """
+    Return the spans of a record, with offsets into the text of the field as it is displayed and uploaded.
+
+    `field_value` is the dataset cell of the span field. A single string takes the
+    spans of the matching source text. A list of strings is displayed joined with
+    ", ", so the spans of each text are shifted by the position of that text.
+    """
+    stats = stats if stats is not None else Counter()
+    pairs = text_span_pairs(record, text_path, config["path"])
+    if isinstance(field_value, str):
+        for text, raw_spans in pairs:
+            if text == field_value:
+                return convert_spans(text, raw_spans, config, labels, stats)
+        stats["unmatched_text"] += 1
+        return []
+    if isinstance(field_value, list) and [text for text, _ in pairs] == field_value:
+        spans, offset = [], 0
+        for text, raw_spans in pairs:
+            for span in convert_spans(text, raw_spans, config, labels, stats):
+                spans.append({"label": span["label"], "start": span["start"] + offset, "end": span["end"] + offset})
+            offset += len(text) + len(LIST_SEPARATOR)
+        return spans
+    stats["unmatched_text"] += 1
+    return []
+
+
+def build_span_suggestion(question_id: Any, spans: List[Dict[str, Any]], agent: str = "source annotations",
+                          suggestion_type: str = "human") -> Dict[str, Any]:
+    """Build the bulk-endpoint suggestion body of a span question."""
+    return {"question_id": str(question_id), "value": spans, "type": suggestion_type, "agent": agent}
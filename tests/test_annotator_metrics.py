@@ -0,0 +1,55 @@
+import random
+
+import pandas as pd
+
+from annotator_metrics import IDLE_SECONDS, TimingLog, question_costs, slow_groups, throughput_by_annotator
+
+
+def test_log_to_frame():
+    log = TimingLog()
+    log.add(3, "ann", 12.5, ["q1"], submitted_at=0)
+    log.add(4, "bob", 20.0, ["q2", "q1"], submitted_at=60)
+    log.add(5, "ann", 8.0, [], submitted_at=120)
+
+    frame = log.to_frame()
+    assert len(log) == 3
+    assert frame["row"].tolist() == [3, 4, 5]
+    assert frame["annotator"].tolist() == ["ann", "bob", "ann"]
+    assert frame["changed: q1"].tolist() == [True, True, False]
+    assert frame["changed: q2"].tolist() == [False, True, False]
+
+
+def test_throughput_ignores_breaks():
+    log = TimingLog()
+    for seconds in (10, 20, IDLE_SECONDS + 1):
+        log.add(0, "ann", seconds, [])
+    summary = throughput_by_annotator(log.to_frame())
+    assert summary.loc["ann", "records"] == 2
+    assert summary.loc["ann", "median seconds"] == 15
+    assert summary.loc["ann", "records/hour"] == 240
+
+
+def test_question_costs_recover_per_question_seconds():
+    rng = random.Random(0)
+    log = TimingLog()
+    for row in range(200):
+        changed = [q for q in ("quick", "slow") if rng.random() < 0.5]
+        seconds = 5 + 2 * ("quick" in changed) + 30 * ("slow" in changed)
+        log.add(row, "ann", seconds, changed)
+    costs = question_costs(log).set_index("question")["estimated seconds"]
+    assert costs["slow"] == 30 and costs["quick"] == 2 and costs["(reading the record)"] == 5
+
+
+def test_question_costs_need_more_records_than_questions():
+    log = TimingLog()
+    log.add(0, "ann", 5, ["q"])
+    assert question_costs(log).empty
+
+
+def test_slow_groups_by_dataset_column():
+    log = TimingLog()
+    for row, seconds in ((0, 10), (1, 50), (2, 12)):
+        log.add(row, "ann", seconds, [])
+    groups = slow_groups(log.to_frame(), pd.Series(["short", "long", "short"]))
+    assert groups.index.tolist() == ["long", "short"]
+    assert groups.loc["short", "records"] == 2
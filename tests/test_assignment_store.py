@@ -0,0 +1,83 @@
+import pytest
+
+from assignment_store import AssignmentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AssignmentStore(str(tmp_path / "assignments.sqlite3"), "project")
+
+
+def test_create_once(store):
+    assert store.create(range(10), batch_size=4, overlap=2, lease_seconds=100)
+    assert not store.create(range(5), batch_size=1)
+    assert store.settings() == {"batch_size": 4, "overlap": 2, "lease_seconds": 100, "total_rows": 10}
+    assert store.progress(now=0)["copies"] == 6
+
+
+def test_annotators_get_different_batches(store):
+    store.create(range(6), batch_size=3, lease_seconds=100)
+    first, second = store.lease("ann", now=0), store.lease("bob", now=0)
+    assert (first.batch, first.rows) == (0, [0, 1, 2])
+    assert (second.batch, second.rows) == (1, [3, 4, 5])
+    assert store.lease("cat", now=0) is None
+    # Leasing again renews the same batch
+    assert store.lease("ann", now=50).batch == 0
+
+
+def test_completing_every_row_closes_the_copy(store):
+    store.create(range(4), batch_size=2, lease_seconds=100)
+    store.lease("ann", now=0)
+    store.complete("ann", 0, {"q": "a"}, now=1)
+    assert store.lease("ann", now=2).pending == [1]
+    store.complete("ann", 1, {"q": "b"}, now=3)
+    assert store.progress(now=4)["done"] == 1
+    assert store.lease("ann", now=5).batch == 1
+
+
+def test_expired_lease_is_taken_over_with_its_progress(store):
+    store.create(range(4), batch_size=4, lease_seconds=100)
+    store.lease("ann", now=0)
+    store.complete("ann", 0, {"q": "a"}, now=1)
+    assert store.lease("bob", now=50) is None
+    taken = store.lease("bob", now=200)
+    assert (taken.batch, taken.pending) == (0, [1, 2, 3])
+
+
+def test_overlap_copies_go_to_different_annotators(store):
+    store.create(range(2), batch_size=2, overlap=2, lease_seconds=100)
+    ann = store.lease("ann", now=0)
+    for row in ann.rows:
+        store.complete("ann", row, {"q": "a"}, now=1)
+    # Done with copy 0, ann may not take copy 1 of the same batch
+    assert store.lease("ann", now=2) is None
+    bob = store.lease("bob", now=2)
+    assert (bob.copy, bob.pending) == (1, [0, 1])
+
+
+def test_released_copy_does_not_count_towards_another_copy(store):
+    store.create(range(4), batch_size=2, overlap=2, lease_seconds=100)
+    ann = store.lease("ann", now=0)
+    store.complete("ann", ann.rows[0], {"q": "a"}, now=1)
+    store.release("ann")
+
+    # Back on the released copy, with its answer still counted
+    again = store.lease("ann", now=2)
+    assert (again.batch, again.copy, again.pending) == (0, 0, [1])
+    store.release("ann")
+
+    bob = store.lease("bob", now=3)
+    assert (bob.batch, bob.copy, bob.pending) == (0, 0, [1])
+    # Copy 1 of batch 0 is free, but ann answered a row of that batch already
+    later = store.lease("ann", now=4)
+    assert (later.batch, later.copy, later.pending) == (1, 0, [2, 3])
+
+
+def test_agreement(store):
+    store.create(range(2), batch_size=2, overlap=2, lease_seconds=100)
+    for annotator, answers in (("ann", ["x", "y"]), ("bob", ["x", "z"])):
+        lease = store.lease(annotator, now=0)
+        for row, answer in zip(lease.rows, answers):
+            store.complete(annotator, row, {"label": answer, "note": "same"}, now=1)
+    assert store.agreement() == {"label": {"rows": 2, "agreeing": 1}, "note": {"rows": 2, "agreeing": 2}}
+    assert store.progress(now=2)["completed_by_annotator"] == {"ann": 2, "bob": 2}
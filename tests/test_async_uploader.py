@@ -0,0 +1,74 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+import pytest
+
+from async_uploader import AsyncUploader, build_record_payload, encode_batch
+
+
+def run_upload(handler, batches, **options):
+    uploader = AsyncUploader("http://argilla", "key", max_in_flight=2, retries=1, **options)
+    transport = httpx.MockTransport(handler)
+    uploader._client = lambda: httpx.AsyncClient(base_url=uploader.api_url, transport=transport)
+    return uploader, asyncio.run(uploader.upload_batches("ds", batches))
+
+
+def batches(compress, count=3):
+    return [(2, *encode_batch([build_record_payload({"text": f"r{i}"}, {}, external_id=str(i))] * 2, compress))
+            for i in range(count)]
+
+
+def plain_json_server(received):
+    def handler(request):
+        if request.headers.get("content-encoding") == "gzip":
+            return httpx.Response(422, json={"detail": [{"type": "json_invalid", "msg": "JSON decode error"}]})
+        received.append(json.loads(request.content))
+        return httpx.Response(200, json={})
+    return handler
+
+
+def test_build_record_payload():
+    payload = build_record_payload({"text": "t"}, {"m": 1}, responses={"q": "a"}, user_id=7, external_id="x")
+    assert payload["external_id"] == "x"
+    assert payload["responses"] == [{"values": {"q": {"value": "a"}}, "status": "submitted", "user_id": "7"}]
+
+
+def test_encode_batch_compresses_only_on_request():
+    body, compressed = encode_batch([{"fields": {"text": "한국어"}}], compress=True)
+    assert gzip.decompress(compressed) == body and json.loads(body) == {"items": [{"fields": {"text": "한국어"}}]}
+    assert encode_batch([], compress=False)[1] is None
+
+
+def test_plain_json_upload():
+    received = []
+    _, sent = run_upload(plain_json_server(received), batches(compress=False))
+    assert sent == 6 and len(received) == 3
+
+
+def test_gzip_falls_back_to_plain_json_on_a_body_decode_error():
+    received = []
+    uploader, sent = run_upload(plain_json_server(received), batches(compress=True), compress=True)
+    assert sent == 6 and len(received) == 3
+    assert uploader.compress is False
+
+
+def test_other_validation_errors_surface():
+    def handler(request):
+        return httpx.Response(422, json={"detail": "fields: text is required"})
+    with pytest.raises(httpx.HTTPStatusError):
+        run_upload(handler, batches(compress=True), compress=True)
+
+
+def test_retryable_errors_are_retried(monkeypatch):
+    async def no_sleep(_):
+        pass
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        return httpx.Response(503 if len(attempts) == 1 else 200, json={})
+    _, sent = run_upload(handler, batches(compress=False, count=1))
+    assert sent == 2 and len(attempts) == 2
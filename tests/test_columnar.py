@@ -0,0 +1,65 @@
+import datetime
+import io
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+from columnar import count_rows, is_columnar, iter_projected_records, schema_paths
+
+TABLE = pa.table({
+    "id": list(range(10)),
+    "doc": [{"title": f"t{i}", "body": f"b{i}"} for i in range(10)],
+    "tags": [[{"name": "x", "score": i}] for i in range(10)],
+    "day": [datetime.date(2024, 1, i + 1) for i in range(10)],
+})
+
+
+def parquet_bytes(table, row_group_size=4):
+    sink = io.BytesIO()
+    pq.write_table(table, sink, row_group_size=row_group_size)
+    return sink.getvalue()
+
+
+def ipc_bytes(table):
+    sink = io.BytesIO()
+    with pa_ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=3)
+    return sink.getvalue()
+
+
+def test_is_columnar():
+    assert is_columnar("x.parquet") and is_columnar("x.CSV") and is_columnar("x.feather")
+    assert not is_columnar("x.jsonl")
+
+
+def test_schema_paths_look_like_flattened_json():
+    assert schema_paths(parquet_bytes(TABLE), "x.parquet") == [
+        "data.id", "data.doc.title", "data.doc.body", "data.tags.name", "data.tags.score", "data.day"
+    ]
+
+
+def test_count_rows():
+    assert count_rows(parquet_bytes(TABLE), "x.parquet") == 10
+    assert count_rows(ipc_bytes(TABLE), "x.arrow") == 10
+    assert count_rows(b"a\n1\n", "x.csv") is None
+
+
+def test_parquet_projection_reads_only_selected_paths():
+    records = list(iter_projected_records(parquet_bytes(TABLE), "x.parquet", ["data.doc.title", "data.day"]))
+    assert records[0] == (1, {"doc": {"title": "t0"}, "day": "2024-01-01"})
+    assert [number for number, _ in records] == list(range(1, 11))
+
+
+def test_selected_rows_only():
+    for payload, name in ((parquet_bytes(TABLE), "x.parquet"), (ipc_bytes(TABLE), "x.arrow")):
+        records = list(iter_projected_records(payload, name, ["id"], rows={1, 7}))
+        assert [(number, record["id"]) for number, record in records] == [(2, 1), (8, 7)]
+
+
+def test_csv_dotted_headers_become_nested_records():
+    sink = io.BytesIO()
+    pa_csv.write_csv(pa.table({"doc.title": ["a", "b"], "doc.body": ["x", "y"], "n": [1, 2]}), sink)
+    records = list(iter_projected_records(sink.getvalue(), "x.csv", ["data.doc"]))
+    assert records == [(1, {"doc": {"title": "a", "body": "x"}}), (2, {"doc": {"title": "b", "body": "y"}})]
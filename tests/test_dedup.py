@@ -0,0 +1,64 @@
+import random
+
+import pandas as pd
+
+from dedup import MinHashLSH, choose_bands, find_duplicates, group_clusters, propagate_labels
+
+WORDS = ("court", "ruling", "appeal", "statute", "contract", "tenant", "damages", "notice", "party", "claim",
+         "evidence", "witness", "judge", "verdict", "motion", "filing", "clause", "liability", "breach", "remedy")
+
+
+def make_text(rng, words=60):
+    return " ".join(rng.choice(WORDS) + str(rng.randrange(1000)) for _ in range(words))
+
+
+def edit(rng, text, changes=2):
+    words = text.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = "edited"
+    return " ".join(words)
+
+
+def test_exact_duplicates_map_to_first_occurrence():
+    texts = ["a b c", "x y z", "a b c", "a b c"]
+    assert find_duplicates(texts, threshold=1.0) == {2: 0, 3: 0}
+    assert find_duplicates(texts, threshold=0.8) == {2: 0, 3: 0}
+
+
+def test_minhash_recalls_near_duplicates():
+    rng = random.Random(0)
+    originals = [make_text(rng) for _ in range(100)]
+    near = [edit(rng, text) for text in originals]
+    duplicate_of = find_duplicates(originals + near, threshold=0.7)
+
+    recalled = sum(duplicate_of.get(len(originals) + i) == i for i in range(len(originals)))
+    assert recalled >= 95
+    # Unrelated originals are never merged with each other
+    assert not any(member < len(originals) for member in duplicate_of)
+
+
+def test_whitespace_and_case_do_not_matter():
+    lsh = MinHashLSH(threshold=0.9)
+    assert (lsh.signature("Hello   World\nagain") == lsh.signature("hello world again")).all()
+
+
+def test_choose_bands_splits_the_signature():
+    bands, rows = choose_bands(128, 0.8)
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.8) < 0.1
+
+
+def test_group_clusters():
+    assert group_clusters({2: 0, 3: 0, 5: 4}) == {0: [2, 3], 4: [5]}
+
+
+def test_propagate_labels_copies_representative_labels():
+    df = pd.DataFrame({"text": ["a", "b", "a"], "label": ["pos", "neg", None]})
+    result = propagate_labels(df, {2: 0}, ["label", "missing"])
+    assert result["label"].tolist() == ["pos", "neg", "pos"]
+    assert df["label"].tolist() == ["pos", "neg", None]
+
+
+def test_propagate_labels_without_duplicates_returns_the_frame():
+    df = pd.DataFrame({"label": ["pos"]})
+    assert propagate_labels(df, {}, ["label"]) is df
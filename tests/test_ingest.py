@@ -0,0 +1,58 @@
+import bz2
+import gzip
+import io
+import json
+import lzma
+
+import pytest
+
+import ingest
+from ingest import iter_numbered_records, iter_records, iter_shard_records, strip_compression_suffix
+
+RECORDS = [{"id": i, "text": f"record {i}", "nested": {"values": [i, i + 0.5]}} for i in range(50)]
+
+
+def jsonl(records):
+    return "\n".join(json.dumps(record) for record in records).encode("utf-8")
+
+
+def test_strip_compression_suffix():
+    assert strip_compression_suffix("part-0.jsonl.gz") == "part-0.jsonl"
+    assert strip_compression_suffix("part-0.JSON.XZ") == "part-0.JSON"
+    assert strip_compression_suffix("data.json") == "data.json"
+
+
+@pytest.mark.parametrize("document", [
+    {"data": RECORDS},
+    RECORDS,
+    {"meta": {"source": "x"}, "data": RECORDS, "tail": 1},
+])
+def test_json_documents_stream_across_chunk_boundaries(monkeypatch, document):
+    monkeypatch.setattr(ingest, "CHUNK_SIZE", 7)
+    payload = json.dumps(document, indent=1).encode("utf-8")
+    assert list(iter_records(io.BytesIO(payload), "data.json")) == RECORDS
+
+
+def test_json_document_without_data_array_is_one_record():
+    payload = json.dumps({"data": {"a": 1}}).encode("utf-8")
+    assert list(iter_records(io.BytesIO(payload), "data.json")) == [{"a": 1}]
+    payload = json.dumps({"a": 1}).encode("utf-8")
+    assert list(iter_records(io.BytesIO(payload), "data.json")) == [{"a": 1}]
+
+
+def test_jsonl_skips_invalid_lines_and_keeps_line_numbers():
+    payload = b'{"a": 1}\n\nnot json\n{"a": 2}\n'
+    assert list(iter_numbered_records(io.BytesIO(payload), "x.jsonl")) == [(1, {"a": 1}), (4, {"a": 2})]
+
+
+@pytest.mark.parametrize("suffix, compress", [(".gz", gzip.compress), (".bz2", bz2.compress), (".xz", lzma.compress)])
+def test_compressed_shards(suffix, compress):
+    assert list(iter_records(io.BytesIO(compress(jsonl(RECORDS))), "part.jsonl" + suffix)) == RECORDS
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_shards_merge_in_order(max_workers):
+    shards = [(f"part-{i}.jsonl.gz", gzip.compress(jsonl(RECORDS[i * 10:(i + 1) * 10]))) for i in range(5)]
+    entries = list(iter_shard_records(shards, max_workers=max_workers))
+    assert [record for _, record in entries] == RECORDS
+    assert entries[12][0] == ("part-1.jsonl.gz", 3)
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from job_manager import JobLimitError, JobManager, iter_reported
+
+
+def wait(job, timeout=5.0):
+    deadline = time.time() + timeout
+    while job.active and time.time() < deadline:
+        time.sleep(0.01)
+    assert not job.active
+
+
+def blocked(job, event):
+    event.wait(5)
+    return "done"
+
+
+def test_job_runs_and_result_is_released_once_collected():
+    manager = JobManager()
+    job = manager.submit("ann", "test", "Add", lambda job, a, b: a + b, 1, 2)
+    wait(job)
+    assert job.status == "completed"
+    assert manager.collect(job.id) == 3
+    assert manager.collect(job.id) is None and job.result is None
+
+
+def test_failures_are_recorded():
+    manager = JobManager()
+    job = manager.submit("ann", "test", "Fail", lambda job: 1 / 0)
+    wait(job)
+    assert job.status == "failed" and job.error.startswith("ZeroDivisionError")
+    assert manager.collect(job.id) is None
+
+
+def test_per_owner_limit_exempts_internal_jobs():
+    manager = JobManager(max_jobs_per_owner=1)
+    event = threading.Event()
+    try:
+        manager.submit("ann", "test", "Block", blocked, event)
+        with pytest.raises(JobLimitError):
+            manager.submit("ann", "test", "Block", blocked, event)
+        internal = manager.submit("ann", "index", "Index", blocked, event, internal=True)
+        assert internal.internal
+        manager.submit("bob", "test", "Block", blocked, event)
+    finally:
+        event.set()
+
+
+def test_cancel_is_seen_by_the_job():
+    manager = JobManager()
+    started = threading.Event()
+
+    def loop(job):
+        started.set()
+        while not job.cancelled:
+            time.sleep(0.01)
+    job = manager.submit("ann", "test", "Loop", loop)
+    started.wait(5)
+    manager.cancel(job.id)
+    wait(job)
+    assert job.status == "cancelled"
+
+
+def test_finished_jobs_of_every_owner_are_pruned():
+    manager = JobManager(keep_finished=1, max_age=60)
+    old = manager.submit("ann", "test", "Old", lambda job: None)
+    wait(old)
+    old.finished_at -= 120
+    first = manager.submit("bob", "test", "First", lambda job: None)
+    wait(first)
+    second = manager.submit("bob", "test", "Second", lambda job: None)
+    wait(second)
+    assert manager.jobs_for("bob") == [second]
+    assert manager.get(old.id) is None
+
+
+def test_iter_reported_stops_once_cancelled():
+    manager = JobManager()
+    job = manager.submit("ann", "test", "Count", lambda job: list(iter_reported(job, range(25), every=10)))
+    wait(job)
+    assert job.result == list(range(25)) and job.progress == 25
+
+    job.cancel_event.set()
+    assert list(iter_reported(job, range(25), every=10)) == []
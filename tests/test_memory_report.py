@@ -0,0 +1,27 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from memory_report import deep_sizeof, format_bytes, memory_breakdown
+from project_snapshot import pack_records
+
+
+def test_shared_objects_are_counted_once():
+    text = "x" * 10_000
+    state = {"json_data": {"data": [{"text": text}]}, "dataset": pd.DataFrame({"text": [text]})}
+    breakdown = dict(memory_breakdown(state))
+    assert breakdown["json_data"] > sys.getsizeof(text)
+    assert breakdown["dataset"] < sys.getsizeof(text)
+
+
+def test_arrays_and_packed_records_count_their_buffers():
+    assert deep_sizeof(np.zeros(1000, dtype=np.int64)) >= 8000
+    packed = pack_records([{"text": "y" * 1000}] * 10)
+    assert 10_000 <= deep_sizeof(packed) < 20_000
+
+
+def test_format_bytes():
+    assert format_bytes(512) == "512 B"
+    assert format_bytes(1536) == "1.5 KB"
+    assert format_bytes(3 * 1024 ** 3) == "3.0 GB"
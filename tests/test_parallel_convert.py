@@ -0,0 +1,32 @@
+import json
+from collections import Counter
+from functools import partial
+
+from parallel_convert import iter_converted_batches
+
+
+def convert_rows(prefix, rows, stats):
+    for row in rows:
+        stats["converted"] += 1
+        yield {"fields": {"text": f"{prefix}{row}"}}
+
+
+def texts(batches):
+    return [item["fields"]["text"] for _, body, _ in batches for item in json.loads(body)["items"]]
+
+
+def test_in_process_conversion_keeps_row_order():
+    stats = Counter()
+    batches = list(iter_converted_batches(partial(convert_rows, "r"), list, 25, batch_size=10, compress=False,
+                                          workers=1, stats=stats))
+    assert [count for count, _, _ in batches] == [10, 10, 5]
+    assert texts(batches) == [f"r{i}" for i in range(25)] and stats["converted"] == 25
+
+
+def test_process_pool_conversion_matches_in_process(monkeypatch):
+    monkeypatch.setattr("parallel_convert.MIN_PARALLEL_ROWS", 0)
+    stats = Counter()
+    batches = list(iter_converted_batches(partial(convert_rows, "r"), list, 95, batch_size=10, compress=True,
+                                          workers=2, chunk_size=20, stats=stats))
+    assert texts(batches) == [f"r{i}" for i in range(95)] and stats["converted"] == 95
+    assert all(compressed is not None for _, _, compressed in batches)
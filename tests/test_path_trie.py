@@ -0,0 +1,24 @@
+from path_trie import PathTrie
+
+
+def test_membership_and_ancestors():
+    trie = PathTrie(["data.a", "data.b.c"])
+    assert "data.a" in trie and "data.b.c" in trie
+    assert "data.b" not in trie and "data.x" not in trie
+    assert trie.has_ancestor("data.a.x")
+    assert not trie.has_ancestor("data.a")
+    assert trie.has_ancestor("data.b.c.d")
+
+
+def test_to_tree_keeps_insertion_order_at_every_level():
+    trie = PathTrie(["data.z.b", "data.a", "data.z.a"])
+    tree = trie.to_tree()
+    assert list(tree["data"]) == ["z", "a"]
+    assert list(tree["data"]["z"]) == ["b", "a"]
+    assert tree["data"]["a"] is None
+
+
+def test_to_tree_keeps_inserted_paths_that_have_children():
+    tree = PathTrie(["data.meta.k", "data.meta", "data.t"]).to_tree()
+    assert tree == {"data": {"meta": {None: None, "k": None}, "t": None}}
+    assert list(tree["data"]["meta"])[0] is None
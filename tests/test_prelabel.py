@@ -0,0 +1,48 @@
+import numpy as np
+
+from prelabel import HashedTextClassifier, Prelabels, hashed_features, train_and_predict
+
+
+class Job:
+    cancelled = False
+
+    def report(self, progress, total=None):
+        pass
+
+
+TEXTS = ["great product love it", "terrible broken waste", "love the great quality", "broken on arrival terrible",
+         "works great", "awful and broken"]
+LABELS = {0: "pos", 1: "neg", 2: "pos", 3: "neg"}
+
+
+def test_hashed_features_are_normalized():
+    indices, values = hashed_features("법률에 법률의", 2 ** 10)
+    assert len(indices) == len(values) and np.isclose(np.linalg.norm(values), 1.0)
+    assert len(hashed_features("", 2 ** 10)[0]) == 0
+
+
+def test_train_and_predict_scores_unlabeled_rows():
+    model = HashedTextClassifier(["pos", "neg"], n_features=2 ** 12)
+    prelabels = train_and_predict(Job(), model, TEXTS, LABELS, batch_size=4)
+    assert prelabels.probabilities.shape == (6, 2) and np.allclose(prelabels.probabilities.sum(axis=1), 1.0)
+    assert prelabels.suggestion(4)[0] == "pos" and prelabels.suggestion(5)[0] == "neg"
+    assert prelabels.trained_on == 4 and prelabels.scored_with == model.examples_seen
+    assert prelabels.uncertainty().shape == (6,)
+
+
+def test_refresh_rescores_rows_after_more_answers():
+    model = HashedTextClassifier(["pos", "neg"], n_features=2 ** 12)
+    prelabels = train_and_predict(Job(), model, TEXTS, LABELS)
+    assert not prelabels.refresh(5, model, TEXTS[5])
+    model.partial_fit([TEXTS[5]], ["neg"])
+    assert prelabels.refresh(5, model, TEXTS[5])
+    assert prelabels.rescored == {5: model.examples_seen}
+    assert not prelabels.refresh(5, model, TEXTS[5])
+
+
+def test_multi_label_suggestions():
+    prelabels = Prelabels(["a", "b", "c"], True, np.array([[0.9, 0.2, 0.6]], dtype=np.float32), trained_on=1)
+    value, score = prelabels.suggestion(0)
+    assert value == ["a", "c"] and np.allclose(score, [0.9, 0.6])
+    assert prelabels.take([0, 0]).probabilities.shape == (2, 3)
+    assert prelabels.to_suggestion(0, 5)["question_id"] == "5"
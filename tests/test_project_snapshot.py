@@ -0,0 +1,85 @@
+import json
+import os
+from array import array
+
+import pandas as pd
+import pytest
+
+from annotator_metrics import TimingLog
+from project_snapshot import ArrowRows, list_snapshots, open_snapshot, pack_records, read_manifest, save_snapshot
+
+RECORDS = [{"id": i, "text": f"텍스트 {i}", "tags": ["a", "b"][:i % 3]} for i in range(5)]
+
+
+class Job:
+    cancelled = False
+
+    def report(self, progress, total=None):
+        pass
+
+
+def project(records=RECORDS):
+    timings = TimingLog()
+    timings.add(1, "ann", 3.5, ["Quality"], submitted_at=10)
+    return {
+        "dataset": pd.DataFrame({
+            "data.text": [record["text"] for record in RECORDS],
+            "data.id": [record["id"] for record in RECORDS],
+            "data.tags": [record["tags"] for record in RECORDS],
+            "Quality": ["Good", None, "Bad", None, None],
+            "NER": [None, [{"label": "X", "start": 0, "end": 1}], None, None, None],
+        }),
+        "questions": [{"question_title": "Quality"}, {"question_title": "NER"}],
+        "selected_columns": [{"text": "data.text"}],
+        "row_sources": array("I", [0, 1, 2, 3, 4]),
+        "duplicate_of": {4: 0},
+        "json_data": {"data": records},
+        "record_origins": [("part-0.jsonl", i + 1) for i in range(5)],
+        "annotation_timings": timings,
+    }
+
+
+def test_pack_records_decodes_on_access():
+    packed = pack_records(RECORDS)
+    assert isinstance(packed, ArrowRows)
+    assert len(packed) == 5 and packed[2] == RECORDS[2] and packed[-1] == RECORDS[-1]
+    assert list(packed) == RECORDS and packed[1:3] == RECORDS[1:3]
+    assert pack_records(packed) is packed
+
+
+@pytest.mark.parametrize("records", [RECORDS, pack_records(RECORDS)])
+def test_snapshot_round_trip(tmp_path, records):
+    path = save_snapshot(Job(), str(tmp_path / "project"), project(records))
+    state = open_snapshot(path)
+
+    dataset = state["dataset"]
+    assert dataset["data.text"].tolist() == [record["text"] for record in RECORDS]
+    assert dataset["data.id"].tolist() == list(range(5))
+    assert dataset["data.tags"].tolist() == [record["tags"] for record in RECORDS]
+    assert dataset["Quality"].tolist() == ["Good", None, "Bad", None, None]
+    assert dataset["NER"][1] == [{"label": "X", "start": 0, "end": 1}]
+    assert list(state["row_sources"]) == [0, 1, 2, 3, 4]
+    assert state["duplicate_of"] == {4: 0}
+    assert list(state["json_data"]["data"]) == RECORDS
+    assert state["record_origins"][3] == ("part-0.jsonl", 4)
+    assert state["questions"] == [{"question_title": "Quality"}, {"question_title": "NER"}]
+    timings = state["annotation_timings"]
+    assert (timings.annotators, list(timings.rows), list(timings.seconds)) == (["ann"], [1], [3.5])
+
+
+def test_saving_again_replaces_the_snapshot(tmp_path):
+    path = str(tmp_path / "project")
+    save_snapshot(Job(), path, project())
+    state = project()
+    state["dataset"], state["row_sources"] = state["dataset"].iloc[:2], array("I", [0, 1])
+    save_snapshot(Job(), path, state)
+    assert read_manifest(path)["rows"] == 2
+    assert list_snapshots(str(tmp_path)) == [path]
+    assert os.listdir(tmp_path) == ["project"]
+
+
+def test_read_manifest_rejects_other_directories(tmp_path):
+    (tmp_path / "manifest.json").write_text(json.dumps({"format": "other"}))
+    with pytest.raises(ValueError):
+        read_manifest(str(tmp_path))
+    assert list_snapshots(str(tmp_path / "missing")) == []
@@ -0,0 +1,64 @@
+from collections import Counter
+
+import pytest
+
+from sampling import allocate, reservoir_sample, stratified_sample
+
+
+def test_reservoir_sample_keeps_everything_from_a_short_stream():
+    assert reservoir_sample(range(5), 10) == [0, 1, 2, 3, 4]
+    assert reservoir_sample(range(5), 0) == []
+
+
+def test_reservoir_sample_size_order_and_determinism():
+    sample = reservoir_sample(iter(range(10_000)), 100, seed=3)
+    assert len(sample) == 100 == len(set(sample))
+    assert sample == sorted(sample)
+    assert sample == reservoir_sample(range(10_000), 100, seed=3)
+
+
+def test_reservoir_sample_is_uniform():
+    # Every item of a 20-item stream should be picked in about 5 of 20 draws of size 5
+    counts = Counter()
+    trials = 4000
+    for seed in range(trials):
+        counts.update(reservoir_sample(range(20), 5, seed=seed))
+    expected = trials * 5 / 20
+    assert set(counts) == set(range(20))
+    assert all(abs(count - expected) < 0.1 * expected for count in counts.values())
+
+
+def test_allocate_proportional_and_equal():
+    counts = {"a": 80, "b": 15, "c": 5}
+    assert allocate(counts, 10) == {"a": 8, "b": 2, "c": 0}
+    assert allocate(counts, 9, "equal") == {"a": 3, "b": 3, "c": 3}
+    assert allocate({"a": 80, "b": 1}, 5, "equal") == {"a": 4, "b": 1}
+    assert allocate(counts, 500) == counts
+
+
+def test_stratified_sample_respects_quotas():
+    items = [("a", i) for i in range(900)] + [("b", i) for i in range(100)]
+    sample = stratified_sample(items, 50, key=lambda item: item[0], seed=1)
+    assert Counter(stratum for stratum, _ in sample) == {"a": 45, "b": 5}
+    assert sample == sorted(sample, key=items.index)
+
+
+def test_stratified_sample_equal_allocation_takes_small_strata_whole():
+    items = [("a", i) for i in range(900)] + [("b", i) for i in range(3)]
+    sample = stratified_sample(items, 10, key=lambda item: item[0], allocation="equal")
+    assert Counter(stratum for stratum, _ in sample) == {"a": 7, "b": 3}
+
+
+def test_stratified_sample_is_uniform_within_a_stratum():
+    counts = Counter()
+    trials = 2000
+    for seed in range(trials):
+        counts.update(x for x in stratified_sample(range(40), 4, key=lambda x: x % 2, seed=seed) if x % 2 == 0)
+    expected = trials * 2 / 20
+    assert all(abs(counts[x] - expected) < 0.15 * expected for x in range(0, 40, 2))
+
+
+def test_stratified_sample_rejects_too_many_strata():
+    with pytest.raises(ValueError, match="distinct strata"):
+        stratified_sample(range(100), 5, key=lambda x: x, max_strata=10)
+    assert len(stratified_sample(range(100), 5, key=lambda x: x % 10, max_strata=10)) == 5
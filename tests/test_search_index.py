@@ -0,0 +1,65 @@
+from search_index import InvertedIndex, index_records, tokenize
+
+
+class Job:
+    cancelled = False
+
+    def __init__(self):
+        self.progress = 0
+
+    def report(self, progress):
+        self.progress = progress
+
+
+def build():
+    rows = [
+        (["법률에 따른 신고", "first"], ["법령"]),
+        (["법률의 해석"], ["판례"]),
+        (["apple pie recipe"], ["법령"]),
+        (["apple bank"], [None]),
+    ]
+    job = Job()
+    index = index_records(job, rows, ["data.doc_type"])
+    assert job.progress == 4
+    return index
+
+
+def test_tokenize_lowercases_distinct_words():
+    assert tokenize("Apple apple, PIE!") == {"apple", "pie"}
+
+
+def test_prefix_terms_match_longer_words():
+    index = build()
+    assert index.search("법률").tolist() == [0, 1]
+    assert index.search("app").tolist() == [2, 3]
+
+
+def test_clauses_intersect():
+    index = build()
+    assert index.search("apple pie").tolist() == [2]
+    assert index.search('"apple bank"').tolist() == [3]
+    assert index.search("apple zzz").tolist() == []
+
+
+def test_metadata_filters_match_by_field_suffix():
+    index = build()
+    assert index.search("doc_type:법령").tolist() == [0, 2]
+    assert index.search("data.doc_type:판례").tolist() == [1]
+    assert index.search("doc_type:nothing").tolist() == []
+
+
+def test_exclusions():
+    index = build()
+    assert index.search("-apple").tolist() == [0, 1]
+    assert index.search("-apple -법률").tolist() == []
+    assert index.search("apple -pie").tolist() == [3]
+    assert index.search('-"apple pie"').tolist() == [0, 1, 3]
+
+
+def test_empty_query_matches_everything():
+    assert build().search("").tolist() == [0, 1, 2, 3]
+    assert InvertedIndex().search("-x").tolist() == []
+
+
+def test_unbalanced_quotes_fall_back_to_words():
+    assert build().search('"apple').tolist() == [2, 3]
@@ -0,0 +1,72 @@
+import io
+import json
+import math
+
+import pytest
+
+import serialization
+
+DOCUMENTS = [
+    '{"a": 1, "b": [1.5, -2, 1e16, 1e-05, true, null], "c": {"d": "한국어 텍스트"}}',
+    '[12345678901234567890, -98765432109876543210, 3]',
+    '{"nan": NaN, "inf": Infinity}',
+    '"\\ud800 lone surrogate"',
+    '"emoji \\ud83d\\ude00"',
+    '0.1',
+    '{}',
+]
+VALUES = [
+    "plain", "한국어", "quote \" and \\ backslash\n", "\ud800",
+    {"b": 1, "a": [1.0, 1e16, 1e-05, 2 ** 70, None, True]},
+    [float("inf"), -0.0],
+]
+
+
+@pytest.fixture(params=serialization.available_backends())
+def backend(request):
+    previous = serialization.backend()
+    serialization.use_backend(request.param)
+    yield request.param
+    serialization.use_backend(previous)
+
+
+def same(a, b):
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_loads_matches_the_standard_library(backend, document):
+    assert same(serialization.loads(document), json.loads(document))
+    assert same(serialization.loads(document.encode("utf-8")), json.loads(document))
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_dumps_matches_the_standard_library(backend, value):
+    assert serialization.dumps(value) == json.dumps(value, ensure_ascii=False)
+    assert serialization.dumps(value, sort_keys=True) == json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def test_round_trip(backend):
+    value = {"text": "한국어", "numbers": [1, 2.5, 2 ** 65], "nested": {"empty": []}}
+    assert serialization.loads(serialization.dumps(value)) == value
+    assert serialization.load(io.StringIO(serialization.dumps(value))) == value
+
+
+def test_default_handles_unknown_types(backend):
+    assert serialization.dumps({"s": {1}}, default=str) == '{"s": "{1}"}'
+
+
+def test_invalid_documents_raise_the_standard_error(backend):
+    with pytest.raises(json.JSONDecodeError):
+        serialization.loads("{not json")
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        serialization.use_backend("simdjson")
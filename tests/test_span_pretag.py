@@ -0,0 +1,73 @@
+import random
+
+from span_pretag import SpanPretags, SpanTagger, TermMatcher, parse_rules, pretag_spans
+
+
+class Job:
+    cancelled = False
+
+    def report(self, progress, total=None):
+        pass
+
+
+def naive_matches(terms, text):
+    return sorted(
+        (start, start + len(term), index)
+        for index, term in enumerate(terms) if term
+        for start in range(len(text) - len(term) + 1) if text.startswith(term, start)
+    )
+
+
+def test_term_matcher_finds_overlapping_and_nested_terms():
+    terms = ["he", "she", "his", "hers"]
+    assert sorted(TermMatcher(terms).iter_matches("ushers")) == [(1, 4, 1), (2, 4, 0), (2, 6, 3)]
+
+
+def test_term_matcher_offsets_match_a_naive_scan():
+    rng = random.Random(0)
+    for _ in range(50):
+        terms = ["".join(rng.choice("ab가") for _ in range(rng.randint(1, 4))) for _ in range(8)]
+        terms = list(dict.fromkeys(terms))
+        text = "".join(rng.choice("ab가 ") for _ in range(60))
+        assert sorted(TermMatcher(terms).iter_matches(text)) == naive_matches(terms, text)
+
+
+def test_parse_rules_reports_unusable_lines():
+    text = "서울특별시 => LC\n# comment\n\nno separator\nx => ZZ\n[ => LC"
+    assert parse_rules(text, ["LC"]) == (
+        [("서울특별시", "LC"), ("[", "LC")],
+        ["Line 4: expected '<term> => <label>'", "Line 5: 'ZZ' is not a label of this question"],
+    )
+    rules, errors = parse_rules(text, ["LC"], regex=True)
+    assert rules == [("서울특별시", "LC")] and errors[-1].startswith("Line 6: invalid regular expression")
+
+
+def test_tagger_keeps_the_earliest_longest_span():
+    tagger = SpanTagger([("서울", "LC"), ("서울특별시", "LC"), ("법령", "CV")], rules=[(r"제\d+조", "CV")])
+    text = "서울특별시 법령에 따라 제2조를 적용한다"
+    assert tagger.tag(text) == [
+        {"label": "LC", "start": 0, "end": 5},
+        {"label": "CV", "start": 6, "end": 8},
+        {"label": "CV", "start": 13, "end": 16},
+    ]
+
+
+def test_tagger_case_and_whole_words():
+    tagger = SpanTagger([("apple", "ORG")], ignore_case=True, whole_words=True)
+    assert tagger.tag("Apple pineapple APPLE") == [
+        {"label": "ORG", "start": 0, "end": 5}, {"label": "ORG", "start": 16, "end": 21}
+    ]
+    # Characters that lengthen when lowercased keep the offsets in place
+    assert SpanTagger([("apple", "ORG")], ignore_case=True).tag("İ Apple") == [{"label": "ORG", "start": 2, "end": 7}]
+
+
+def test_pretags_store_spans_per_row():
+    tagger = SpanTagger([("a", "X")])
+    pretags = pretag_spans(Job(), tagger, ["a b a", "none", "a"], ["X"])
+    assert len(pretags) == 3 and pretags.span_count == 3
+    assert pretags.spans(0) == [{"label": "X", "start": 0, "end": 1}, {"label": "X", "start": 4, "end": 5}]
+    assert pretags.spans(1) == [] and pretags.spans(7) == []
+    assert pretags.to_suggestion(1, "q") is None
+    assert pretags.to_suggestion(2, "q")["value"] == [{"label": "X", "start": 0, "end": 1}]
+    taken = pretags.take([2, 0])
+    assert isinstance(taken, SpanPretags) and taken.spans(0) == pretags.spans(2)
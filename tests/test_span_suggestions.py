@@ -0,0 +1,59 @@
+from collections import Counter
+
+from span_suggestions import (DEFAULT_SPAN_IMPORT, convert_spans, detect_end_inclusive, drop_overlapping,
+                              merge_spans, record_span_suggestions, text_span_pairs)
+
+CONFIG = dict(DEFAULT_SPAN_IMPORT, path="data.sentence.NE")
+RECORD = {"sentence": [
+    {"text": "Seoul is in Korea", "NE": [{"type": "LC", "begin": 0, "end": 5, "entity": "Seoul"},
+                                         {"type": "LC", "begin": 12, "end": 17, "entity": "Korea"}]},
+    {"text": "Kim visited Busan", "NE": [{"type": "PS", "begin": 0, "end": 3, "entity": "Kim"}]},
+]}
+
+
+def test_texts_pair_with_the_spans_of_the_same_object():
+    pairs = text_span_pairs(RECORD, "data.sentence.text", "data.sentence.NE")
+    assert [(text, len(spans)) for text, spans in pairs] == [("Seoul is in Korea", 2), ("Kim visited Busan", 1)]
+
+
+def test_detect_end_inclusive():
+    pairs = text_span_pairs(RECORD, "data.sentence.text", "data.sentence.NE")
+    assert detect_end_inclusive(pairs, CONFIG) is False
+    inclusive = [(text, [dict(span, end=span["end"] - 1) for span in spans]) for text, spans in pairs]
+    assert detect_end_inclusive(inclusive, CONFIG) is True
+
+
+def test_convert_spans_validates_and_realigns():
+    stats = Counter()
+    raw = [
+        {"type": "LC", "begin": 0, "end": 5, "entity": "Seoul"},
+        {"type": "LC", "begin": 10, "end": 15, "entity": "Korea"},  # Shifted: moved to the real occurrence
+        {"type": "XX", "begin": 0, "end": 5, "entity": "Seoul"},
+        {"type": "LC", "begin": 0, "end": 3, "entity": "Tokyo"},
+        {"type": "LC", "begin": "?", "end": 3},
+    ]
+    spans = convert_spans("Seoul is in Korea", raw, CONFIG, labels=["LC"], stats=stats)
+    assert spans == [{"label": "LC", "start": 0, "end": 5}, {"label": "LC", "start": 12, "end": 17}]
+    assert stats == Counter(imported=2, realigned=1, unknown_label=1, text_mismatch=1, malformed=1)
+
+
+def test_drop_overlapping_keeps_the_earliest_longest_span():
+    spans = [{"start": 2, "end": 4}, {"start": 0, "end": 5}, {"start": 5, "end": 6}]
+    assert drop_overlapping(spans) == [{"start": 0, "end": 5}, {"start": 5, "end": 6}]
+
+
+def test_merge_spans_adds_only_non_overlapping_extras():
+    spans = [{"start": 0, "end": 5}]
+    extra = [{"start": 3, "end": 8}, {"start": 6, "end": 8}]
+    assert merge_spans(spans, extra) == [{"start": 0, "end": 5}, {"start": 6, "end": 8}]
+
+
+def test_record_span_suggestions_for_a_single_text_and_a_joined_list():
+    assert record_span_suggestions(RECORD, "Kim visited Busan", "data.sentence.text", CONFIG) == [
+        {"label": "PS", "start": 0, "end": 3}
+    ]
+    joined = record_span_suggestions(RECORD, ["Seoul is in Korea", "Kim visited Busan"], "data.sentence.text", CONFIG)
+    assert joined[-1] == {"label": "PS", "start": len("Seoul is in Korea, "), "end": len("Seoul is in Korea, Kim")}
+    stats = Counter()
+    assert record_span_suggestions(RECORD, "other text", "data.sentence.text", CONFIG, stats=stats) == []
+    assert stats["unmatched_text"] == 1
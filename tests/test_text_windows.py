@@ -0,0 +1,25 @@
+from text_windows import spans_in_window, to_absolute, window_bounds, window_count
+
+
+def test_windows_cover_the_text_with_overlap():
+    length, size, overlap = 2500, 1000, 100
+    count = window_count(length, size, overlap)
+    bounds = [window_bounds(length, i, size, overlap) for i in range(count)]
+    assert bounds == [(0, 1000), (900, 1900), (1800, 2500)]
+    assert window_bounds(length, 99, size, overlap) == bounds[-1]
+
+
+def test_short_text_is_one_window():
+    assert window_count(10, 1000, 100) == 1
+    assert window_bounds(10, 0, 1000, 100) == (0, 10)
+
+
+def test_overlap_at_least_the_window_size_still_advances():
+    assert window_count(30, 10, 50) == 21
+
+
+def test_spans_map_between_window_and_document():
+    spans = [{"label": "X", "start": 905, "end": 910}, {"label": "X", "start": 1890, "end": 1905}]
+    inside = spans_in_window(spans, 900, 1900)
+    assert inside == [{"label": "X", "start": 5, "end": 10}]
+    assert to_absolute(inside[0], 900) == spans[0]
@@ -0,0 +1,33 @@
+import numpy as np
+
+from upload_dry_run import (MAX_LABEL_OPTIONS, PayloadSample, estimate_upload, measure_payloads, option_warnings,
+                            sample_positions)
+
+
+def test_sample_positions():
+    assert sample_positions(5, 10) == [0, 1, 2, 3, 4]
+    positions = sample_positions(1000, 50, seed=1)
+    assert len(set(positions)) == 50 and positions == sorted(positions)
+
+
+def test_measure_payloads_points_at_the_largest_records():
+    payloads = [{"fields": {"text": "x" * size}} for size in (10, 1000, 100)]
+    sample = measure_payloads([7, 8, 9], payloads, batch_size=2)
+    assert sample.largest[0][0] == 8 and sample.largest[0][1] == sample.sizes.max()
+    assert 0 < sample.compressed_ratio < 1
+
+
+def test_estimate_upload():
+    sample = PayloadSample(sizes=np.array([1000, 1000]), compressed_ratio=0.25)
+    estimate = estimate_upload(1000, sample, batch_size=100, max_in_flight=4, compress=True, round_trip=0.2,
+                               bandwidth=1000.0)
+    assert estimate["batches"] == 10
+    assert estimate["total_bytes"] == 1_000_000 and estimate["sent_bytes"] == 250_000
+    assert estimate["seconds"] == 250.0
+    assert estimate_upload(1000, sample, 100, 4, False, 0.2)["seconds"] == 0.5
+
+
+def test_option_warnings():
+    questions = [{"question_title": "q", "labels": [str(i) for i in range(MAX_LABEL_OPTIONS + 1)]}]
+    warnings = option_warnings({"meta": [str(i) for i in range(300)], "small": ["a"]}, questions)
+    assert len(warnings) == 2 and "meta" in warnings[0] and "'q'" in warnings[1]
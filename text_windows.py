@@ -0,0 +1,42 @@
+from typing import Any, Dict, List, Tuple
+
+DEFAULT_WINDOW_SIZE = 4000
+DEFAULT_OVERLAP = 200
+
+
+def _stride(size: int, overlap: int) -> int:
+    return max(1, size - max(0, min(overlap, size - 1)))
+
+
+def window_count(length: int, size: int = DEFAULT_WINDOW_SIZE, overlap: int = DEFAULT_OVERLAP) -> int:
+    """Return how many windows of `size` characters, overlapping by `overlap`, cover a text of `length`."""
+    if length <= size:
+        return 1
+    stride = _stride(size, overlap)
+    return 1 + -(-(length - size) // stride)
+
+
+def window_bounds(length: int, index: int, size: int = DEFAULT_WINDOW_SIZE,
+                  overlap: int = DEFAULT_OVERLAP) -> Tuple[int, int]:
+    """
+    Return the absolute [start, end) character offsets of window `index`.
+
+    Windows start every `size - overlap` characters, so the bounds of any window
+    are computed directly, without scanning the text.
+    """
+    index = max(0, min(index, window_count(length, size, overlap) - 1))
+    start = index * _stride(size, overlap)
+    return start, min(start + size, length)
+
+
+def spans_in_window(spans: List[Dict[str, Any]], start: int, end: int) -> List[Dict[str, Any]]:
+    """Return the spans lying entirely inside [start, end), with offsets relative to the window."""
+    return [
+        dict(span, start=span["start"] - start, end=span["end"] - start)
+        for span in spans if start <= span["start"] and span["end"] <= end
+    ]
+
+
+def to_absolute(span: Dict[str, Any], window_start: int) -> Dict[str, Any]:
+    """Map a span chosen inside a window back to document offsets."""
+    return dict(span, start=span["start"] + window_start, end=span["end"] + window_start)
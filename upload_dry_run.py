@@ -0,0 +1,142 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+
+import serialization
+from async_uploader import encode_batch
+
+# Stands in for the ids of the dataset, questions and user, which only exist once the dataset is created
+PLACEHOLDER_ID = "00000000-0000-0000-0000-000000000000"
+
+# Records above this size make a bulk request slow enough to hit proxy and server timeouts
+OVERSIZED_RECORD_BYTES = 1_000_000
+# Long option lists make the dataset settings heavy to create and the metadata filters unusable
+MAX_METADATA_OPTIONS = 250
+MAX_LABEL_OPTIONS = 500
+
+
+@dataclass
+class PayloadSample:
+    """Serialized sizes of a sample of record payloads, built exactly as the upload builds them."""
+    sizes: np.ndarray
+    compressed_ratio: float
+    largest: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def mean(self) -> float:
+        return float(self.sizes.mean()) if len(self.sizes) else 0.0
+
+    @property
+    def p95(self) -> float:
+        return float(np.percentile(self.sizes, 95)) if len(self.sizes) else 0.0
+
+
+def sample_positions(total: int, size: int, seed: int = 0) -> List[int]:
+    """Return a sorted uniform sample of row positions."""
+    if size >= total:
+        return list(range(total))
+    return sorted(np.random.default_rng(seed).choice(total, size=size, replace=False).tolist())
+
+
+def measure_payloads(rows: Sequence[int], payloads: Iterable[Dict[str, Any]], batch_size: int) -> PayloadSample:
+    """
+    Measure the JSON size of every sampled payload and the gzip ratio of full batches.
+
+    `rows` are the dataset positions of the payloads, used to point at the largest records.
+    """
+    sizes = []
+    raw_bytes = compressed_bytes = 0
+    batch: List[Dict[str, Any]] = []
+    for payload in payloads:
+        sizes.append(len(serialization.dumps(payload).encode("utf-8")))
+        batch.append(payload)
+        if len(batch) == batch_size:
+            body, compressed = encode_batch(batch, compress=True)
+            raw_bytes, compressed_bytes = raw_bytes + len(body), compressed_bytes + len(compressed)
+            batch = []
+    if batch:
+        body, compressed = encode_batch(batch, compress=True)
+        raw_bytes, compressed_bytes = raw_bytes + len(body), compressed_bytes + len(compressed)
+
+    sizes = np.array(sizes, dtype=np.int64)
+    order = np.argsort(sizes)[::-1][:10]
+    return PayloadSample(
+        sizes=sizes,
+        compressed_ratio=compressed_bytes / raw_bytes if raw_bytes else 1.0,
+        largest=[(rows[i], int(sizes[i])) for i in order],
+    )
+
+
+def measure_round_trips(api_url: str, api_key: str, count: int = 5, timeout: float = 10.0) -> List[float]:
+    """Time `count` authenticated requests to the server over one keep-alive connection, in seconds."""
+    latencies = []
+    with httpx.Client(base_url=api_url.rstrip("/"), headers={"X-Argilla-Api-Key": api_key}, timeout=timeout) as client:
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get("/api/v1/me")
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+    # The first request also pays for the connection and TLS handshake, which the pooled upload does once
+    return latencies[1:] if len(latencies) > 1 else latencies
+
+
+def measure_bandwidth(api_url: str, api_key: str, body: bytes, compressed: Optional[bytes],
+                      timeout: float = 60.0) -> float:
+    """
+    Return the upload bandwidth in bytes per second, by sending one sample batch to a dataset that does not exist.
+
+    The server answers 404 after receiving the body, so nothing is stored.
+    """
+    content = compressed if compressed is not None else body
+    headers = {"X-Argilla-Api-Key": api_key, "Content-Type": "application/json"}
+    if compressed is not None:
+        headers["Content-Encoding"] = "gzip"
+    with httpx.Client(base_url=api_url.rstrip("/"), headers=headers, timeout=timeout) as client:
+        client.get("/api/v1/me")  # Open the connection first so only the transfer is timed
+        start = time.perf_counter()
+        client.put(f"/api/v1/datasets/{PLACEHOLDER_ID}/records/bulk", content=content)
+        elapsed = time.perf_counter() - start
+    return len(content) / elapsed if elapsed > 0 else float("inf")
+
+
+def estimate_upload(total_records: int, sample: PayloadSample, batch_size: int, max_in_flight: int,
+                    compress: bool, round_trip: float, bandwidth: Optional[float] = None) -> Dict[str, float]:
+    """
+    Extrapolate the total payload and the upload time of the whole dataset.
+
+    Requests overlap up to `max_in_flight`, so the latency part of the time is
+    divided by the concurrency, while the transfer part is bound by the bandwidth
+    whatever the concurrency. Server-side insert time is not included.
+    """
+    total_bytes = sample.mean * total_records
+    sent_bytes = total_bytes * (sample.compressed_ratio if compress else 1.0)
+    batches = -(-total_records // batch_size) if total_records else 0
+    latency_seconds = batches * round_trip / max(1, max_in_flight)
+    transfer_seconds = sent_bytes / bandwidth if bandwidth else 0.0
+    return {
+        "batches": batches,
+        "total_bytes": total_bytes,
+        "sent_bytes": sent_bytes,
+        "batch_bytes": sample.mean * min(batch_size, total_records) * (sample.compressed_ratio if compress else 1.0),
+        # Latency and transfer overlap across in-flight requests, so the slower of the two dominates
+        "seconds": max(latency_seconds, transfer_seconds),
+    }
+
+
+def option_warnings(metadata_options: Dict[str, List[str]], questions: Sequence[Dict[str, Any]]) -> List[str]:
+    """Flag metadata and question option lists that are too long for Argilla to handle comfortably."""
+    warnings = []
+    for name, options in metadata_options.items():
+        if len(options) > MAX_METADATA_OPTIONS:
+            warnings.append(f"Metadata '{name}' has {len(options)} distinct values (more than {MAX_METADATA_OPTIONS}); "
+                            "consider making it a field or dropping it.")
+    for question in questions:
+        labels = question.get("labels") or []
+        if len(labels) > MAX_LABEL_OPTIONS:
+            warnings.append(f"Question '{question['question_title']}' has {len(labels)} labels "
+                            f"(more than {MAX_LABEL_OPTIONS}).")
+    return warnings
+
@@ -2,7 +2,17 @@ import streamlit as st
 import json
 import pandas as pd
 from typing import Dict, List, Union, Any
+import random
 from collections import defaultdict
+from itertools import islice
+from columnar import count_rows, is_columnar, iter_projected_records, schema_paths
+from dedup import canonical_value
+from ingest import iter_records, iter_shard_records, strip_compression_suffix
+from labeling_page import find_list_paths, get_nested_value
+from path_trie import PathTrie
+from project_snapshot import ArrowRows, list_snapshots, open_snapshot, read_manifest
+from sampling import reservoir_sample, stratified_sample
+import serialization
 
 def get_path_value(data: Union[Dict, List], path: str) -> Any:
     """Get value from nested structure using dot notation path."""
@@ -11,7 +21,7 @@ def get_path_value(data: Union[Dict, List], path: str) -> Any:
         parts = path.split('.')
         
         # Special handling for 'data' at the root
-        if parts[0] == 'data' and isinstance(current.get('data'), list):
+        if parts[0] == 'data' and isinstance(current.get('data'), (list, ArrowRows)):
             current = current['data']
             # For preview, just show first item
             if len(parts) > 1 and current:
@@ -79,63 +89,10 @@ def flatten_json(data: Union[Dict, List], parent_key: str = '', sep: str = '.')
     
     return list(dict.fromkeys(paths))  # Remove duplicates while preserving order
 
-def organize_paths(paths: List[str], json_data: Any) -> Dict[str, Any]:
+def organize_paths(paths: List[str], json_data: Any = None) -> Dict[str, Any]:
     """Organize paths into a proper hierarchical structure for display while maintaining order."""
-    tree = {}
-    
-    # Helper function to get the original order of keys at each level
-    def get_ordered_keys(data: Union[Dict, List], prefix: str = "") -> List[str]:
-        if isinstance(data, dict):
-            return [f"{prefix}{k}" if prefix else k for k in data.keys()]
-        elif isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict):
-            return [f"{prefix}{k}" if prefix else k for k in data[0].keys()]
-        return []
-
-    # Build initial tree structure
-    for path in paths:
-        parts = path.split('.')
-        current = tree
-        for i, part in enumerate(parts):
-            if i < len(parts) - 1:  # Not the last part
-                if part not in current:
-                    current[part] = {}
-                current = current[part]
-            else:  # Last part (leaf node)
-                if part not in current:
-                    current[part] = None
-
-    # Function to sort dictionary keys based on original JSON order
-    def sort_dict_by_json_order(d: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
-        if not isinstance(d, dict):
-            return d
-
-        # Get ordered keys for this level
-        ordered_keys = get_ordered_keys(json_data, prefix)
-        
-        # Create new ordered dictionary
-        ordered_dict = {}
-        
-        # First add keys that exist in original order
-        for key in ordered_keys:
-            key_without_prefix = key[len(prefix):] if prefix else key
-            if key_without_prefix in d:
-                ordered_dict[key_without_prefix] = sort_dict_by_json_order(
-                    d[key_without_prefix], 
-                    f"{prefix}{key_without_prefix}." if prefix else f"{key_without_prefix}."
-                )
-        
-        # Then add any remaining keys that might not be in the original JSON
-        for key in d:
-            if key not in ordered_dict:
-                ordered_dict[key] = sort_dict_by_json_order(
-                    d[key],
-                    f"{prefix}{key}." if prefix else f"{key}."
-                )
-        
-        return ordered_dict
-
-    # Sort the tree based on original JSON order
-    return sort_dict_by_json_order(tree)
+    # Paths arrive in first-seen JSON order, which the trie keeps at every level
+    return PathTrie(paths).to_tree()
 
 def render_tree(tree: Dict[str, Any], json_data: Any, parent_path: str = "", level: int = 0) -> dict:
     """Recursively render the tree structure."""
@@ -145,7 +102,11 @@ def render_tree(tree: Dict[str, Any], json_data: Any, parent_path: str = "", lev
     }
     
     for key, subtree in tree.items():
-        current_path = f"{parent_path}.{key}" if parent_path else key
+        # A None key is the parent path itself, when it holds plain values besides its nested fields
+        if key is None:
+            current_path = parent_path
+        else:
+            current_path = f"{parent_path}.{key}" if parent_path else key
         indent = "&nbsp;" * (level * 4)
         
         if subtree is None:  # Leaf node
@@ -155,13 +116,13 @@ def render_tree(tree: Dict[str, Any], json_data: Any, parent_path: str = "", lev
             
             with col1:
                 # Remove the sample display, just show the key
-                st.markdown(f"{indent}📄 {key}", unsafe_allow_html=True)
+                st.markdown(f"{indent}📄 {key if key is not None else '(value)'}", unsafe_allow_html=True)
             
             with col2:
                 is_selected = st.checkbox(
                     "Select",
                     key=f"select_{current_path}",
-                    value=current_path in (st.session_state.temp_selected_paths | st.session_state.temp_metadata_paths)
+                    value=current_path in st.session_state.temp_selected_paths or current_path in st.session_state.temp_metadata_paths
                 )
             
             with col3:
@@ -175,27 +136,17 @@ def render_tree(tree: Dict[str, Any], json_data: Any, parent_path: str = "", lev
                         label_visibility="collapsed"
                     )
                     
-                    # Update selected paths while maintaining order
+                    # Every leaf path occurs once in the tree, so appending keeps the order without duplicates
                     if field_type == "Display":
-                        if current_path not in selected_paths["fields"]:
-                            selected_paths["fields"].append(current_path)
-                        if current_path in selected_paths["metadata"]:
-                            selected_paths["metadata"].remove(current_path)
+                        selected_paths["fields"].append(current_path)
                         st.session_state.temp_selected_paths.add(current_path)
                         st.session_state.temp_metadata_paths.discard(current_path)
                     else:
-                        if current_path not in selected_paths["metadata"]:
-                            selected_paths["metadata"].append(current_path)
-                        if current_path in selected_paths["fields"]:
-                            selected_paths["fields"].remove(current_path)
+                        selected_paths["metadata"].append(current_path)
                         st.session_state.temp_metadata_paths.add(current_path)
                         st.session_state.temp_selected_paths.discard(current_path)
                 else:
                     # Clear selections if unchecked
-                    if current_path in selected_paths["fields"]:
-                        selected_paths["fields"].remove(current_path)
-                    if current_path in selected_paths["metadata"]:
-                        selected_paths["metadata"].remove(current_path)
                     st.session_state.temp_selected_paths.discard(current_path)
                     st.session_state.temp_metadata_paths.discard(current_path)
 
@@ -213,19 +164,16 @@ def render_tree(tree: Dict[str, Any], json_data: Any, parent_path: str = "", lev
             
             if st.session_state.tree_toggles[toggle_key]:
                 child_paths = render_tree(subtree, json_data, current_path, level + 1)
-                # Extend lists instead of updating sets
-                for path in child_paths["fields"]:
-                    if path not in selected_paths["fields"]:
-                        selected_paths["fields"].append(path)
-                for path in child_paths["metadata"]:
-                    if path not in selected_paths["metadata"]:
-                        selected_paths["metadata"].append(path)
+                # Subtrees are disjoint, so their selections never overlap
+                selected_paths["fields"].extend(child_paths["fields"])
+                selected_paths["metadata"].extend(child_paths["metadata"])
     
     return selected_paths
 
 def load_json_data(uploaded_file):
     """Load data from either JSON or JSONL file and normalize into a consistent format."""
     try:
+        uploaded_file.seek(0)
         file_extension = uploaded_file.name.split(".")[-1].lower()
         
         if file_extension == "jsonl":
@@ -241,7 +189,7 @@ def load_json_data(uploaded_file):
             records = []
             for line in lines:
                 try:
-                    record = json.loads(line)
+                    record = serialization.loads(line)
                     records.append(record)
                 except json.JSONDecodeError:
                     continue  # Skip invalid lines
@@ -254,7 +202,7 @@ def load_json_data(uploaded_file):
             return {"data": records}
             
         else:  # JSON file
-            data = json.load(uploaded_file)
+            data = serialization.load(uploaded_file)
             
             # Normalize the data structure
             if isinstance(data, list):
@@ -274,6 +222,215 @@ def load_json_data(uploaded_file):
         st.error(f"Error processing file: {str(e)}")
         return None
 
+def sample_entries(entries, sampling: dict) -> list:
+    """Keep all (origin, record) entries of a stream or a uniform/stratified sample of them."""
+    if sampling["mode"] == "Stratified sample":
+        path_parts = sampling["stratify_path"].split('.')
+        if path_parts[0] == 'data':
+            path_parts = path_parts[1:]
+        return stratified_sample(
+            entries,
+            sampling["size"],
+            key=lambda entry: canonical_value(get_nested_value(entry[1], path_parts)),
+            seed=sampling["seed"],
+            allocation=sampling["allocation"]
+        )
+    if sampling["mode"] == "Uniform sample":
+        return reservoir_sample(entries, sampling["size"], seed=sampling["seed"])
+    return list(entries)
+
+def load_records(uploaded_files, sampling: dict):
+    """
+    Stream every uploaded shard once and keep all records or a uniform/stratified sample.
+
+    Compressed shards are decompressed on the fly and several shards are parsed in
+    parallel. The shard and line of origin of every kept record is stored in
+    `st.session_state.record_origins`, aligned with the returned records.
+    """
+    try:
+        shards = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+        sample = sample_entries(iter_shard_records(shards), sampling)
+
+        if not sample:
+            st.error("No valid JSON records found in the uploaded files")
+            return None
+
+        st.session_state.record_origins = [origin for origin, _ in sample]
+        return {"data": [record for _, record in sample]}
+
+    except Exception as e:
+        st.error(f"Error processing file: {str(e)}")
+        return None
+
+def load_columnar_preview(uploaded_files):
+    """Read the schema and the first rows of columnar files without loading them."""
+    try:
+        first_file = uploaded_files[0]
+        payload = first_file.getvalue()
+        st.session_state.columnar_paths = schema_paths(payload, first_file.name)
+        all_columns = list(dict.fromkeys(path.split('.')[1] for path in st.session_state.columnar_paths))
+        preview = [record for _, record in islice(iter_projected_records(payload, first_file.name, all_columns), 10)]
+        st.session_state.record_origins = None
+        return {"data": preview}
+    except Exception as e:
+        st.error(f"Error processing file: {str(e)}")
+        return None
+
+def load_projected_data(uploaded_files, paths: List[str], sampling: dict):
+    """
+    Read only the selected paths of columnar files, keeping all rows or a sample.
+
+    Uniform samples are drawn from the row counts in the file footers, so only the
+    row groups holding sampled rows are read. Other modes stream the projected rows.
+    """
+    try:
+        payloads = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+        if sampling["mode"] == "Stratified sample":
+            paths = paths + [sampling["stratify_path"]]
+
+        rows_per_file = [None] * len(payloads)
+        if sampling["mode"] == "Uniform sample":
+            counts = [count_rows(payload, name) for name, payload in payloads]
+            if None not in counts:
+                total = sum(counts)
+                chosen = random.Random(sampling["seed"]).sample(range(total), min(sampling["size"], total))
+                rows_per_file = [set() for _ in payloads]
+                offsets = [sum(counts[:i]) for i in range(len(counts))]
+                for row in chosen:
+                    file_idx = max(i for i, offset in enumerate(offsets) if offset <= row)
+                    rows_per_file[file_idx].add(row - offsets[file_idx])
+                sampling = {"mode": "All records"}
+
+        def entries():
+            for (name, payload), rows in zip(payloads, rows_per_file):
+                for position, record in iter_projected_records(payload, name, paths, rows):
+                    yield (name, position), record
+
+        sample = sample_entries(entries(), sampling)
+        if not sample:
+            st.error("No rows found in the uploaded files")
+            return None
+
+        st.session_state.record_origins = [origin for origin, _ in sample]
+        return {"data": [record for _, record in sample]}
+
+    except Exception as e:
+        st.error(f"Error processing file: {str(e)}")
+        return None
+
+def display_sampling_options(uploaded_files) -> dict:
+    """Render the sampling controls and return the chosen sampling configuration."""
+    st.markdown("### Records to Label")
+    mode = st.radio(
+        "Choose which records to load",
+        options=["All records", "Uniform sample", "Stratified sample"],
+        horizontal=True,
+        key="sampling_mode"
+    )
+    sampling = {"mode": mode}
+    if mode == "All records":
+        return sampling
+
+    col1, col2 = st.columns(2)
+    with col1:
+        sampling["size"] = int(st.number_input("Sample size", min_value=1, value=1000, step=100, key="sampling_size"))
+    with col2:
+        sampling["seed"] = int(st.number_input("Random seed", min_value=0, value=42, step=1, key="sampling_seed"))
+
+    if mode == "Stratified sample":
+        # Offer the leaf paths of the first records of the first shard as strata
+        first_file = uploaded_files[0]
+        if st.session_state.get("sampling_preview_file") != first_file.file_id:
+            if is_columnar(first_file.name):
+                st.session_state.sampling_preview_paths = schema_paths(first_file.getvalue(), first_file.name)
+            else:
+                first_file.seek(0)
+                preview = list(islice(iter_records(first_file, first_file.name), 10))
+                st.session_state.sampling_preview_paths = flatten_json({"data": preview})
+            st.session_state.sampling_preview_file = first_file.file_id
+        col1, col2 = st.columns(2)
+        with col1:
+            sampling["stratify_path"] = st.selectbox(
+                "Stratify by",
+                options=st.session_state.sampling_preview_paths,
+                key="sampling_stratify_path",
+                help="Up to one sample-size worth of records is held per distinct value while reading, "
+                     "so keys with very many distinct values, such as ids, are refused."
+            )
+        with col2:
+            sampling["allocation"] = st.radio(
+                "Allocation",
+                options=["proportional", "equal"],
+                horizontal=True,
+                key="sampling_allocation"
+            )
+    return sampling
+
+def load_source_data(uploaded_files, sampling: dict):
+    """Load (or sample) the uploaded files once per file set and sampling configuration."""
+    source_key = (tuple(uploaded_file.file_id for uploaded_file in uploaded_files), tuple(sorted(sampling.items())))
+    if st.session_state.get("source_key") == source_key and st.session_state.json_data is not None:
+        return st.session_state.json_data
+
+    columnar_files = [is_columnar(uploaded_file.name) for uploaded_file in uploaded_files]
+    if any(columnar_files) and not all(columnar_files):
+        st.error("Please upload either columnar files (Parquet/Arrow/CSV) or JSON/JSONL files, not both.")
+        return None
+
+    single_plain_file = len(uploaded_files) == 1 and uploaded_files[0].name.lower().endswith((".json", ".jsonl"))
+    if all(columnar_files):
+        # Columnar rows are read after field selection, projected to the selected paths
+        json_data = load_columnar_preview(uploaded_files)
+    elif sampling["mode"] == "All records" and single_plain_file:
+        json_data = load_json_data(uploaded_files[0])
+        st.session_state.record_origins = None
+    else:
+        json_data = load_records(uploaded_files, sampling)
+    if json_data is None:
+        return None
+
+    st.session_state.source_key = source_key
+    st.session_state.columnar_source = all(columnar_files)
+    reset_derived_state()
+    return json_data
+
+def reset_derived_state():
+    """Drop everything derived from the previously loaded records."""
+    for key in ("dataset", "dataset_job", "row_sources", "duplicate_candidates", "dedup_job", "duplicate_of",
+                "search_index", "search_index_job", "search_queue", "labeled_dataset"):
+        st.session_state.pop(key, None)
+
+def display_snapshot_opener():
+    """Reopen a saved project snapshot and go straight to the labeling playground."""
+    snapshots = list_snapshots()
+    if not snapshots:
+        return
+    with st.expander("📂 Open a project snapshot"):
+        path = st.selectbox("Snapshot", snapshots, key="snapshot_path")
+        try:
+            manifest = read_manifest(path)
+        except (OSError, ValueError) as e:
+            st.error(f"Cannot read this snapshot: {e}")
+            return
+        st.caption(f"{manifest['rows']} records, {len(manifest['state']['questions'] or [])} question(s)")
+        if st.button("Open snapshot"):
+            try:
+                state = open_snapshot(path)
+            except (OSError, ValueError, KeyError) as e:
+                st.error(f"Cannot open this snapshot: {e}")
+                return
+            reset_derived_state()
+            # Models, pre-tagged spans and uncertainty orders belong to the previous project
+            for key in ("prelabels", "prelabel_models", "prelabel_jobs", "span_pretags", "span_pretag_jobs",
+                        "assignment_fingerprint", "assignment_batch", "timing_row", "source_key", "path_trie_source"):
+                st.session_state.pop(key, None)
+            st.session_state.update(state)
+            st.session_state.columnar_source = False
+            st.session_state.current_index = 0
+            st.session_state.labeling_complete = False
+            st.session_state.page = 3
+            st.rerun()
+
 def validate_jsonl_consistency(records: List[dict]) -> bool:
     """Check if all records in JSONL have similar structure."""
     if not records:
@@ -308,30 +465,49 @@ def display_upload_page():
         st.session_state.temp_selected_paths = set()
     if "temp_metadata_paths" not in st.session_state:
         st.session_state.temp_metadata_paths = set()
+    if "columnar_source" not in st.session_state:
+        st.session_state.columnar_source = False
 
     st.title("ArgillaLabeler")
-    
+    display_snapshot_opener()
+
     # File uploader
-    uploaded_file = st.file_uploader("Choose a JSON or JSONL file", type=["json", "jsonl"])
+    uploaded_files = st.file_uploader(
+        "Choose JSON/JSONL files (shards may be compressed with gzip, bz2, xz or zstd) or Parquet/Arrow/CSV files",
+        type=["json", "jsonl", "gz", "bz2", "xz", "zst", "parquet", "arrow", "feather", "ipc", "csv"],
+        accept_multiple_files=True,
+        key="uploaded_files"
+    )
 
-    if uploaded_file is not None:
+    if uploaded_files:
         try:
-            # Load and store JSON/JSONL data
-            json_data = load_json_data(uploaded_file)
+            # Load and store JSON/JSONL data, optionally sampled
+            sampling = display_sampling_options(uploaded_files)
+            json_data = load_source_data(uploaded_files, sampling)
             
             if json_data is None:
                 return
                 
             # Validate data consistency for JSONL
-            if uploaded_file.name.endswith('.jsonl'):
+            if any(strip_compression_suffix(f.name).endswith('.jsonl') for f in uploaded_files):
                 if not validate_jsonl_consistency(json_data.get('data', [])):
                     st.warning("Warning: Records in JSONL file have inconsistent structure. Some fields might not be available for all records.")
             
             st.session_state.json_data = json_data
+            if st.session_state.columnar_source:
+                st.info("Only the selected columns will be read from the columnar files after you click Next.")
+            elif sampling["mode"] != "All records":
+                st.info(f"Loaded a {sampling['mode'].lower()} of {len(json_data['data'])} records from {len(uploaded_files)} file(s).")
+            elif len(uploaded_files) > 1:
+                st.info(f"Loaded {len(json_data['data'])} records from {len(uploaded_files)} files.")
 
-            # Get all possible paths and organize them into a tree
-            paths = flatten_json(json_data)
-            tree = organize_paths(paths, json_data)
+            # Get all possible paths and organize them into a tree, once per loaded source
+            if st.session_state.get("path_trie_source") != st.session_state.source_key:
+                paths = st.session_state.columnar_paths if st.session_state.columnar_source else flatten_json(json_data)
+                st.session_state.path_trie = PathTrie(paths)
+                st.session_state.path_tree = st.session_state.path_trie.to_tree()
+                st.session_state.path_trie_source = st.session_state.source_key
+            tree = st.session_state.path_tree
             
             
             
@@ -341,6 +517,22 @@ def display_upload_page():
             # Render the tree and get selected paths
             selected_paths = render_tree(tree, json_data)
 
+            # Exploding a list path turns every element (e.g. each entity of sentence.NE) into its own record
+            selected = selected_paths["fields"] + selected_paths["metadata"]
+            explode_options = [
+                path for path in find_list_paths(json_data.get('data', []))
+                if any(p == path or p.startswith(path + ".") for p in selected)
+            ]
+            explode_path = st.selectbox(
+                "Explode a list into one record per element (optional)",
+                [None] + explode_options,
+                index=([None] + explode_options).index(st.session_state.get("explode_path"))
+                if st.session_state.get("explode_path") in explode_options else 0,
+                format_func=lambda path: "Don't explode" if path is None else path,
+                help="Each element of the chosen list becomes a labeling record that carries the other selected "
+                     "fields of its parents, e.g. one record per entity with the title and sentence text."
+            )
+
             if st.button("Next"):
                 if selected_paths["fields"] or selected_paths["metadata"]:
                     # Store display columns in selected_columns maintaining order
@@ -364,8 +556,22 @@ def display_upload_page():
                     ]
                     
                     # Update temporary states
-                    st.session_state.temp_selected_paths = selected_paths["fields"]
-                    st.session_state.temp_metadata_paths = selected_paths["metadata"]
+                    st.session_state.temp_selected_paths = set(selected_paths["fields"])
+                    st.session_state.temp_metadata_paths = set(selected_paths["metadata"])
+                    if st.session_state.get("explode_path") != explode_path:
+                        st.session_state.explode_path = explode_path
+                        reset_derived_state()
+
+                    # Columnar files are only read now, projected to the selected paths
+                    if st.session_state.columnar_source:
+                        with st.spinner("Reading selected columns..."):
+                            projected_data = load_projected_data(
+                                uploaded_files, selected_paths["fields"] + selected_paths["metadata"], sampling
+                            )
+                        if projected_data is None:
+                            return
+                        st.session_state.json_data = projected_data
+                        reset_derived_state()
                     
                     st.session_state.page = 2
                     st.rerun()
@@ -2,7 +2,19 @@ import streamlit as st
 import pandas as pd
 import argilla as rg
 import json
-from labeling_page import format_value
+import statistics
+from collections import Counter
+from functools import partial
+
+import httpx
+from async_uploader import MAX_BATCH_SIZE, build_record_payload, encode_batch, upload_encoded_batches
+from job_manager import JobLimitError, current_owner, display_job, get_job_manager
+from labeling_page import format_value, get_labeled_dataset
+from memory_report import format_bytes
+from parallel_convert import MIN_PARALLEL_ROWS, default_workers, iter_converted_batches
+from span_suggestions import build_span_suggestion, merge_spans, record_span_suggestions
+from upload_dry_run import (OVERSIZED_RECORD_BYTES, PLACEHOLDER_ID, estimate_upload, measure_bandwidth,
+                            measure_payloads, measure_round_trips, option_warnings, sample_positions)
 
 def convert_to_string(value):
     """Convert any value to a string representation suitable for Argilla"""
@@ -10,22 +22,6 @@ def convert_to_string(value):
         return format_value(value)  # Use your existing formatter
     return str(value) if value is not None else ""
 
-def get_value_from_path(data: dict, path: str):
-    """Extract value from nested JSON using a simple dot-notation path."""
-    try:
-        current = data
-        for part in path.split('.'):
-            if isinstance(current, dict):
-                current = current.get(part)
-            elif isinstance(current, list) and current:
-                # If it's a list, assume we want the first item in that list
-                current = current[0].get(part)
-            else:
-                return None
-        return current
-    except (KeyError, IndexError, AttributeError):
-        return None
-
 def sanitize_name(name: str) -> str:
     """Convert a string to a valid Argilla field name."""
     # Replace spaces and special characters with underscores
@@ -34,15 +30,447 @@ def sanitize_name(name: str) -> str:
     sanitized = ''.join(c for c in sanitized if c.isalnum() or c == '_')
     return sanitized
 
+def response_value(question: dict, value):
+    """Convert a playground answer into the value format Argilla expects, or None if unanswered."""
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+
+    question_type = question["question_type"]
+    if question_type == "Multi-label":
+        labels = value if isinstance(value, list) else [label.strip() for label in str(value).split(",")]
+        labels = [label for label in labels if label]
+        return labels or None
+    if question_type == "Rating":
+        return int(value)
+    if question_type == "Ranking":
+        if not isinstance(value, (list, tuple)):
+            return None
+        return [{"value": item, "rank": rank} for rank, item in enumerate(value, start=1)]
+    if question_type == "SpanQuestion":
+        spans = value if isinstance(value, list) else [value]
+        spans = [
+            {"label": span["label"], "start": int(span["start"]), "end": int(span["end"])}
+            for span in spans if isinstance(span, dict)
+        ]
+        return spans or None
+    value = str(value)
+    return value if value.strip() else None
+
+def metadata_value(value):
+    """Convert a metadata cell into the string Argilla stores, or None if the record has no value."""
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    return convert_to_string(value)
+
+def metadata_options(dataset: pd.DataFrame, metadata_columns: list) -> dict:
+    """Return the sorted distinct values of every metadata column, the options of its terms property."""
+    metadata_values = {}
+    for meta_def in metadata_columns:
+        unique_values = set()
+        if meta_def["text"] in dataset.columns:
+            for value in dataset[meta_def["text"]]:
+                value = metadata_value(value)
+                if value is not None:
+                    unique_values.add(value)
+        metadata_values[meta_def["text"]] = sorted(list(unique_values))
+    return metadata_values
+
+def build_settings(guidelines: str, field_cols: list, metadata_columns: list, questions: list, dataset: pd.DataFrame):
+    """Build the Argilla dataset settings from the selected columns and the defined questions."""
+    # Create metadata properties from the metadata columns of the dataset
+    metadata_values = metadata_options(dataset, metadata_columns)
+
+    metadata_properties = [
+        rg.TermsMetadataProperty(
+            name=meta_def["text"],
+            title=meta_def["text"],
+            options=metadata_values[meta_def["text"]]
+        )
+        for meta_def in metadata_columns
+    ]
+    # Create fields for all selected columns with sanitized names
+    fields = [
+        rg.TextField(
+            name=sanitize_name(col),  # Sanitize field names
+            title=col,
+            use_markdown=False
+        )
+        for col in field_cols
+    ]
+
+    # Build questions
+    label_questions = []
+    for question in questions:
+        question_name = sanitize_name(question["question_title"])
+
+        if question["question_type"] == "Label":
+            label_questions.append(
+                rg.LabelQuestion(
+                    name=question_name,  # Use sanitized name
+                    title=question["question_title"],  # Keep original title for display
+                    labels=question["labels"],
+                    description=question["label_description"]
+                )
+            )
+        elif question["question_type"] == "Multi-label":
+            label_questions.append(
+                rg.MultiLabelQuestion(
+                    name=question_name,  # Use sanitized name
+                    title=question["question_title"],  # Keep original title for display
+                    labels=question["labels"],
+                    description=question["label_description"]
+                )
+            )
+        elif question["question_type"] == "Rating":
+            label_questions.append(
+                rg.RatingQuestion(
+                    name=question_name,  # Use sanitized name
+                    title=question["question_title"],  # Keep original title for display
+                    values=[1, 2, 3, 4, 5],
+                    description=question["label_description"]
+                )
+            )
+        elif question["question_type"] == "TextQuestion":
+            label_questions.append(
+                rg.TextQuestion(
+                    name=question_name,
+                    title=question['question_title'],
+                    description=question["label_description"],
+                    required = False
+
+                )
+            )
+        elif question["question_type"] == "Ranking":
+            # Make sure we have labels before creating ranking question
+            if question.get("labels"):
+                # Create a dictionary with labels as both keys and values
+                ranking_values = {
+                    label.strip(): label.strip()
+                    for label in question["labels"]
+                }
+
+                label_questions.append(
+                    rg.RankingQuestion(
+                        name=question_name,
+                        title=question['question_title'],
+                        description=question["label_description"],
+                        values=ranking_values  # Use dictionary format for values
+                    )
+                )
+        elif question["question_type"] == "SpanQuestion":
+            field_name = question.get("span_field")
+            if field_name:
+                # Make sure to use the same sanitized field name that was used in fields
+                sanitized_field_name = sanitize_name(field_name)
+                label_questions.append(
+                    rg.SpanQuestion(
+                        name=question_name,
+                        title=question["question_title"],
+                        labels=question["labels"],
+                        field=sanitized_field_name,  # Use sanitized field name
+                        description=question["label_description"]
+                    )
+                )
+
+    # Create settings
+    settings = rg.Settings(
+        guidelines=guidelines,
+        fields=fields,
+        questions=label_questions,
+        metadata=metadata_properties
+    )
+    return settings
+
+def iter_record_payloads(dataset: pd.DataFrame, records, field_cols: list, metadata_columns: list,
+                         answered_questions: list, user_id, span_imports=None, span_stats=None,
+                         prelabel_suggestions=None, span_pretags=None):
+    """
+    Yield the bulk-upload payload of every row of `dataset`, one at a time.
+
+    `span_imports` lists (question, question id) pairs of span questions whose
+    existing source annotations are sent as suggestions, `prelabel_suggestions`
+    lists (predictions, question id) pairs of pre-labeled questions and
+    `span_pretags` lists (question, pre-tagged spans, question id) triples of
+    span questions tagged with a gazetteer or regex rules. `records` (the source
+    record of every row, needed by span imports only), the predictions and the
+    pre-tagged spans are aligned with the rows of `dataset`, as `select_rows`
+    returns them.
+    """
+    for position, (idx, row) in enumerate(dataset.iterrows()):
+        fields_dict = {
+            sanitize_name(col): convert_to_string(row[col])
+            for col in field_cols
+        }
+
+        metadata = {}
+        for meta_def in metadata_columns:
+            value = metadata_value(row[meta_def["text"]]) if meta_def["text"] in row.index else None
+            if value is not None:
+                metadata[meta_def["text"]] = value
+
+        responses = {}
+        for question in answered_questions:
+            value = response_value(question, row[question["question_title"]])
+            if value is not None:
+                responses[sanitize_name(question["question_title"])] = value
+
+        span_suggestions = {}
+        for question, question_id in span_imports or []:
+            if records is None or records[position] is None:
+                break
+            spans = record_span_suggestions(
+                records[position], row[question["span_field"]], question["span_field"],
+                question["span_import"], question["labels"], span_stats
+            )
+            if spans:
+                span_suggestions[question["question_title"]] = build_span_suggestion(question_id, spans)
+        for question, pretags, question_id in span_pretags or []:
+            imported = span_suggestions.get(question["question_title"])
+            if imported is None:
+                suggestion = pretags.to_suggestion(position, question_id)
+                if suggestion is not None:
+                    span_suggestions[question["question_title"]] = suggestion
+            else:
+                # One suggestion per question: the pre-tagged spans fill in around the imported ones
+                merged = merge_spans(imported["value"], pretags.spans(position))
+                if len(merged) > len(imported["value"]):
+                    imported["value"] = merged
+                    imported["agent"] += " and gazetteer pre-tagging"
+        suggestions = list(span_suggestions.values())
+        for prelabels, question_id in prelabel_suggestions or []:
+            suggestion = prelabels.to_suggestion(position, question_id)
+            if suggestion is not None:
+                suggestions.append(suggestion)
+
+        # The dataset row keeps its record id across retries and re-runs of the conversion
+        yield build_record_payload(fields_dict, metadata, responses, user_id, suggestions, external_id=str(idx))
+
+def select_rows(dataset: pd.DataFrame, json_data: list, row_sources, span_imports, prelabel_suggestions,
+                span_pretags, positions) -> dict:
+    """
+    Return the inputs of the dataset rows at `positions`, aligned with them and picklable on their own.
+
+    Source records are only included when span imports need them, and only the
+    predictions and pre-tagged spans of those rows, so a chunk of rows can be
+    sent to a conversion process without the rest of the dataset.
+    """
+    records = None
+    if span_imports:
+        records = []
+        for position in positions:
+            record_idx = row_sources[position] if row_sources is not None else position
+            records.append(json_data[record_idx] if record_idx < len(json_data) else None)
+    return {
+        "dataset": dataset.iloc[positions],
+        "records": records,
+        "prelabel_suggestions": [(prelabels.take(positions), question_id)
+                                 for prelabels, question_id in prelabel_suggestions or []],
+        "span_pretags": [(question, pretags.take(positions), question_id)
+                         for question, pretags, question_id in span_pretags or []],
+    }
+
+def payloads_for_rows(field_cols: list, metadata_columns: list, answered_questions: list, user_id, span_imports,
+                      rows: dict, span_stats: Counter):
+    """Build the payloads of rows returned by `select_rows`; the unit of work of the parallel conversion."""
+    return iter_record_payloads(
+        rows["dataset"], rows["records"], field_cols, metadata_columns, answered_questions, user_id,
+        span_imports, span_stats, rows["prelabel_suggestions"], rows["span_pretags"]
+    )
+
+def run_upload_job(job, params: dict) -> dict:
+    """Create the Argilla dataset and push every record; runs in a background job."""
+    dataset = params["dataset"]
+    questions = params["questions"]
+
+    # Initialize Argilla client
+    client = rg.client.Argilla(api_url=params["api_url"], api_key=params["api_key"])
+
+    settings = build_settings(
+        params["guidelines"], params["field_cols"], params["metadata_columns"], questions, dataset
+    )
+
+    # Playground answers are sent as responses of the connected user
+    question_names = {question.name for question in settings.questions}
+    answered_questions = [
+        question for question in questions
+        if question["question_title"] in dataset.columns
+        and sanitize_name(question["question_title"]) in question_names
+    ]
+    user_id = client.me.id if answered_questions else None
+
+    # Create the dataset, then push the records
+    dataset_for_argilla = rg.Dataset(
+        name=params["dataset_name"],
+        workspace=params["workspace_name"],
+        settings=settings,
+        client=client
+    )
+    dataset_for_argilla.create()
+
+    # Existing begin/end annotations become span suggestions of the questions that import them
+    span_imports = [
+        (question, dataset_for_argilla.settings.questions[sanitize_name(question["question_title"])].id)
+        for question in questions
+        if question["question_type"] == "SpanQuestion" and question.get("span_import")
+        and sanitize_name(question["question_title"]) in question_names
+    ]
+    span_stats = Counter()
+    prelabel_suggestions = [
+        (params["prelabels"][question["question_title"]],
+         dataset_for_argilla.settings.questions[sanitize_name(question["question_title"])].id)
+        for question in questions
+        if question["question_title"] in params["prelabels"]
+        and sanitize_name(question["question_title"]) in question_names
+    ]
+    span_pretags = [
+        (question, params["span_pretags"][question["question_title"]],
+         dataset_for_argilla.settings.questions[sanitize_name(question["question_title"])].id)
+        for question in questions
+        if question["question_type"] == "SpanQuestion" and question["question_title"] in params["span_pretags"]
+        and sanitize_name(question["question_title"]) in question_names
+    ]
+
+    job.report(0, len(dataset))
+    # Records are converted and encoded on a process pool, in order, while earlier batches are uploading
+    batches = iter_converted_batches(
+        partial(payloads_for_rows, params["field_cols"], params["metadata_columns"], answered_questions, user_id,
+                span_imports),
+        partial(select_rows, dataset, params["json_data"], params["row_sources"], span_imports, prelabel_suggestions,
+                span_pretags),
+        len(dataset),
+        params["batch_size"],
+        params["compress"],
+        workers=params["workers"],
+        stats=span_stats
+    )
+    try:
+        sent = upload_encoded_batches(
+            params["api_url"],
+            params["api_key"],
+            dataset_for_argilla.id,
+            batches,
+            progress=job.report,
+            should_stop=lambda: job.cancelled,
+            batch_size=params["batch_size"],
+            max_in_flight=params["max_in_flight"],
+            compress=params["compress"]
+        )
+    finally:
+        # The uploader has waited for any batch still being built, so the generator is not running here
+        batches.close()
+    summary = {"records uploaded": sent}
+    summary.update((f"spans {outcome.replace('_', ' ')}", count) for outcome, count in span_stats.items())
+    return summary
+
+@st.fragment(run_every=1)
+def display_upload_job_status():
+    """Poll the status of the upload started from this page."""
+    job = get_job_manager().get(st.session_state.get("upload_job_id"))
+    if job is None:
+        return
+    display_job(job, key_prefix="upload_page")
+    if job.status == "completed":
+        st.success(f"Data uploaded to Argilla successfully! ({job.result['records uploaded']} records)")
+    elif job.status == "failed":
+        st.error("Failed to upload to Argilla.")
+
+def display_dry_run(dataset, json_data, field_cols, metadata_columns, questions, api_url, api_key,
+                    batch_size, max_in_flight, compress):
+    """Build a sample of record payloads as the upload would, and project the size and duration of the upload."""
+    with st.expander("Dry Run"):
+        st.markdown("Builds a sample of records exactly as the upload does and measures them. "
+                    "No records are sent.")
+        sample_size = st.number_input("Records to sample", min_value=1, value=min(500, len(dataset)), key="dry_run_sample")
+        probe_bandwidth = st.checkbox(
+            "Measure upload bandwidth",
+            help="Sends one sample batch to a dataset id that does not exist, so the server receives it and stores nothing.",
+            key="dry_run_bandwidth"
+        )
+        if not st.button("Run Dry Run"):
+            return
+
+        # Same records, metadata, responses and suggestions as the upload, with placeholder ids
+        answered_questions = [
+            question for question in questions
+            if question["question_title"] in dataset.columns
+            and not (question["question_type"] == "Ranking" and not question.get("labels"))
+            and not (question["question_type"] == "SpanQuestion" and not question.get("span_field"))
+        ]
+        span_imports = [
+            (question, PLACEHOLDER_ID) for question in questions
+            if question["question_type"] == "SpanQuestion" and question.get("span_import")
+        ]
+        prelabels = st.session_state.get("prelabels", {})
+        prelabel_suggestions = [
+            (prelabels[question["question_title"]], PLACEHOLDER_ID)
+            for question in questions if question["question_title"] in prelabels
+        ]
+        pretags = st.session_state.get("span_pretags", {})
+        span_pretags = [
+            (question, pretags[question["question_title"]], PLACEHOLDER_ID)
+            for question in questions
+            if question["question_type"] == "SpanQuestion" and question["question_title"] in pretags
+        ]
+        positions = sample_positions(len(dataset), int(sample_size))
+        with st.spinner("Building sample records..."):
+            rows = select_rows(dataset, json_data, st.session_state.get("row_sources"), span_imports,
+                               prelabel_suggestions, span_pretags, positions)
+            sample = measure_payloads(positions, payloads_for_rows(
+                field_cols, metadata_columns, answered_questions, PLACEHOLDER_ID if answered_questions else None,
+                span_imports, rows, Counter()
+            ), batch_size)
+
+        for warning in option_warnings(metadata_options(dataset, metadata_columns), questions):
+            st.warning(warning)
+        oversized = int((sample.sizes > OVERSIZED_RECORD_BYTES).sum())
+        if oversized:
+            st.warning(
+                f"{oversized} of {len(sample.sizes)} sampled records (about {oversized * len(dataset) // len(sample.sizes)} "
+                f"in the dataset) are larger than {format_bytes(OVERSIZED_RECORD_BYTES)}, e.g. "
+                + ", ".join(f"row {row} ({format_bytes(size)})" for row, size in sample.largest if size > OVERSIZED_RECORD_BYTES)
+            )
+
+        round_trip = bandwidth = None
+        try:
+            with st.spinner("Measuring round-trips to the server..."):
+                round_trip = statistics.median(measure_round_trips(api_url, api_key))
+                if probe_bandwidth:
+                    body, compressed = encode_batch(
+                        list(iter_record_payloads(
+                            dataset.iloc[positions[:batch_size]], None, field_cols, metadata_columns, [], None
+                        )), compress
+                    )
+                    bandwidth = measure_bandwidth(api_url, api_key, body, compressed)
+        except httpx.HTTPError as e:
+            st.warning(f"Could not reach the server to measure round-trips: {e}")
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Record size (mean / p95)", f"{format_bytes(sample.mean)} / {format_bytes(sample.p95)}")
+        estimate = estimate_upload(len(dataset), sample, batch_size, max_in_flight, compress, round_trip or 0.0, bandwidth)
+        col2.metric("Total payload", format_bytes(estimate["total_bytes"]),
+                    f"{format_bytes(estimate['sent_bytes'])} sent" if compress else None, delta_color="off")
+        if round_trip is not None:
+            col3.metric("Estimated upload time", f"{estimate['seconds']:.1f}s")
+            st.caption(
+                f"{estimate['batches']} bulk requests of about {format_bytes(estimate['batch_bytes'])}, "
+                f"round-trip {round_trip * 1000:.0f} ms"
+                + (f", bandwidth {format_bytes(bandwidth)}/s" if bandwidth else "")
+                + ". Server-side insert time is not included."
+            )
+        st.markdown("**Largest sampled records**")
+        st.table(pd.DataFrame(
+            [(row, format_bytes(size)) for row, size in sample.largest], columns=["Row", "Size"]
+        ))
+
 def display_upload_to_argilla_page():
     st.title("Upload to Argilla")
     
     # Load data from session state
-    dataset = st.session_state.get("dataset", pd.DataFrame())
+    dataset = get_labeled_dataset() if "dataset" in st.session_state else pd.DataFrame()
     selected_columns = st.session_state.get("selected_columns", [])
     metadata_columns = st.session_state.get("metadata_columns", [])
     questions = st.session_state.get("questions", [])
-    json_data = st.session_state.get("json_data", {}).get("data", [])
+    json_data = (st.session_state.get("json_data") or {}).get("data", [])
 
     if dataset.empty or not questions:
         st.warning("No labeled dataset or questions found. Please ensure labeling is completed before uploading.")
@@ -81,159 +509,57 @@ def display_upload_to_argilla_page():
 
     dataset_name = st.text_input("Dataset Name", value="labeled_dataset")
 
-    if st.button("Upload to Argilla"):
-        try:
-            # Initialize Argilla client
-            client = rg.client.Argilla(api_url=api_url, api_key=api_key)
-
-            # Create metadata properties
-            metadata_values = {}
-            for meta_def in metadata_columns:
-                unique_values = set()
-                for record in json_data:
-                    path = meta_def["path"].replace("data.", "")
-                    value = get_value_from_path(record, path)
-                    if value is not None:
-                        unique_values.add(str(value))
-                metadata_values[meta_def["text"]] = sorted(list(unique_values))
-
-            metadata_properties = [
-                rg.TermsMetadataProperty(
-                    name=meta_def["text"],
-                    title=meta_def["text"],
-                    options=metadata_values[meta_def["text"]]
-                )
-                for meta_def in metadata_columns
-            ]
-            # Create fields for all selected columns with sanitized names
-            fields = [
-                rg.TextField(
-                    name=sanitize_name(col),  # Sanitize field names
-                    title=col,
-                    use_markdown=False
-                )
-                for col in field_cols
-            ]
-
-            # Build questions
-            label_questions = []
-            for question in questions:
-                question_name = sanitize_name(question["question_title"])
-                
-                if question["question_type"] == "Label":
-                    label_questions.append(
-                        rg.LabelQuestion(
-                            name=question_name,  # Use sanitized name
-                            title=question["question_title"],  # Keep original title for display
-                            labels=question["labels"],
-                            description=question["label_description"]
-                        )
-                    )
-                elif question["question_type"] == "Multi-label":
-                    label_questions.append(
-                        rg.MultiLabelQuestion(
-                            name=question_name,  # Use sanitized name
-                            title=question["question_title"],  # Keep original title for display
-                            labels=question["labels"],
-                            description=question["label_description"]
-                        )
-                    )
-                elif question["question_type"] == "Rating":
-                    label_questions.append(
-                        rg.RatingQuestion(
-                            name=question_name,  # Use sanitized name
-                            title=question["question_title"],  # Keep original title for display
-                            values=[1, 2, 3, 4, 5],
-                            description=question["label_description"]
-                        )
-                    )
-                elif question["question_type"] == "TextQuestion":
-                    label_questions.append(
-                        rg.TextQuestion(
-                            name=question_name,
-                            title=question['question_title'],
-                            description=question["label_description"],
-                            required = False
-                            
-                        )
-                    )
-                elif question["question_type"] == "Ranking":
-                    # Make sure we have labels before creating ranking question
-                    if question.get("labels"):
-                        # Create a dictionary with labels as both keys and values
-                        ranking_values = {
-                            label.strip(): label.strip()
-                            for label in question["labels"]
-                        }
-                        
-                        label_questions.append(
-                            rg.RankingQuestion(
-                                name=question_name,
-                                title=question['question_title'],
-                                description=question["label_description"],
-                                values=ranking_values  # Use dictionary format for values
-                            )
-                        )
-                    else:
-                        st.warning(f"Skipping ranking question '{question['question_title']}' because it has no labels.")
-                elif question["question_type"] == "SpanQuestion":
-                    field_name = question.get("span_field")
-                    if field_name:
-                        # Make sure to use the same sanitized field name that was used in fields
-                        sanitized_field_name = sanitize_name(field_name)
-                        label_questions.append(
-                            rg.SpanQuestion(
-                                name=question_name,
-                                title=question["question_title"],
-                                labels=question["labels"],
-                                field=sanitized_field_name,  # Use sanitized field name
-                                description=question["label_description"]
-                            )
-                        )
-                
-
-            # Create settings
-            settings = rg.Settings(
-                guidelines=guidelines,
-                fields=fields,
-                questions=label_questions,
-                metadata=metadata_properties
-            )
+    with st.expander("Upload Settings"):
+        batch_size = st.number_input("Records per request", min_value=1, max_value=MAX_BATCH_SIZE, value=MAX_BATCH_SIZE)
+        max_in_flight = st.number_input("Concurrent requests", min_value=1, max_value=32, value=4)
+        compress = st.checkbox(
+            "Compress request bodies (gzip)", value=False,
+            help="Only for servers behind a proxy that decodes gzip request bodies; Argilla itself does not. "
+                 "The upload switches to plain JSON if the server cannot read them."
+        )
+        workers = st.number_input(
+            "Conversion processes", min_value=1, max_value=64, value=default_workers(),
+            help="Records are converted to upload requests on this many processes. "
+                 f"Datasets under {MIN_PARALLEL_ROWS:,} records are converted in one."
+        )
 
-            # Create records with sanitized field names
-            records = []
-            for idx, row in dataset.iterrows():
-                fields_dict = {
-                    sanitize_name(col): convert_to_string(row[col])
-                    for col in field_cols
-                }
-                
-                metadata = {}
-                if idx < len(json_data):
-                    for meta_def in metadata_columns:
-                        path = meta_def["path"].replace("data.", "")
-                        value = get_value_from_path(json_data[idx], path)
-                        if value is not None:
-                            metadata[meta_def["text"]] = convert_to_string(value)
-                
-                record = rg.Record(
-                    fields=fields_dict,
-                    metadata=metadata
-                )
-                records.append(record)
+    display_dry_run(
+        dataset, json_data, field_cols, metadata_columns, questions, api_url, api_key,
+        int(batch_size), int(max_in_flight), compress
+    )
 
-            # Create and push dataset
-            dataset_for_argilla = rg.Dataset(
-                name=dataset_name,
-                workspace=workspace_name,
-                settings=settings
-            )
-            
-            dataset_for_argilla.create()
-            dataset_for_argilla.records.log(records)
+    if st.button("Upload to Argilla"):
+        for question in questions:
+            if question["question_type"] == "Ranking" and not question.get("labels"):
+                st.warning(f"Skipping ranking question '{question['question_title']}' because it has no labels.")
 
-            st.success("Data uploaded to Argilla successfully!")
+        # The upload runs as a background job, so it survives navigation and reruns
+        params = {
+            "api_url": api_url,
+            "api_key": api_key,
+            "workspace_name": workspace_name,
+            "dataset_name": dataset_name,
+            "guidelines": guidelines,
+            "dataset": dataset,
+            "json_data": json_data,
+            "field_cols": field_cols,
+            "metadata_columns": metadata_columns,
+            "questions": questions,
+            "row_sources": st.session_state.get("row_sources"),
+            "prelabels": st.session_state.get("prelabels", {}),
+            "span_pretags": st.session_state.get("span_pretags", {}),
+            "batch_size": int(batch_size),
+            "max_in_flight": int(max_in_flight),
+            "compress": compress,
+            "workers": int(workers),
+        }
+        try:
+            job = get_job_manager().submit(
+                current_owner(), "upload", f"Upload '{dataset_name}' to Argilla", run_upload_job, params,
+                total=len(dataset)
+            )
+            st.session_state.upload_job_id = job.id
+        except JobLimitError as e:
+            st.error(str(e))
 
-        except Exception as e:
-            st.error(f"Failed to upload to Argilla: {str(e)}")
-            st.exception(e)  # This will show the full error traceback
\ No newline at end of file
+    display_upload_job_status()